@@ -0,0 +1,58 @@
+"""
+Levanta una de las apps con uvicorn para los benchmarks end to end.
+  python arrancar_app.py plantillas --puerto 18001
+  python arrancar_app.py conversor --puerto 18000
+En 'plantillas' Mongo se reemplaza por mongomock-motor (en memoria, sin servidor).
+La configuración llega por variables de entorno, como en el contenedor.
+"""
+import argparse
+import os
+import sys
+
+from comun import APP_CONVERSOR, APP_PLANTILLAS, usar_app
+
+
+def _mongo_en_memoria() -> None:
+    """ Reemplaza el AsyncMongoClient de pymongo por mongomock-motor, con lo que le falta para la app. """
+    import mongomock
+    import pymongo
+    from mongomock_motor import AsyncMongoMockClient
+    from pymongo.errors import OperationFailure
+    from pymongo.uri_parser import parse_uri
+
+    class ClienteEnMemoria(AsyncMongoMockClient):
+        def __init__(self, url: str, **opciones):
+            super().__init__(url, **opciones)
+            self._base = parse_uri(url)["database"]
+
+        def get_default_database(self, *args, **kwargs):
+            return self[self._base]
+
+        async def close(self) -> None:
+            pass
+
+    def watch(*args, **kwargs):
+        # Como un Mongo sin replica set: el cache de plantillas pasa a polling
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+
+    mongomock.collection.Collection.watch = watch
+    pymongo.AsyncMongoClient = ClienteEnMemoria
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("app", choices=("plantillas", "conversor"))
+    parser.add_argument("--puerto", type=int, required=True)
+    args = parser.parse_args()
+
+    directorio = APP_PLANTILLAS if args.app == "plantillas" else APP_CONVERSOR
+    os.chdir(directorio)
+    usar_app(directorio)
+    if args.app == "plantillas":
+        _mongo_en_memoria()
+
+    import uvicorn
+    import main
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.puerto, log_level="warning", access_log=False)
+    sys.exit(0)
@@ -0,0 +1,282 @@
+"""
+Benchmark end to end: levanta el file-converter-service (con fake_soffice) y el
+templates-service (con mongomock-motor) en procesos uvicorn y les manda carga concurrente.
+
+Escenarios:
+- conversor_directo: DOCX -> PDF contra el file-converter-service.
+- render_docx_por_id: reemplazo de placeholders de una plantilla guardada (sin conversión).
+- render_pdf_por_id: reemplazo + conversión a PDF (camino completo entre servicios).
+- render_pdf_archivo: igual, subiendo el DOCX como multipart.
+Con --replicas-conversor N se levantan N conversores y el templates-service balancea entre ellos.
+"""
+import asyncio
+import base64
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from comun import APP_PLANTILLAS, FAKE_SOFFICE, resumir, usar_app
+from generar_docx import PERFILES, generar, metadata_para
+
+ESCENARIOS = ("conversor_directo", "render_docx_por_id", "render_pdf_por_id", "render_pdf_archivo")
+DIRECTORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Servicios:
+    """ Ambas apps en subprocesos, con directorios de trabajo temporales que se borran al cerrar. """
+
+    def __init__(self, slots: int, demora_soffice: float, demora_por_doc: float, micro_lote_ms: int,
+                 cache_pdf: bool, motor: str, render_procesos: int = 0, cache_documentos: bool = False,
+                 replicas_conversor: int = 1):
+        self.directorio = tempfile.mkdtemp(prefix="bench_")
+        self.puertos_conversor = [_puerto_libre() for _ in range(max(1, replicas_conversor))]
+        self.puerto_plantillas = _puerto_libre()
+        self.procesos: List[subprocess.Popen] = []
+
+        base = {k: v for k, v in os.environ.items()}
+        base["ENTORNO"] = "bench"
+        self.envs_conversor = [self._env_conversor(base, os.path.join(self.directorio, f"conversor{i}"), slots,
+                                                   demora_soffice, demora_por_doc, micro_lote_ms, cache_pdf)
+                               for i in range(len(self.puertos_conversor))]
+        self.env_plantillas = {
+            **base,
+            "MONGO_URL": "mongodb://localhost:27017/bench",
+            "FILE_CONVERTER_BASE_URL": ",".join(self.urls_conversor),
+            "STORAGE_PLANTILLAS": "local",
+            "STORAGE_DIRECTORIO": os.path.join(self.directorio, "plantillas"),
+            "MOTOR_RENDER": motor,
+            "RENDER_PROCESOS": str(render_procesos),
+            "DOCUMENTOS_CACHE_HABILITADO": "true" if cache_documentos else "false",
+            "DOCUMENTOS_CACHE_DIRECTORIO": os.path.join(self.directorio, "cache_documentos"),
+        }
+
+    @staticmethod
+    def _env_conversor(base: Dict[str, str], directorio: str, slots: int, demora_soffice: float,
+                       demora_por_doc: float, micro_lote_ms: int, cache_pdf: bool) -> Dict[str, str]:
+        env = {
+            **base,
+            "SOFFICE_CMD": FAKE_SOFFICE,
+            "FAKE_SOFFICE_DELAY": str(demora_soffice),
+            "FAKE_SOFFICE_DELAY_POR_DOC": str(demora_por_doc),
+            "CONVERSION_MODO": "proceso",
+            "CONVERSION_SLOTS_MAX": str(slots),
+            "CONVERSION_COLA_MAX": "1000",
+            "CONVERSION_ESPERA_MAX_SEGUNDOS": "120",
+            "CONVERSION_MICRO_LOTE_VENTANA_MS": str(micro_lote_ms),
+            "CONVERSION_ESPACIOS_DIRECTORIO": os.path.join(directorio, "espacios"),
+            "CONVERSION_DIRECTORIO_TEMPORAL": os.path.join(directorio, "trabajo"),
+            "CACHE_HABILITADO": "true" if cache_pdf else "false",
+            "CACHE_DIRECTORIO": os.path.join(directorio, "cache_pdf"),
+            "JOBS_COLA": "memoria",
+        }
+        os.makedirs(env["CONVERSION_DIRECTORIO_TEMPORAL"], exist_ok=True)
+        return env
+
+    @property
+    def urls_conversor(self) -> List[str]:
+        return [f"http://127.0.0.1:{puerto}" for puerto in self.puertos_conversor]
+
+    @property
+    def url_conversor(self) -> str:
+        """ El escenario conversor_directo le pega a la primera réplica. """
+        return self.urls_conversor[0]
+
+    @property
+    def url_plantillas(self) -> str:
+        return f"http://127.0.0.1:{self.puerto_plantillas}"
+
+    @property
+    def _apps(self) -> List[Tuple[str, str, int, Dict[str, str]]]:
+        """ (nombre del log, app, puerto, entorno) de cada proceso. """
+        conversores = [(f"conversor{i}" if i else "conversor", "conversor", puerto, env)
+                       for i, (puerto, env) in enumerate(zip(self.puertos_conversor, self.envs_conversor))]
+        return conversores + [("plantillas", "plantillas", self.puerto_plantillas, self.env_plantillas)]
+
+    def iniciar(self) -> None:
+        for nombre, app, puerto, env in self._apps:
+            # Los logs de las apps van a un archivo: en la consola solo queda el reporte
+            with open(os.path.join(self.directorio, f"{nombre}.log"), "wb") as log:
+                self.procesos.append(subprocess.Popen(
+                    [sys.executable, os.path.join(DIRECTORIO_BENCH, "arrancar_app.py"), app, "--puerto", str(puerto)],
+                    env=env, cwd=DIRECTORIO_BENCH, stdout=log, stderr=subprocess.STDOUT,
+                ))
+        for url in self.urls_conversor + [self.url_plantillas]:
+            self._esperar(url)
+
+    def _esperar(self, url: str, timeout: float = 30) -> None:
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if any(p.poll() is not None for p in self.procesos):
+                raise RuntimeError(f"Una de las apps terminó al arrancar:\n{self._logs()}")
+            try:
+                if httpx.get(f"{url}/health/liveness", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"{url} no respondió en {timeout} segundos:\n{self._logs()}")
+
+    def _logs(self, lineas: int = 30) -> str:
+        salida = []
+        for nombre, _, _, _ in self._apps:
+            try:
+                with open(os.path.join(self.directorio, f"{nombre}.log"), encoding="utf-8", errors="replace") as f:
+                    salida.append(f"--- {nombre} ---\n" + "".join(f.readlines()[-lineas:]))
+            except OSError:
+                pass
+        return "\n".join(salida)
+
+    def detener(self) -> None:
+        for p in self.procesos:
+            p.terminate()
+        for p in self.procesos:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+def _fases_server_timing(valor: Optional[str]) -> Dict[str, float]:
+    fases = {}
+    for parte in (valor or "").split(","):
+        nombre, _, dur = parte.strip().partition(";dur=")
+        if nombre and dur:
+            fases[nombre] = float(dur)
+    return fases
+
+
+async def _cargar(armar: Callable[[int], Tuple[str, str, dict]], concurrencia: int, cantidad: int,
+                  timeout: float) -> dict:
+    """ `cantidad` requests con `concurrencia` en vuelo; `armar(i)` devuelve (método, url, kwargs de httpx). """
+    latencias: List[float] = []
+    errores = 0
+    fases: Dict[str, float] = {}
+    siguiente = 0
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrencia)) as cliente:
+        async def trabajador():
+            nonlocal siguiente, errores
+            while siguiente < cantidad:
+                i = siguiente
+                siguiente += 1
+                metodo, url, kwargs = armar(i)
+                inicio = time.perf_counter()
+                try:
+                    resp = await cliente.request(metodo, url, **kwargs)
+                    ok = resp.status_code == 200
+                except httpx.HTTPError:
+                    ok, resp = False, None
+                latencias.append(time.perf_counter() - inicio)
+                if not ok:
+                    errores += 1
+                    continue
+                for nombre, dur in _fases_server_timing(resp.headers.get("server-timing")).items():
+                    fases[nombre] = fases.get(nombre, 0.0) + dur
+
+        inicio_total = time.perf_counter()
+        await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio_total
+
+    resumen = resumir(latencias, duracion, errores)
+    exitosos = len(latencias) - errores
+    # Promedio por request de cada fase informada por el servidor (Server-Timing)
+    resumen["fases_ms"] = {k: round(v / exitosos, 2) for k, v in fases.items()} if exitosos else {}
+    return resumen
+
+
+def _variantes_docx(plantilla: bytes, perfil: dict, cantidad: int) -> List[bytes]:
+    """ DOCX distintos (para que el cache de PDFs no los resuelva): se renderizan localmente una vez. """
+    usar_app(APP_PLANTILLAS)
+    from services.word_replacer_service import WordReplacerService
+
+    servicio = WordReplacerService(motor_default="xml")
+    return [servicio.reemplazar_placeholder_word(plantilla, metadata_para(perfil, i), "file") for i in range(cantidad)]
+
+
+def correr(perfil_nombre: str = "mediana", escenarios=ESCENARIOS, concurrencia: int = 8, cantidad: int = 100,
+           slots: int = 4, demora_soffice: float = 0.2, demora_por_doc: float = 0.02, micro_lote_ms: int = 30,
+           cache_pdf: bool = False, motor: str = "xml", timeout: float = 120,
+           render_procesos: int = 0, cache_documentos: bool = False, replicas_conversor: int = 1) -> Dict[str, dict]:
+    perfil = PERFILES[perfil_nombre]
+    plantilla = generar(perfil_nombre)
+    plantilla_b64 = base64.b64encode(plantilla).decode()
+    variantes = _variantes_docx(plantilla, perfil, min(cantidad, 50)) if "conversor_directo" in escenarios else []
+
+    servicios = Servicios(slots, demora_soffice, demora_por_doc, micro_lote_ms, cache_pdf, motor, render_procesos,
+                          cache_documentos, replicas_conversor)
+    try:
+        servicios.iniciar()
+        resp = httpx.post(f"{servicios.url_plantillas}/plantillas/api/", json={
+            "archivo": plantilla_b64, "nombre": f"bench {perfil_nombre}", "nombre_archivo": f"{perfil_nombre}.docx",
+            "tipo": "bench", "juzgado": "bench",
+        }, timeout=timeout)
+        resp.raise_for_status()
+        plantilla_id = resp.json()["data"]
+
+        armadores = {
+            "conversor_directo": lambda i: (
+                "POST", f"{servicios.url_conversor}/archivos/api/convertir_word_to_pdf",
+                {"content": variantes[i % len(variantes)], "headers": {"Content-Type": "application/octet-stream"}},
+            ),
+            "render_docx_por_id": lambda i: (
+                "POST", f"{servicios.url_plantillas}/plantillas/api/remplazar/{plantilla_id}",
+                {"json": {"metadata": metadata_para(perfil, i)}},
+            ),
+            "render_pdf_por_id": lambda i: (
+                "POST", f"{servicios.url_plantillas}/plantillas/api/remplazar_pdf_file/{plantilla_id}",
+                {"json": {"metadata": metadata_para(perfil, i)}},
+            ),
+            "render_pdf_archivo": lambda i: (
+                "POST", f"{servicios.url_plantillas}/plantillas/api/remplazar_pdf_archivo",
+                {"files": {"archivo": (f"{perfil_nombre}.docx", plantilla)},
+                 "data": {"metadata": json.dumps(metadata_para(perfil, i))}},
+            ),
+        }
+
+        resultados = {}
+        for escenario in escenarios:
+            # Calentamiento: perfiles de LibreOffice, plantillas compiladas, conexiones
+            asyncio.run(_cargar(armadores[escenario], min(concurrencia, slots), min(cantidad, slots * 2), timeout))
+            resultados[escenario] = asyncio.run(_cargar(armadores[escenario], concurrencia, cantidad, timeout))
+        return resultados
+    finally:
+        servicios.detener()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfil", default="mediana", choices=list(PERFILES))
+    parser.add_argument("--escenarios", nargs="+", default=list(ESCENARIOS), choices=ESCENARIOS)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--cantidad", type=int, default=100, help="requests por escenario")
+    parser.add_argument("--slots", type=int, default=4, help="CONVERSION_SLOTS_MAX del conversor")
+    parser.add_argument("--demora-soffice", type=float, default=0.2)
+    parser.add_argument("--micro-lote-ms", type=int, default=30)
+    parser.add_argument("--cache-pdf", action="store_true")
+    parser.add_argument("--motor", default="xml", choices=("docx", "xml"))
+    parser.add_argument("--render-procesos", type=int, default=0, help="RENDER_PROCESOS del templates-service")
+    parser.add_argument("--cache-documentos", action="store_true", help="cache de documentos del templates-service")
+    parser.add_argument("--replicas-conversor", type=int, default=1, help="conversores a levantar (balanceo en el cliente)")
+    args = parser.parse_args()
+    print(json.dumps(correr(args.perfil, args.escenarios, args.concurrencia, args.cantidad, args.slots,
+                            args.demora_soffice, micro_lote_ms=args.micro_lote_ms, cache_pdf=args.cache_pdf,
+                            motor=args.motor, render_procesos=args.render_procesos,
+                            cache_documentos=args.cache_documentos, replicas_conversor=args.replicas_conversor),
+                     indent=2))
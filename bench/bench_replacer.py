@@ -0,0 +1,65 @@
+"""
+Microbenchmark de WordReplacerService.reemplazar_placeholder_word por perfil de plantilla y motor.
+- frio: la plantilla no está compilada (parse + reemplazo + guardado).
+- caliente: plantilla ya compilada en el LRU (solo reemplazo + guardado), como en producción.
+Con --normalizar se mide la plantilla como queda guardada al subirla (NormalizadorDocx).
+"""
+import os
+import time
+from typing import Dict, List
+
+from comun import APP_PLANTILLAS, resumir, usar_app
+from generar_docx import PERFILES, generar, metadata_para
+
+MOTORES = ("docx", "xml")
+
+
+def correr(perfiles: List[str], iteraciones: int = 20, iteraciones_frio: int = 5,
+           normalizar: bool = False) -> Dict[str, dict]:
+    usar_app(APP_PLANTILLAS)
+    from services.normalizador_docx import NormalizadorDocx
+    from services.word_replacer_service import WordReplacerService
+
+    resultados: Dict[str, dict] = {}
+    for nombre in perfiles:
+        plantilla = generar(nombre)
+        if normalizar:
+            plantilla = NormalizadorDocx().normalizar(plantilla)
+        perfil = PERFILES[nombre]
+        for motor in MOTORES:
+            frio = []
+            for i in range(iteraciones_frio):
+                servicio = WordReplacerService(motor_default=motor)
+                inicio = time.perf_counter()
+                servicio.reemplazar_placeholder_word(plantilla, metadata_para(perfil, i), "file")
+                frio.append(time.perf_counter() - inicio)
+
+            servicio = WordReplacerService(motor_default=motor)
+            servicio.reemplazar_placeholder_word(plantilla, metadata_para(perfil, -1), "file")
+            caliente = []
+            inicio_total = time.perf_counter()
+            for i in range(iteraciones):
+                inicio = time.perf_counter()
+                servicio.reemplazar_placeholder_word(plantilla, metadata_para(perfil, i), "file")
+                caliente.append(time.perf_counter() - inicio)
+            duracion = time.perf_counter() - inicio_total
+
+            resultados[f"{nombre}/{motor}"] = {
+                "plantilla_kb": round(len(plantilla) / 1024, 1),
+                "frio": resumir(frio),
+                "caliente": resumir(caliente, duracion),
+            }
+    return resultados
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    os.environ.setdefault("ENTORNO", "bench")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfiles", nargs="+", default=list(PERFILES), choices=list(PERFILES))
+    parser.add_argument("--iteraciones", type=int, default=20)
+    parser.add_argument("--normalizar", action="store_true", help="Normaliza la plantilla como al subirla")
+    args = parser.parse_args()
+    print(json.dumps(correr(args.perfiles, args.iteraciones, normalizar=args.normalizar), indent=2))
@@ -0,0 +1,53 @@
+""" Utilidades compartidas por los benchmarks. """
+import math
+import os
+import platform
+import sys
+from typing import Dict, List
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PLANTILLAS = os.path.join(RAIZ, "templates-service", "app")
+APP_CONVERSOR = os.path.join(RAIZ, "file-converter-service", "app")
+FAKE_SOFFICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_soffice.py")
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    bajo, alto = math.floor(k), math.ceil(k)
+    if bajo == alto:
+        return ordenados[int(k)]
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+def resumir(latencias_segundos: List[float], duracion_segundos: float = 0.0, errores: int = 0) -> Dict[str, float]:
+    """ Latencias en ms y throughput (si se pasa la duración total de la corrida). """
+    ordenadas = sorted(latencias_segundos)
+    n = len(ordenadas)
+    resumen = {
+        "n": n,
+        "errores": errores,
+        "media_ms": round(sum(ordenadas) / n * 1000, 3) if n else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 3),
+        "p90_ms": round(percentil(ordenadas, 90) * 1000, 3),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 3),
+        "max_ms": round(ordenadas[-1] * 1000, 3) if n else 0.0,
+    }
+    if duracion_segundos:
+        resumen["por_segundo"] = round(n / duracion_segundos, 2)
+    return resumen
+
+
+def maquina() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": str(os.cpu_count()),
+    }
+
+
+def usar_app(directorio_app: str) -> None:
+    """ Deja importables los módulos de una de las apps (services, domain, ...). """
+    if directorio_app not in sys.path:
+        sys.path.insert(0, directorio_app)
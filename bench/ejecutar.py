@@ -0,0 +1,137 @@
+"""
+Corre los benchmarks (replacer + end to end), imprime el reporte y lo compara contra la línea base.
+
+    python ejecutar.py                      # reporte + comparación con baseline.json
+    python ejecutar.py --guardar-baseline   # reemplaza baseline.json con esta corrida
+    python ejecutar.py --rapido             # menos iteraciones (para probar el harness)
+
+Se considera regresión si p50 sube o el throughput baja más que la tolerancia (default 20%)
+y más que --piso-ms en valor absoluto.
+La línea base depende de la máquina: regenerarla al cambiar de hardware.
+Sale con código 1 si hay regresiones.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+os.environ.setdefault("ENTORNO", "bench")
+
+import bench_e2e  # noqa: E402
+import bench_replacer  # noqa: E402
+from comun import maquina  # noqa: E402
+from generar_docx import PERFILES  # noqa: E402
+
+DIRECTORIO_BENCH = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(DIRECTORIO_BENCH, "baseline.json")
+RESULTADOS = os.path.join(DIRECTORIO_BENCH, "resultados")
+
+
+def _aplanar(reporte: dict) -> Dict[str, dict]:
+    """ {'replacer/mediana/xml/caliente': {...}, 'e2e/render_pdf_por_id': {...}} """
+    planas = {}
+    for clave, valor in reporte.get("replacer", {}).items():
+        for modo in ("frio", "caliente"):
+            planas[f"replacer/{clave}/{modo}"] = valor[modo]
+    for escenario, valor in reporte.get("e2e", {}).items():
+        planas[f"e2e/{escenario}"] = valor
+    return planas
+
+
+def comparar(actual: dict, base: dict, tolerancia: float, piso_ms: float = 2.0) -> List[str]:
+    """ `piso_ms`: diferencias de p50 menores a esto son ruido (medidas de menos de un milisegundo). """
+    regresiones = []
+    base_plana = _aplanar(base)
+    for clave, medida in _aplanar(actual).items():
+        anterior = base_plana.get(clave)
+        # Las medidas en frío tienen pocas muestras: se informan pero no cuentan como regresión
+        if not anterior or clave.endswith("/frio"):
+            continue
+        if medida.get("errores"):
+            regresiones.append(f"{clave}: {medida['errores']} errores")
+        if (anterior["p50_ms"] and medida["p50_ms"] > anterior["p50_ms"] * (1 + tolerancia)
+                and medida["p50_ms"] - anterior["p50_ms"] > piso_ms):
+            regresiones.append(f"{clave}: p50 {anterior['p50_ms']:.1f} -> {medida['p50_ms']:.1f} ms")
+        if (anterior.get("por_segundo") and medida.get("por_segundo", 0) < anterior["por_segundo"] * (1 - tolerancia)
+                and 1000 / medida["por_segundo"] - 1000 / anterior["por_segundo"] > piso_ms):
+            regresiones.append(f"{clave}: throughput {anterior['por_segundo']:.1f} -> {medida['por_segundo']:.1f} /s")
+    return regresiones
+
+
+def tabla(actual: dict, base: dict) -> str:
+    base_plana = _aplanar(base)
+    lineas = [f"{'medida':<42}{'n':>5}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'/s':>9}{'vs base':>10}"]
+    for clave, m in _aplanar(actual).items():
+        anterior = base_plana.get(clave)
+        delta = ""
+        if anterior and anterior["p50_ms"]:
+            delta = f"{(m['p50_ms'] / anterior['p50_ms'] - 1) * 100:+.0f}%"
+        por_segundo = f"{m['por_segundo']:.1f}" if "por_segundo" in m else ""
+        lineas.append(f"{clave:<42}{m['n']:>5}{m['p50_ms']:>10.1f}{m['p90_ms']:>10.1f}{m['p99_ms']:>10.1f}"
+                      f"{por_segundo:>9}{delta:>10}")
+        if m.get("fases_ms"):
+            lineas.append(" " * 4 + "fases: " + ", ".join(f"{k}={v:.1f}ms" for k, v in m["fases_ms"].items()))
+    return "\n".join(lineas)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfiles", nargs="+", default=["chica", "mediana", "grande"], choices=list(PERFILES))
+    parser.add_argument("--perfil-e2e", default="mediana", choices=list(PERFILES))
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--cantidad", type=int, default=100, help="requests por escenario end to end")
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--demora-soffice", type=float, default=0.2)
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--piso-ms", type=float, default=2.0, help="diferencia mínima de p50 para contar")
+    parser.add_argument("--rapido", action="store_true")
+    parser.add_argument("--sin-e2e", action="store_true")
+    parser.add_argument("--guardar-baseline", action="store_true")
+    args = parser.parse_args()
+
+    iteraciones = 5 if args.rapido else 20
+    cantidad = 20 if args.rapido else args.cantidad
+
+    reporte = {"fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "maquina": maquina(), "parametros": vars(args)}
+    print("Replacer...", file=sys.stderr)
+    reporte["replacer"] = bench_replacer.correr(args.perfiles, iteraciones, max(2, iteraciones // 4))
+    if not args.sin_e2e:
+        print("End to end...", file=sys.stderr)
+        reporte["e2e"] = bench_e2e.correr(args.perfil_e2e, concurrencia=args.concurrencia, cantidad=cantidad,
+                                          slots=args.slots, demora_soffice=args.demora_soffice)
+
+    base = {}
+    if os.path.exists(BASELINE) and not args.guardar_baseline:
+        with open(BASELINE, encoding="utf-8") as f:
+            base = json.load(f)
+
+    print(tabla(reporte, base))
+    os.makedirs(RESULTADOS, exist_ok=True)
+    destino = os.path.join(RESULTADOS, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+    print(f"\nReporte: {destino}")
+
+    if args.guardar_baseline:
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"Línea base actualizada: {BASELINE}")
+        return 0
+
+    if not base:
+        print("Sin línea base (correr con --guardar-baseline).")
+        return 0
+    if base.get("maquina") != reporte["maquina"]:
+        print("Aviso: la línea base es de otra máquina; la comparación es orientativa.")
+    regresiones = comparar(reporte, base, args.tolerancia, args.piso_ms)
+    for r in regresiones:
+        print(f"REGRESIÓN {r}")
+    if not regresiones:
+        print(f"Sin regresiones (tolerancia {args.tolerancia:.0%}).")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Reemplazo de `soffice` para benchmarks sin LibreOffice.
+
+Acepta la misma línea de comando que usa el file-converter-service
+(`--headless --convert-to pdf:... --outdir DIR -env:UserInstallation=file://... a.docx b.docx`)
+y, luego de una demora configurable, escribe un PDF válido por cada entrada.
+
+Variables de entorno:
+- FAKE_SOFFICE_DELAY: segundos por corrida (default 0.2)
+- FAKE_SOFFICE_DELAY_POR_DOC: segundos extra por documento de la corrida (default 0.02)
+- FAKE_SOFFICE_PERFIL_DELAY: segundos la primera vez que se usa un perfil (default 1.0)
+- FAKE_SOFFICE_PAGINAS: páginas de cada PDF (default 1)
+Un DOCX que contiene el texto FALLAR no genera salida (para probar errores por archivo).
+"""
+import os
+import sys
+import time
+
+
+def pdf_valido(titulo: str, paginas: int) -> bytes:
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages: se arma cuando se conocen las páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for n in range(paginas):
+        texto = f"{titulo} - pagina {n + 1}".replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        contenido = f"BT /F1 12 Tf 72 770 Td ({texto}) Tj ET".encode("latin-1", "replace")
+        objetos.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(contenido), contenido))
+        contenido_id = len(objetos)
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % contenido_id
+        )
+        kids.append(b"%d 0 R" % len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), paginas)
+
+    salida = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, cuerpo in enumerate(objetos, start=1):
+        offsets.append(len(salida))
+        salida += b"%d 0 obj\n%s\nendobj\n" % (i, cuerpo)
+    inicio_xref = len(salida)
+    salida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        salida += b"%010d 00000 n \n" % offset
+    salida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(salida)
+
+
+def main(args) -> int:
+    if any(a.startswith("--accept") for a in args):
+        sys.stderr.write("fake_soffice no implementa el modo pool (UNO): use CONVERSION_MODO=proceso\n")
+        return 1
+
+    outdir = "."
+    entradas = []
+    perfil = None
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in ("--outdir", "--convert-to"):
+            if a == "--outdir":
+                outdir = args[i + 1]
+            i += 2
+            continue
+        if a.startswith("-env:UserInstallation=file://"):
+            perfil = a.split("file://", 1)[1]
+        elif not a.startswith("-"):
+            entradas.append(a)
+        i += 1
+
+    # Primer uso de un perfil: LibreOffice tarda en inicializarlo
+    if perfil:
+        marca = os.path.join(perfil, "user", "registrymodifications.xcu")
+        if not os.path.exists(marca):
+            time.sleep(float(os.environ.get("FAKE_SOFFICE_PERFIL_DELAY", "1.0")))
+            os.makedirs(os.path.dirname(marca), exist_ok=True)
+            with open(marca, "w") as f:
+                f.write("<oor:items/>")
+
+    time.sleep(float(os.environ.get("FAKE_SOFFICE_DELAY", "0.2"))
+               + float(os.environ.get("FAKE_SOFFICE_DELAY_POR_DOC", "0.02")) * len(entradas))
+
+    paginas = int(os.environ.get("FAKE_SOFFICE_PAGINAS", "1"))
+    for entrada in entradas:
+        with open(entrada, "rb") as f:
+            if b"FALLAR" in f.read():
+                print(f"Error: source file could not be loaded: {entrada}")
+                continue
+        nombre_base = os.path.splitext(os.path.basename(entrada))[0]
+        with open(os.path.join(outdir, f"{nombre_base}.pdf"), "wb") as f:
+            f.write(pdf_valido(nombre_base, paginas))
+        print(f"convert {entrada} -> {os.path.join(outdir, nombre_base + '.pdf')} using filter : writer_pdf_Export")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
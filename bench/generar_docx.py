@@ -0,0 +1,117 @@
+"""
+Plantillas DOCX sintéticas para los benchmarks.
+
+Cada perfil define cantidad de párrafos, tablas, placeholders partidos en varios
+runs (como los deja Word), imágenes embebidas y densidad de encabezados/pies.
+"""
+import random
+import struct
+import zlib
+from io import BytesIO
+from typing import Dict, List
+
+from docx import Document
+from docx.shared import Cm
+
+PERFILES: Dict[str, dict] = {
+    "chica": {"parrafos": 20, "tablas": 1, "filas_tabla": 4, "partidos": 3, "imagenes": 0, "secciones": 1},
+    "mediana": {"parrafos": 200, "tablas": 5, "filas_tabla": 10, "partidos": 20, "imagenes": 2, "secciones": 2},
+    "grande": {"parrafos": 1500, "tablas": 20, "filas_tabla": 25, "partidos": 100, "imagenes": 8, "secciones": 4},
+    "imagenes": {"parrafos": 40, "tablas": 1, "filas_tabla": 4, "partidos": 5, "imagenes": 30, "secciones": 1},
+}
+
+LOREM = ("Por ello y en virtud de lo dispuesto por el Código Fiscal se intima al contribuyente "
+         "a regularizar la deuda dentro del plazo establecido bajo apercibimiento de ley").split()
+
+
+def claves_placeholders(perfil: dict) -> List[str]:
+    """ Claves que usa la plantilla del perfil (la metadata de los benchmarks las completa todas). """
+    cantidad = max(10, perfil["partidos"])
+    return [f"CAMPO_{i:03d}" for i in range(cantidad)]
+
+
+def metadata_para(perfil: dict, semilla: int = 0) -> Dict[str, str]:
+    """ Metadata con valores distintos por semilla: cada render produce un DOCX distinto (sin hits de cache). """
+    return {clave.lower(): f"valor {clave} #{semilla}" for clave in claves_placeholders(perfil)}
+
+
+def generar(nombre_perfil: str, semilla: int = 1234) -> bytes:
+    perfil = PERFILES[nombre_perfil]
+    rnd = random.Random(semilla)
+    claves = claves_placeholders(perfil)
+    doc = Document()
+
+    pendientes_partidos = perfil["partidos"]
+    pendientes_imagenes = perfil["imagenes"]
+    tablas_cada = max(1, perfil["parrafos"] // max(1, perfil["tablas"])) if perfil["tablas"] else 0
+    imagenes_cada = max(1, perfil["parrafos"] // max(1, perfil["imagenes"])) if perfil["imagenes"] else 0
+
+    for i in range(perfil["parrafos"]):
+        texto = " ".join(rnd.choice(LOREM) for _ in range(rnd.randint(8, 30)))
+        clave = claves[i % len(claves)]
+        p = doc.add_paragraph()
+        if pendientes_partidos > 0:
+            # Placeholder partido como lo deja Word: '{{' | 'CAM' | 'PO_001}} resto'
+            p.add_run(texto + " ")
+            corte = rnd.randint(1, len(clave) - 1)
+            p.add_run("{{")
+            p.add_run(clave[:corte]).bold = True
+            p.add_run(clave[corte:] + "}} " + " ".join(rnd.choice(LOREM) for _ in range(5)))
+            pendientes_partidos -= 1
+        else:
+            p.add_run(f"{texto} {{{{{clave}}}}}.")
+
+        if tablas_cada and i % tablas_cada == tablas_cada - 1:
+            _agregar_tabla(doc, perfil["filas_tabla"], claves, rnd)
+        if imagenes_cada and pendientes_imagenes and i % imagenes_cada == 0:
+            # Imagen distinta cada vez: python-docx deduplica las idénticas
+            doc.add_paragraph().add_run().add_picture(BytesIO(_png(160, 120, rnd)), width=Cm(4))
+            pendientes_imagenes -= 1
+
+    for s in range(perfil["secciones"]):
+        seccion = doc.sections[0] if s == 0 else doc.add_section()
+        seccion.header.is_linked_to_previous = False
+        seccion.footer.is_linked_to_previous = False
+        seccion.header.paragraphs[0].text = f"Expediente {{{{{claves[s % len(claves)]}}}}} - sección {s + 1}"
+        seccion.footer.paragraphs[0].text = f"Página de {{{{{claves[(s + 1) % len(claves)]}}}}}"
+        doc.add_paragraph(f"Inicio de la sección {s + 2} {{{{{claves[(s + 2) % len(claves)]}}}}}")
+
+    salida = BytesIO()
+    doc.save(salida)
+    return salida.getvalue()
+
+
+def _agregar_tabla(doc, filas: int, claves: List[str], rnd: random.Random) -> None:
+    tabla = doc.add_table(rows=filas, cols=3)
+    for f in range(filas):
+        tabla.cell(f, 0).text = f"Concepto {f + 1}"
+        tabla.cell(f, 1).text = f"{{{{{claves[rnd.randrange(len(claves))]}}}}}"
+        tabla.cell(f, 2).text = f"$ {rnd.randint(100, 99999)},00"
+
+
+def _png(ancho: int, alto: int, rnd: random.Random) -> bytes:
+    """ PNG RGB con ruido (no comprime bien, como una foto escaneada). """
+    filas = b"".join(b"\x00" + bytes(rnd.getrandbits(8) for _ in range(ancho * 3)) for _ in range(alto))
+
+    def chunk(tipo: bytes, datos: bytes) -> bytes:
+        return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", ancho, alto, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(filas))
+            + chunk(b"IEND", b""))
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Genera las plantillas sintéticas en un directorio")
+    parser.add_argument("--salida", default="bench_plantillas")
+    args = parser.parse_args()
+    os.makedirs(args.salida, exist_ok=True)
+    for nombre in PERFILES:
+        contenido = generar(nombre)
+        with open(os.path.join(args.salida, f"{nombre}.docx"), "wb") as f:
+            f.write(contenido)
+        print(f"{nombre}.docx: {len(contenido) / 1024:.1f} KB")
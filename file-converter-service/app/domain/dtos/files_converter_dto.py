@@ -1,5 +1,9 @@
+from datetime import datetime
+
 from pydantic import BaseModel
-from typing import Optional, Generic, TypeVar
+from typing import List, Optional, Generic, TypeVar
+
+from domain.models.conversion_job_model import ConversionJobModel, ESTADO_COMPLETADO
 
 # Tipo genérico para respuestas
 T = TypeVar("T")
@@ -20,6 +24,19 @@ class PlantillaConvertidaDTO(BaseModel):
     actuacion_descripcion: str
     plantilla_nombre: str
 
+    @classmethod
+    def from_model(cls, model: "ConversionJobModel") -> "PlantillaConvertidaDTO":
+        return cls(
+            job_id=model.job_id,
+            lote_id=model.lote_id,
+            demanda_id=model.demanda_id,
+            ubicacion_obs=model.ubicacion_obs,
+            usuario_id=model.usuario_id,
+            actuacion_tipo=model.actuacion_tipo,
+            actuacion_descripcion=model.actuacion_descripcion,
+            plantilla_nombre=model.plantilla_nombre,
+        )
+
 # DTO que se desencola de la cola de plantillas a convertir de word a pdf
 class PlantillaConvertirDTO(BaseModel):
     job_id: str
@@ -30,3 +47,40 @@ class PlantillaConvertirDTO(BaseModel):
     actuacion_tipo: str
     actuacion_descripcion: str
     plantilla_nombre: str
+
+# DTO con el estado de un job de conversión asincrónica
+class EstadoJobDTO(BaseModel):
+    job_id: str
+    estado: str
+    intentos: int
+    error: Optional[str] = None
+    fechaCreacion: datetime
+    fechaActualizacion: datetime
+    # Se completa cuando el job terminó bien
+    convertida: Optional[PlantillaConvertidaDTO] = None
+
+    @classmethod
+    def from_model(cls, model: "ConversionJobModel") -> "EstadoJobDTO":
+        return cls(
+            job_id=model.job_id,
+            estado=model.estado,
+            intentos=model.intentos,
+            error=model.error,
+            fechaCreacion=model.fechaCreacion,
+            fechaActualizacion=model.fechaActualizacion,
+            convertida=PlantillaConvertidaDTO.from_model(model) if model.estado == ESTADO_COMPLETADO else None,
+        )
+
+# DTO con la posición de cada documento dentro del PDF unido de un lote
+class DocumentoLoteDTO(BaseModel):
+    job_id: str
+    demanda_id: str
+    estado: str
+    # Página (desde 1) donde empieza en el PDF unido; None si no tiene resultado y no se incluye
+    pagina_inicio: Optional[int] = None
+    paginas: Optional[int] = None
+
+class IndiceLoteDTO(BaseModel):
+    lote_id: str
+    total_paginas: int
+    documentos: List[DocumentoLoteDTO]
@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+# Estados posibles de un job de conversión
+ESTADO_PENDIENTE = "PENDIENTE"
+ESTADO_PROCESANDO = "PROCESANDO"
+ESTADO_COMPLETADO = "COMPLETADO"
+ESTADO_DEAD_LETTER = "DEAD_LETTER"
+
+
+class ConversionJobModel(BaseModel):
+    job_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    lote_id: str = ""
+    demanda_id: str = ""
+    ubicacion_obs: str = ""
+    usuario_id: str = ""
+    actuacion_tipo: str = ""
+    actuacion_descripcion: str = ""
+    plantilla_nombre: str = ""
+    nombre_salida: str = "archivo.pdf"
+
+    estado: str = ESTADO_PENDIENTE
+    intentos: int = 0
+    max_intentos: int = 3
+    error: Optional[str] = None
+    # Páginas del PDF, contadas al completar (None en jobs completados antes de guardarlas)
+    paginas: Optional[int] = None
+
+    # Hasta cuándo el job es invisible para otros workers (reintento con backoff o visibilidad de proceso)
+    visibleDesde: datetime = Field(default_factory=datetime.now)
+    fechaCreacion: datetime = Field(default_factory=datetime.now)
+    fechaActualizacion: datetime = Field(default_factory=datetime.now)
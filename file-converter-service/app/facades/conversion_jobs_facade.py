@@ -0,0 +1,109 @@
+from functools import partial
+from typing import Iterator, List, Optional, Tuple
+
+from domain.dtos.files_converter_dto import EstadoJobDTO, PlantillaConvertirDTO, IndiceLoteDTO, DocumentoLoteDTO
+from domain.models.conversion_job_model import ConversionJobModel, ESTADO_COMPLETADO
+from exceptions.tributarios_exception import TributarioException
+from facades.files_converter_facade import FilesConverterFacade
+from repositories.conversion_jobs_repository import ConversionJobsRepository
+from services.union_pdf_service import UnionPdfService
+
+
+class ConversionJobsFacade:
+    def __init__(self, repository: ConversionJobsRepository, union_pdf_service: UnionPdfService, max_intentos: int = 3):
+        self.repository = repository
+        self.union_pdf_service = union_pdf_service
+        self.max_intentos = max_intentos
+
+    def encolar_conversion(self, archivo_docx: bytes, datos: PlantillaConvertirDTO, nombre_sugerido: str = "") -> str:
+        if not archivo_docx:
+            raise TributarioException("No se pudo encolar: el archivo vino vacío.")
+
+        job = ConversionJobModel(
+            **datos.model_dump(exclude={"job_id"}),
+            nombre_salida=FilesConverterFacade._build_output_filename(nombre_sugerido, datos.plantilla_nombre),
+            max_intentos=self.max_intentos,
+        )
+        if datos.job_id:
+            # job_id provisto por el cliente: reenviar el mismo job es idempotente (lo resuelve el repositorio)
+            job.job_id = datos.job_id
+        return self.repository.encolar(job, archivo_docx)
+
+    def obtener_estado(self, job_id: str) -> EstadoJobDTO:
+        return EstadoJobDTO.from_model(self._obtener_job(job_id))
+
+    def obtener_resultado(self, job_id: str) -> Tuple[bytes, str]:
+        job = self._obtener_job(job_id)
+        if job.estado != ESTADO_COMPLETADO:
+            raise TributarioException(f"El job {job_id} todavía no tiene resultado (estado {job.estado}).")
+        pdf_bytes = self.repository.obtener_resultado(job_id)
+        if pdf_bytes is None:
+            raise TributarioException(f"El resultado del job {job_id} ya no está disponible.")
+        return pdf_bytes, job.nombre_salida
+
+    def unir_lote(self, lote_id: str, omitir_faltantes: bool = False) -> Iterator[bytes]:
+        """
+        PDF único con los resultados del lote en el orden en que se encolaron, con un marcador por demanda_id.
+        Se arma en streaming leyendo un resultado por vez. Sin `omitir_faltantes`, todos los jobs tienen que
+        estar completados y con su PDF disponible.
+        Un error a mitad de la respuesta (ya con 200) dejaría un PDF truncado: cada PDF se validó al completar
+        su job (páginas contadas), y los de jobs anteriores a eso se validan acá antes de devolver el stream.
+        """
+        jobs = self._jobs_del_lote(lote_id)
+        completados = [j for j in jobs if j.estado == ESTADO_COMPLETADO]
+        faltantes = len(jobs) - len(completados)
+        if faltantes and not omitir_faltantes:
+            raise TributarioException(f"El lote {lote_id} tiene {faltantes} de {len(jobs)} documentos sin completar.")
+
+        documentos = []
+        for job in completados:
+            if self._paginas(job) is None:
+                # Igual que en el índice: sin resultado no ocupa páginas
+                if omitir_faltantes:
+                    continue
+                raise TributarioException(f"El resultado del job {job.job_id} ({self._titulo(job)}) ya no está disponible.")
+            documentos.append(job)
+        if not documentos:
+            raise TributarioException(f"El lote {lote_id} no tiene documentos convertidos.")
+        return self.union_pdf_service.unir(
+            (self._titulo(job), partial(self.repository.obtener_resultado, job.job_id)) for job in documentos
+        )
+
+    def indice_lote(self, lote_id: str) -> IndiceLoteDTO:
+        """ Página donde empieza cada documento en el PDF unido (los que no tienen resultado no ocupan páginas). """
+        documentos = []
+        siguiente = 1
+        for job in self._jobs_del_lote(lote_id):
+            paginas = self._paginas(job) if job.estado == ESTADO_COMPLETADO else None
+            documentos.append(DocumentoLoteDTO(job_id=job.job_id, demanda_id=job.demanda_id, estado=job.estado,
+                                               pagina_inicio=siguiente if paginas else None, paginas=paginas))
+            siguiente += paginas or 0
+        return IndiceLoteDTO(lote_id=lote_id, total_paginas=siguiente - 1, documentos=documentos)
+
+    def _paginas(self, job: ConversionJobModel) -> Optional[int]:
+        """ Páginas guardadas al completar; los jobs anteriores a eso se cuentan leyendo el PDF. None si no está. """
+        if job.paginas is not None:
+            return job.paginas
+        pdf_bytes = self.repository.obtener_resultado(job.job_id)
+        if pdf_bytes is None:
+            return None
+        try:
+            return self.union_pdf_service.contar_paginas(pdf_bytes)
+        except TributarioException as e:
+            raise TributarioException(f"El PDF de '{self._titulo(job)}' no se puede unir: {e.mensaje}")
+
+    def _jobs_del_lote(self, lote_id: str) -> List[ConversionJobModel]:
+        jobs = self.repository.listar_por_lote(lote_id) if lote_id else []
+        if not jobs:
+            raise TributarioException(f"No existe el lote {lote_id}")
+        return jobs
+
+    @staticmethod
+    def _titulo(job: ConversionJobModel) -> str:
+        return job.demanda_id or job.job_id
+
+    def _obtener_job(self, job_id: str) -> ConversionJobModel:
+        job = self.repository.obtener(job_id)
+        if job is None:
+            raise TributarioException(f"No existe el job {job_id}")
+        return job
@@ -1,24 +1,45 @@
+import hashlib
+import json
+import os
 import re
-from typing import Optional, Tuple
+import shutil
+import tempfile
+import time
+import zipfile
+from typing import Optional, Tuple, AsyncIterator, List
+
+from fastapi.concurrency import run_in_threadpool
 
 from exceptions.tributarios_exception import TributarioException
+from services.control_admision_service import CONVERSION_FASE
+from services.metricas_service import BUCKETS_BYTES, registrar_fase, registro
+from services.pdf_cache_service import PdfCacheService
 from services.word_to_pdf_converter_service import WordToPdfConverterService
+from settings.config import settings
 
+CONVERSION_BYTES = registro.histograma(
+    "conversion_tamano_bytes", "Tamaño de los DOCX recibidos y de los PDF generados", ("tipo",), buckets=BUCKETS_BYTES
+)
 
 
 class FilesConverterFacade:
-    def __init__(self, word_to_pdf_service: WordToPdfConverterService):
+    def __init__(self, word_to_pdf_service: WordToPdfConverterService, pdf_cache: Optional[PdfCacheService] = None):
         self.word_to_pdf_service = word_to_pdf_service
+        self.pdf_cache = pdf_cache
 
-    def convertir_word_a_pdf(
+    async def convertir_word_a_pdf(
         self,
-        archivo_docx: bytes,
+        contenido: AsyncIterator[bytes],
         content_type: Optional[str],
         original_filename: Optional[str],
         suggested_filename: Optional[str],
         is_multipart: bool = False,
-    ) -> Tuple[bytes, str]:
-
+    ) -> Tuple[str, str, str]:
+        """
+        Recibe el DOCX en chunks directo a disco (calculando la clave del cache al vuelo),
+        convierte y devuelve (path_pdf, nombre_salida, directorio_temporal).
+        El PDF se sirve desde disco; el llamador borra el directorio al terminar de enviarlo.
+        """
         ct = (content_type or "").lower()
         is_octet = ct.startswith("application/octet-stream")
 
@@ -28,16 +49,147 @@ class FilesConverterFacade:
                 "Content-Type no soportado. Use multipart/form-data o application/octet-stream."
             )
 
-        # No vacío
-        if not archivo_docx:
-            raise TributarioException("No se pudo convertir: el archivo vino vacío.")
+        # Sin capacidad: rechazar antes de recibir el archivo
+        self.word_to_pdf_service.admision.verificar()
 
         # Determinar nombre de salida
         out_name = self._build_output_filename(suggested_filename, original_filename)
 
-        # Convertir
-        pdf_bytes = self.word_to_pdf_service.convertir_docx_a_pdf(archivo_docx=archivo_docx)
-        return pdf_bytes, out_name
+        tmpdir = tempfile.mkdtemp(prefix="conv_", dir=self.word_to_pdf_service.directorio_temporal)
+        try:
+            path_docx = os.path.join(tmpdir, "entrada.docx")
+            path_pdf = os.path.join(tmpdir, "entrada.pdf")
+
+            h = hashlib.sha256()
+            tamano = 0
+            escritura = 0.0
+            with open(path_docx, "wb") as f:
+                async for chunk in contenido:
+                    desde = time.perf_counter()
+                    h.update(chunk)
+                    f.write(chunk)
+                    escritura += time.perf_counter() - desde
+                    tamano += len(chunk)
+            # Solo el tiempo propio (hash + escritura), sin la espera de la red
+            registrar_fase("escritura_temporal", escritura, CONVERSION_FASE)
+
+            # No vacío
+            if not tamano:
+                raise TributarioException("No se pudo convertir: el archivo vino vacío.")
+
+            # Convertir (bloqueante: fuera del event loop)
+            clave = self.pdf_cache.finalizar_clave(h, filtro=self.word_to_pdf_service.filtro_pdf) if self.pdf_cache else None
+            await run_in_threadpool(self.convertir_archivo, path_docx, path_pdf, clave)
+            CONVERSION_BYTES.observar(tamano, tipo="entrada")
+            CONVERSION_BYTES.observar(os.path.getsize(path_pdf), tipo="salida")
+            return path_pdf, out_name, tmpdir
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+
+    def convertir_archivo(self, path_docx: str, path_pdf: str, clave: Optional[str] = None) -> None:
+        """ Conversión disco a disco; con cache, un hit es un hardlink al PDF ya convertido. """
+        if self.pdf_cache is None or clave is None:
+            self.word_to_pdf_service.convertir_archivo(path_docx, path_pdf)
+            return
+        self.pdf_cache.obtener_o_convertir_archivo(
+            clave, lambda: self.word_to_pdf_service.convertir_archivo(path_docx, path_pdf), path_pdf
+        )
+
+    async def convertir_lote(self, archivos: List[Tuple[str, AsyncIterator[bytes]]]) -> Tuple[str, str]:
+        """
+        Recibe N DOCX (nombre, chunks) y los convierte en una sola corrida de LibreOffice
+        (los que ya estén en cache no se vuelven a convertir). Devuelve (path_zip, directorio_temporal):
+        un ZIP con un PDF por entrada que se pudo convertir y 'errores.json' con las que no.
+        """
+        if not archivos:
+            raise TributarioException("El lote no tiene archivos para convertir.")
+        if len(archivos) > settings.conversion_lote_max_archivos:
+            raise TributarioException(f"El lote supera el máximo de {settings.conversion_lote_max_archivos} archivos.")
+        self.word_to_pdf_service.admision.verificar()
+
+        tmpdir = tempfile.mkdtemp(prefix="conv_lote_", dir=self.word_to_pdf_service.directorio_temporal)
+        try:
+            entradas, claves, tamanos, nombres = [], [], [], []
+            for i, (nombre, contenido) in enumerate(archivos):
+                path_docx = os.path.join(tmpdir, f"doc_{i:04d}.docx")
+                h = hashlib.sha256()
+                tamano = 0
+                with open(path_docx, "wb") as f:
+                    async for chunk in contenido:
+                        h.update(chunk)
+                        f.write(chunk)
+                        tamano += len(chunk)
+                CONVERSION_BYTES.observar(tamano, tipo="entrada")
+                entradas.append(path_docx)
+                claves.append(self.pdf_cache.finalizar_clave(h, filtro=self.word_to_pdf_service.filtro_pdf)
+                              if self.pdf_cache else None)
+                tamanos.append(tamano)
+                nombres.append(f"{i + 1:05d}_{self._build_output_filename(None, nombre)}")
+
+            path_zip = await run_in_threadpool(self._convertir_y_empaquetar, tmpdir, entradas, claves, tamanos, nombres)
+            return path_zip, tmpdir
+        except BaseException:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+
+    def _convertir_y_empaquetar(self, tmpdir: str, entradas: List[str], claves: List[Optional[str]],
+                                tamanos: List[int], nombres: List[str]) -> str:
+        errores: List[Optional[Exception]] = [None] * len(entradas)
+        a_convertir = []
+        for i, path_docx in enumerate(entradas):
+            if not tamanos[i]:
+                errores[i] = TributarioException("No se pudo convertir: el archivo vino vacío.")
+            elif not (self.pdf_cache and self.pdf_cache.obtener_archivo(claves[i], self._ruta_pdf(path_docx, tmpdir))):
+                a_convertir.append(i)
+
+        if a_convertir:
+            resultado = self.word_to_pdf_service.convertir_lote_archivos([entradas[i] for i in a_convertir], tmpdir,
+                                                                         reintentar_pendientes=True)
+            for i, error in zip(a_convertir, resultado):
+                errores[i] = error
+                if error is None and self.pdf_cache is not None:
+                    self.pdf_cache.guardar_archivo(claves[i], self._ruta_pdf(entradas[i], tmpdir))
+
+        path_zip = os.path.join(tmpdir, "lote.zip")
+        detalle = []
+        with zipfile.ZipFile(path_zip, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for i, path_docx in enumerate(entradas):
+                if errores[i] is None:
+                    path_pdf = self._ruta_pdf(path_docx, tmpdir)
+                    CONVERSION_BYTES.observar(os.path.getsize(path_pdf), tipo="salida")
+                    zf.write(path_pdf, arcname=nombres[i])
+                else:
+                    mensaje = errores[i].mensaje if isinstance(errores[i], TributarioException) else str(errores[i])
+                    detalle.append({"indice": i, "archivo": nombres[i], "error": mensaje})
+            resumen = {"total": len(entradas), "generados": len(entradas) - len(detalle), "errores": detalle}
+            zf.writestr("errores.json", json.dumps(resumen, ensure_ascii=False, indent=2))
+        return path_zip
+
+    @staticmethod
+    def _ruta_pdf(path_docx: str, directorio: str) -> str:
+        return WordToPdfConverterService.ruta_pdf(path_docx, directorio)
+
+    def convertir_docx(self, archivo_docx: bytes) -> bytes:
+        """ Convierte o sirve desde cache si ya se convirtió este mismo DOCX. """
+        CONVERSION_BYTES.observar(len(archivo_docx), tipo="entrada")
+        if self.pdf_cache is None:
+            pdf_bytes = self.word_to_pdf_service.convertir_docx_a_pdf(archivo_docx=archivo_docx)
+        else:
+            clave = self.pdf_cache.calcular_clave(archivo_docx, filtro=self.word_to_pdf_service.filtro_pdf)
+            pdf_bytes = self.pdf_cache.obtener_o_convertir(
+                clave, lambda: self.word_to_pdf_service.convertir_docx_a_pdf(archivo_docx=archivo_docx)
+            )
+        CONVERSION_BYTES.observar(len(pdf_bytes), tipo="salida")
+        return pdf_bytes
+
+    def obtener_estadisticas_cache(self) -> dict:
+        if self.pdf_cache is None:
+            return {"habilitado": False}
+        return {"habilitado": True, **self.pdf_cache.estadisticas()}
+
+    def obtener_estadisticas_admision(self) -> dict:
+        return self.word_to_pdf_service.admision.estadisticas()
 
 
     # ----------------- helpers -----------------
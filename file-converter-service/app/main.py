@@ -1,10 +1,27 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from pymongo import MongoClient
 from fastapi.middleware.cors import CORSMiddleware
 
+from exceptions.servicio_saturado_exception import ServicioSaturadoException
 from exceptions.tributarios_exception import TributarioException
+from facades.conversion_jobs_facade import ConversionJobsFacade
 from facades.files_converter_facade import FilesConverterFacade
-from presentation.handler import global_exception_handler,tributario_exception_handler
+from presentation.handler import global_exception_handler,tributario_exception_handler,servicio_saturado_exception_handler
+from presentation.metricas_controller import get_metricas_router
+from presentation.metricas_middleware import MetricasMiddleware
+from presentation.conversion_jobs_controller import get_conversion_jobs_router
 from presentation.files_converter_controller import get_files_converter_router
+from repositories.conversion_jobs_repository import MongoConversionJobsRepository, MemoriaConversionJobsRepository
+from services.control_admision_service import ControlAdmisionService
+from services.conversion_worker_service import ConversionWorkerService
+from services.espacios_trabajo_service import EspaciosTrabajoService
+from services.libreoffice_pool_service import LibreOfficePoolService
+from services.metricas_service import registro
+from services.micro_lotes_service import MicroLotesConversionService
+from services.pdf_cache_service import PdfCacheService
+from services.union_pdf_service import UnionPdfService
 from services.word_to_pdf_converter_service import WordToPdfConverterService
 from settings.config import settings,logger
 from services.health_service import HealthService
@@ -14,15 +31,127 @@ import logging
 logger.info(f"Iniciando aplicación de files converter con configuracion: {settings}")
 
 # Instanciar las dependencias
-word_to_pdf_service = WordToPdfConverterService()
-files_converter_facade = FilesConverterFacade(word_to_pdf_service=word_to_pdf_service)
-health_service = HealthService()
+admision = ControlAdmisionService(
+    min_slots=settings.conversion_slots_min,
+    # Con pool no tiene sentido admitir más conversiones que instancias
+    max_slots=settings.pool_instancias if settings.conversion_modo == "pool" else (settings.conversion_slots_max or None),
+    mb_por_slot=settings.conversion_mb_por_slot,
+    min_memoria_mb=settings.conversion_memoria_minima_mb,
+    max_cola=settings.conversion_cola_max,
+    max_espera_segundos=settings.conversion_espera_max_segundos,
+    tolerancia_latencia=settings.conversion_tolerancia_latencia,
+    intervalo_ajuste_segundos=settings.conversion_ajuste_intervalo_segundos,
+    memoria_disponible_mb=HealthService.get_available_memory,
+)
+# Un slot por conversión simultánea posible (el límite adaptativo nunca supera max_slots)
+espacios_trabajo = EspaciosTrabajoService(settings.conversion_espacios_directorio, cantidad=admision.max_slots)
+word_to_pdf_service = WordToPdfConverterService(
+    soffice_cmd=settings.soffice_cmd,
+    timeout_seconds=settings.conversion_timeout_segundos,
+    admision=admision,
+    directorio_temporal=settings.conversion_directorio_temporal,
+    espacios=espacios_trabajo,
+    timeout_lote_max_segundos=settings.conversion_lote_timeout_max_segundos,
+)
+libreoffice_pool = None
+if settings.conversion_modo == "pool":
+    libreoffice_pool = LibreOfficePoolService(
+        soffice_cmd=word_to_pdf_service.soffice,
+        tamano=settings.pool_instancias,
+        max_conversiones=settings.pool_max_conversiones,
+        max_rss_mb=settings.pool_max_rss_mb,
+        directorio_perfiles=settings.pool_directorio_perfiles,
+        python_uno=settings.pool_python_uno,
+        timeout_seconds=settings.conversion_timeout_segundos,
+        intervalo_salud_segundos=settings.pool_intervalo_salud_segundos,
+    )
+    word_to_pdf_service.pool = libreoffice_pool
+micro_lotes = None
+if libreoffice_pool is None and settings.conversion_micro_lote_ventana_ms > 0:
+    micro_lotes = MicroLotesConversionService(
+        convertir_lote=word_to_pdf_service.convertir_lote_archivos,
+        ventana_ms=settings.conversion_micro_lote_ventana_ms,
+        max_lote=settings.conversion_micro_lote_max,
+        # Cada lote espera su slot en el control de admisión (que es quien limita y rechaza)
+        max_lotes_en_paralelo=admision.max_slots + admision.max_cola,
+        directorio_temporal=settings.conversion_directorio_temporal,
+        # Peor caso: ventana + esperas de admisión (lote y reintento) + corrida del lote + reintento de a uno
+        timeout_espera_segundos=settings.conversion_micro_lote_ventana_ms / 1000
+        + 3 * settings.conversion_espera_max_segundos
+        + word_to_pdf_service.timeout_lote_max_segundos + settings.conversion_timeout_segundos,
+    )
+    word_to_pdf_service.micro_lotes = micro_lotes
+pdf_cache = None
+if settings.cache_habilitado:
+    pdf_cache = PdfCacheService(
+        directorio=settings.cache_directorio,
+        max_bytes=settings.cache_max_mb * 1024 * 1024,
+        max_edad_segundos=settings.cache_max_edad_horas * 3600,
+    )
+files_converter_facade = FilesConverterFacade(word_to_pdf_service=word_to_pdf_service, pdf_cache=pdf_cache)
+
+# Cola de jobs de conversión asincrónica
+if settings.jobs_cola == "mongo":
+    if not settings.mongo_url:
+        raise TributarioException("Falta MONGO_URL para la cola de jobs (o configure JOBS_COLA=memoria).")
+    mongo_client = MongoClient(settings.mongo_url)
+    db = mongo_client.get_default_database()
+    jobs_repository = MongoConversionJobsRepository(db["conversion_jobs"], retencion_horas=settings.jobs_retencion_horas)
+else:
+    jobs_repository = MemoriaConversionJobsRepository()
+union_pdf_service = UnionPdfService()
+conversion_jobs_facade = ConversionJobsFacade(jobs_repository, union_pdf_service=union_pdf_service,
+                                              max_intentos=settings.jobs_max_intentos)
+conversion_worker = ConversionWorkerService(
+    repository=jobs_repository,
+    convertir=files_converter_facade.convertir_docx,
+    contar_paginas=union_pdf_service.contar_paginas,
+    cantidad_workers=settings.jobs_workers,
+    visibilidad_segundos=settings.jobs_visibilidad_segundos,
+    backoff_base_segundos=settings.jobs_backoff_base_segundos,
+    backoff_max_segundos=settings.jobs_backoff_max_segundos,
+    intervalo_sondeo_segundos=settings.jobs_intervalo_sondeo_segundos,
+)
+
+# Ocupación de slots y colas (se leen al exportar /metrics)
+registro.gauge("conversion_slots_limite", "Límite actual de conversiones simultáneas", funcion=lambda: admision.limite)
+registro.gauge("conversion_slots_en_uso", "Conversiones en curso", funcion=lambda: admision.estadisticas()["en_uso"])
+registro.gauge("conversion_cola_esperando", "Conversiones esperando slot", funcion=lambda: admision.estadisticas()["esperando"])
+if micro_lotes is not None:
+    registro.gauge("conversion_micro_lote_pendientes", "Conversiones esperando armar un micro-lote",
+                   funcion=micro_lotes.pendientes)
+
+health_service = HealthService(
+    min_available_mb=settings.conversion_memoria_minima_mb, libreoffice_pool=libreoffice_pool, admision=admision
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    espacios_trabajo.iniciar()
+    if libreoffice_pool is not None:
+        libreoffice_pool.iniciar()
+    if micro_lotes is not None:
+        micro_lotes.iniciar()
+    if isinstance(jobs_repository, MongoConversionJobsRepository):
+        jobs_repository.crear_indices()
+    conversion_worker.iniciar()
+    yield
+    conversion_worker.detener()
+    if micro_lotes is not None:
+        micro_lotes.detener()
+    if libreoffice_pool is not None:
+        libreoffice_pool.detener()
+    espacios_trabajo.detener()
 
 
-app = FastAPI(docs_url="/archivos/docs",openapi_url="/archivos/openapi.json")
+app = FastAPI(docs_url="/archivos/docs",openapi_url="/archivos/openapi.json", lifespan=lifespan)
 
 app.include_router(get_files_converter_router(files_converter_facade), prefix="/archivos/api", tags=["Archivos"])
+app.include_router(get_conversion_jobs_router(conversion_jobs_facade), prefix="/archivos/api", tags=["Jobs"])
 app.include_router(get_health_router(health_service))
+app.include_router(get_metricas_router(registro))
+app.add_exception_handler(ServicioSaturadoException,servicio_saturado_exception_handler)
 app.add_exception_handler(TributarioException,tributario_exception_handler)
 app.add_exception_handler(Exception,global_exception_handler)
 
@@ -32,6 +161,7 @@ class HealthEndpointFilter(logging.Filter):
         return not (
             "GET /health" in record.getMessage()
             or "POST /health" in record.getMessage()
+            or "GET /metrics" in record.getMessage()
         )
 
 # Agregar el filtro al logger de access logs de uvicorn
@@ -51,3 +181,4 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricasMiddleware)
@@ -0,0 +1,100 @@
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, Form, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from domain.dtos.files_converter_dto import BaseResponseDTO, EstadoJobDTO, PlantillaConvertirDTO, IndiceLoteDTO
+from facades.conversion_jobs_facade import ConversionJobsFacade
+from facades.files_converter_facade import FilesConverterFacade
+
+
+def get_conversion_jobs_router(facade: ConversionJobsFacade) -> APIRouter:
+    router = APIRouter()
+
+    @router.post(
+        "/jobs",
+        response_model=BaseResponseDTO[str],
+        summary="Encola un DOCX para convertir a PDF y devuelve el job_id",
+    )
+    async def encolar_conversion(
+        file: UploadFile = File(description="DOCX vía multipart/form-data en el campo 'file'"),
+        job_id: str = Form(default=""),
+        lote_id: str = Form(default=""),
+        demanda_id: str = Form(default=""),
+        ubicacion_obs: str = Form(default=""),
+        usuario_id: str = Form(default=""),
+        actuacion_tipo: str = Form(default=""),
+        actuacion_descripcion: str = Form(default=""),
+        plantilla_nombre: str = Form(default=""),
+        filename: Optional[str] = Query(
+            default=None,
+            description="Nombre sugerido para el PDF de salida (sin extensión)",
+        ),
+    ):
+        docx_bytes = await file.read()
+        datos = PlantillaConvertirDTO(
+            job_id=job_id,
+            lote_id=lote_id,
+            demanda_id=demanda_id,
+            ubicacion_obs=ubicacion_obs,
+            usuario_id=usuario_id,
+            actuacion_tipo=actuacion_tipo,
+            actuacion_descripcion=actuacion_descripcion,
+            plantilla_nombre=plantilla_nombre,
+        )
+        # Sube el DOCX a GridFS e inserta el job (bloqueante): fuera del event loop
+        nuevo_id = await run_in_threadpool(facade.encolar_conversion, docx_bytes, datos, filename or "")
+        return BaseResponseDTO[str](error=False, data=nuevo_id)
+
+    @router.get("/jobs/{job_id}", response_model=BaseResponseDTO[EstadoJobDTO])
+    def obtener_estado(job_id: str):
+        data = facade.obtener_estado(job_id)
+        return BaseResponseDTO[EstadoJobDTO](error=False, data=data)
+
+    @router.get(
+        "/jobs/{job_id}/resultado",
+        summary="Descarga el PDF de un job completado",
+        responses={200: {"content": {"application/pdf": {}}}},
+    )
+    def obtener_resultado(job_id: str):
+        pdf_bytes, out_name = facade.obtener_resultado(job_id)
+        return StreamingResponse(
+            content=iter([pdf_bytes]),
+            media_type="application/pdf",
+            headers={
+                "Content-Disposition": f'attachment; filename="{out_name}"',
+                "Content-Length": str(len(pdf_bytes)),
+            },
+        )
+
+    @router.get(
+        "/lotes/{lote_id}/pdf",
+        summary="Descarga un único PDF con todos los documentos del lote, listo para imprimir",
+        responses={200: {"content": {"application/pdf": {}}}},
+    )
+    def obtener_pdf_lote(
+        lote_id: str,
+        omitir_faltantes: bool = Query(
+            default=False,
+            description="Unir lo que ya está convertido aunque haya jobs pendientes o fallidos",
+        ),
+    ):
+        contenido = facade.unir_lote(lote_id, omitir_faltantes)
+        out_name = FilesConverterFacade._build_output_filename(f"lote_{lote_id}", None)
+        return StreamingResponse(
+            content=contenido,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="{out_name}"'},
+        )
+
+    @router.get(
+        "/lotes/{lote_id}/indice",
+        response_model=BaseResponseDTO[IndiceLoteDTO],
+        summary="Página donde empieza cada demanda_id dentro del PDF unido del lote",
+    )
+    def obtener_indice_lote(lote_id: str):
+        data = facade.indice_lote(lote_id)
+        return BaseResponseDTO[IndiceLoteDTO](error=False, data=data)
+
+    return router
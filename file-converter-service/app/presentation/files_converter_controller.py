@@ -1,10 +1,24 @@
-from typing import Optional
+import shutil
+from typing import Optional, AsyncIterator, List
 from fastapi import APIRouter, UploadFile, File, Request, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from domain.dtos.files_converter_dto import BaseResponseDTO
 from facades.files_converter_facade import FilesConverterFacade
 from settings.config import logger
 
 
+_TAMANO_CHUNK = 1024 * 1024
+
+
+async def _leer_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(_TAMANO_CHUNK)
+        if not chunk:
+            break
+        yield chunk
+
+
 def get_files_converter_router(facade: FilesConverterFacade) -> APIRouter:
     router = APIRouter()
 
@@ -32,31 +46,62 @@ def get_files_converter_router(facade: FilesConverterFacade) -> APIRouter:
         # ¿Es multipart?
         is_multipart = (file is not None) or ("multipart/form-data" in content_type)
 
-        # Leer bytes + metadata
+        # Origen de los bytes (se leen en chunks, sin cargar el archivo entero)
         if is_multipart and file is not None:
-            docx_bytes = await file.read()
+            contenido = _leer_upload(file)
             original_filename = file.filename or ""
         else:
             # modo octet-stream / raw body
-            docx_bytes = await request.body()
+            contenido = request.stream()
             original_filename = ""
 
         # Delegar en el facade (pasamos también el flag is_multipart)
-        pdf_bytes, out_name = facade.convertir_word_a_pdf(
-            archivo_docx=docx_bytes,
+        path_pdf, out_name, tmpdir = await facade.convertir_word_a_pdf(
+            contenido=contenido,
             content_type=content_type,
             original_filename=original_filename,
             suggested_filename=filename,
             is_multipart=is_multipart,
         )
 
-        return StreamingResponse(
-            content=iter([pdf_bytes]),
+        # El PDF se envía desde disco en chunks; el directorio temporal se borra al terminar
+        return FileResponse(
+            path_pdf,
             media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="{out_name}"',
-                "Content-Length": str(len(pdf_bytes)),
-            },
+            headers={"Content-Disposition": f'attachment; filename="{out_name}"'},
+            background=BackgroundTask(shutil.rmtree, tmpdir, ignore_errors=True),
         )
 
+    @router.post(
+        "/convertir_lote",
+        summary="Convierte varios DOCX en una sola corrida de LibreOffice y devuelve un ZIP con los PDF",
+        responses={200: {"content": {"application/zip": {}}}},
+    )
+    async def convertir_lote(
+        files: List[UploadFile] = File(description="DOCX vía multipart/form-data, uno por campo 'files'"),
+    ):
+        path_zip, tmpdir = await facade.convertir_lote([(f.filename or "", _leer_upload(f)) for f in files])
+        return FileResponse(
+            path_zip,
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="lote.zip"'},
+            background=BackgroundTask(shutil.rmtree, tmpdir, ignore_errors=True),
+        )
+
+    @router.get(
+        "/cache/estadisticas",
+        response_model=BaseResponseDTO[dict],
+        summary="Hits/misses y ocupación del cache de PDFs",
+    )
+    def estadisticas_cache():
+        return BaseResponseDTO[dict](error=False, data=facade.obtener_estadisticas_cache())
+
+    @router.get(
+        "/admision/estadisticas",
+        response_model=BaseResponseDTO[dict],
+        summary="Slots de conversión, cola de espera y rechazos del control de admisión",
+    )
+    def estadisticas_admision():
+        return BaseResponseDTO[dict](error=False, data=facade.obtener_estadisticas_admision())
+
     return router
\ No newline at end of file
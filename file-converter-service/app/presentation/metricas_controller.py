@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metricas_service import RegistroMetricas
+
+
+def get_metricas_router(registro: RegistroMetricas) -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/metrics", tags=["Metricas"], response_class=PlainTextResponse, include_in_schema=False)
+    def metricas():
+        return PlainTextResponse(registro.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return router
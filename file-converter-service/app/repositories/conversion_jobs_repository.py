@@ -0,0 +1,282 @@
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import gridfs
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from services.metricas_service import instrumentar_repositorio
+from domain.models.conversion_job_model import ConversionJobModel, ESTADO_PENDIENTE, ESTADO_PROCESANDO, \
+    ESTADO_COMPLETADO, ESTADO_DEAD_LETTER
+
+
+class ConversionJobsRepository(ABC):
+    """
+    Cola de jobs de conversión. Un job tomado queda invisible `visibilidad_segundos`;
+    si el worker muere sin completarlo, vuelve a estar disponible al vencer ese plazo.
+    Los `intentos` que devuelve `tomar` son el lease: completar/reintentar/dead letter solo actúan si el job
+    sigue PROCESANDO con esos intentos, y si no (otro worker lo retomó) no tocan nada y devuelven False.
+    """
+
+    @abstractmethod
+    def encolar(self, job: ConversionJobModel, archivo_docx: bytes) -> str:
+        """ Idempotente por job_id: si ya existe no encola de nuevo. Devuelve el job_id. """
+
+    @abstractmethod
+    def tomar(self, visibilidad_segundos: int) -> Optional[Tuple[ConversionJobModel, bytes]]: ...
+
+    @abstractmethod
+    def completar(self, job_id: str, intentos: int, pdf_bytes: bytes, paginas: Optional[int] = None) -> bool: ...
+
+    @abstractmethod
+    def reintentar(self, job_id: str, intentos: int, error: str, demora_segundos: float) -> bool: ...
+
+    @abstractmethod
+    def mover_a_dead_letter(self, job_id: str, intentos: int, error: str) -> bool: ...
+
+    @abstractmethod
+    def obtener(self, job_id: str) -> Optional[ConversionJobModel]: ...
+
+    @abstractmethod
+    def obtener_resultado(self, job_id: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    def listar_por_lote(self, lote_id: str) -> List[ConversionJobModel]:
+        """ Jobs del lote en el orden en que se encolaron (sin el DOCX ni el PDF). """
+
+    def purgar_archivos_vencidos(self) -> int:
+        """ Borra archivos que quedaron sin job (la limpieza TTL no los alcanza). Devuelve cuántos borró. """
+        return 0
+
+
+@instrumentar_repositorio("conversion_jobs")
+class MongoConversionJobsRepository(ConversionJobsRepository):
+    """
+    El job guarda solo la referencia (`entrada_id`, `resultado_id`) al DOCX y al PDF, que van a GridFS
+    ('<coleccion>_archivos'): inline chocaban con el límite de 16 MB por documento de Mongo.
+    """
+
+    _SIN_ARCHIVOS = {"_id": 0, "entrada": 0, "entrada_id": 0, "resultado": 0, "resultado_id": 0}
+
+    def __init__(self, collection: Collection, retencion_horas: int = 72):
+        self.collection = collection
+        self.retencion_horas = retencion_horas
+        self.bucket = gridfs.GridFSBucket(collection.database, bucket_name=f"{collection.name}_archivos")
+
+    def crear_indices(self) -> None:
+        self.collection.create_index([("job_id", ASCENDING)], unique=True)
+        self.collection.create_index([("estado", ASCENDING), ("visibleDesde", ASCENDING), ("fechaCreacion", ASCENDING)])
+        self.collection.create_index([("lote_id", ASCENDING), ("fechaCreacion", ASCENDING)])
+        # Limpieza automática de jobs viejos (completados o no)
+        self.collection.create_index("fechaActualizacion", expireAfterSeconds=self.retencion_horas * 3600)
+
+    def encolar(self, job: ConversionJobModel, archivo_docx: bytes) -> str:
+        doc = job.model_dump()
+        doc["entrada_id"] = self.bucket.upload_from_stream(f"{job.job_id}.docx", archivo_docx)
+        try:
+            self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            # Mismo job_id encolado antes (o en paralelo): vale el existente
+            self._borrar(doc["entrada_id"])
+        return job.job_id
+
+    def tomar(self, visibilidad_segundos: int) -> Optional[Tuple[ConversionJobModel, bytes]]:
+        ahora = datetime.now()
+        cambios = {
+            "estado": ESTADO_PROCESANDO,
+            "visibleDesde": ahora + timedelta(seconds=visibilidad_segundos),
+            "fechaActualizacion": ahora,
+        }
+        # Toma atómica: el primer worker que lo actualiza se queda con el job
+        data = self.collection.find_one_and_update(
+            {"estado": {"$in": [ESTADO_PENDIENTE, ESTADO_PROCESANDO]}, "visibleDesde": {"$lte": ahora}},
+            {"$set": cambios, "$inc": {"intentos": 1}},
+            sort=[("fechaCreacion", ASCENDING)],
+            projection={"_id": 0, "resultado": 0, "resultado_id": 0},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not data:
+            return None
+        # Vacío si el archivo ya no está: el worker lo manda a dead letter
+        archivo_docx = self._leer(data.pop("entrada_id", None), data.pop("entrada", None)) or b""
+        data.update(cambios)
+        data["intentos"] = data.get("intentos", 0) + 1
+        return ConversionJobModel(**data), archivo_docx
+
+    def completar(self, job_id: str, intentos: int, pdf_bytes: bytes, paginas: Optional[int] = None) -> bool:
+        resultado_id = self.bucket.upload_from_stream(f"{job_id}.pdf", pdf_bytes)
+        anterior = self.collection.find_one_and_update(
+            self._lease(job_id, intentos),
+            {
+                "$set": {"estado": ESTADO_COMPLETADO, "resultado_id": resultado_id, "paginas": paginas, "error": None,
+                         "fechaActualizacion": datetime.now()},
+                "$unset": {"entrada": "", "entrada_id": "", "resultado": ""},
+            },
+            projection={"_id": 0, "entrada_id": 1, "resultado_id": 1},
+        )
+        if anterior is None:
+            # Perdimos el lease: el PDF subido no queda referenciado
+            self._borrar(resultado_id)
+            return False
+        # El DOCX ya no hace falta; un PDF previo (otra conversión del mismo job) tampoco
+        self._borrar(anterior.get("entrada_id"))
+        self._borrar(anterior.get("resultado_id"))
+        return True
+
+    def reintentar(self, job_id: str, intentos: int, error: str, demora_segundos: float) -> bool:
+        ahora = datetime.now()
+        resultado = self.collection.update_one(
+            self._lease(job_id, intentos),
+            {"$set": {"estado": ESTADO_PENDIENTE, "error": error,
+                      "visibleDesde": ahora + timedelta(seconds=demora_segundos), "fechaActualizacion": ahora}},
+        )
+        return resultado.matched_count == 1
+
+    def mover_a_dead_letter(self, job_id: str, intentos: int, error: str) -> bool:
+        resultado = self.collection.update_one(
+            self._lease(job_id, intentos),
+            {"$set": {"estado": ESTADO_DEAD_LETTER, "error": error, "fechaActualizacion": datetime.now()}},
+        )
+        return resultado.matched_count == 1
+
+    def obtener(self, job_id: str) -> Optional[ConversionJobModel]:
+        data = self.collection.find_one({"job_id": job_id}, projection=self._SIN_ARCHIVOS)
+        if not data:
+            return None
+        return ConversionJobModel(**data)
+
+    def obtener_resultado(self, job_id: str) -> Optional[bytes]:
+        data = self.collection.find_one({"job_id": job_id, "estado": ESTADO_COMPLETADO},
+                                        projection={"_id": 0, "resultado": 1, "resultado_id": 1})
+        if not data:
+            return None
+        return self._leer(data.get("resultado_id"), data.get("resultado"))
+
+    def listar_por_lote(self, lote_id: str) -> List[ConversionJobModel]:
+        cursor = self.collection.find({"lote_id": lote_id}, projection=self._SIN_ARCHIVOS)
+        return [ConversionJobModel(**data) for data in cursor.sort([("fechaCreacion", ASCENDING), ("job_id", ASCENDING)])]
+
+    def purgar_archivos_vencidos(self) -> int:
+        # Archivos más viejos que la retención cuyo job ya lo borró el TTL (o nunca llegó a insertarse)
+        limite = datetime.now() - timedelta(hours=self.retencion_horas)
+        borrados = 0
+        for archivo in self.bucket.find({"uploadDate": {"$lt": limite}}):
+            en_uso = self.collection.find_one(
+                {"$or": [{"entrada_id": archivo._id}, {"resultado_id": archivo._id}]}, projection={"_id": 1}
+            )
+            if en_uso is None:
+                self._borrar(archivo._id)
+                borrados += 1
+        return borrados
+
+    @staticmethod
+    def _lease(job_id: str, intentos: int) -> dict:
+        return {"job_id": job_id, "estado": ESTADO_PROCESANDO, "intentos": intentos}
+
+    def _leer(self, archivo_id, inline) -> Optional[bytes]:
+        """ Contenido desde GridFS; `inline` cubre jobs encolados antes de pasar los archivos a GridFS. """
+        if archivo_id is None:
+            return bytes(inline) if inline is not None else None
+        try:
+            return self.bucket.open_download_stream(archivo_id).read()
+        except gridfs.errors.NoFile:
+            return None
+
+    def _borrar(self, archivo_id) -> None:
+        if archivo_id is None:
+            return
+        try:
+            self.bucket.delete(archivo_id)
+        except gridfs.errors.NoFile:
+            pass
+
+
+class MemoriaConversionJobsRepository(ConversionJobsRepository):
+    """ Implementación en memoria (un solo proceso): para tests y desarrollo local. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ConversionJobModel] = {}
+        self._entradas: Dict[str, bytes] = {}
+        self._resultados: Dict[str, bytes] = {}
+
+    def encolar(self, job: ConversionJobModel, archivo_docx: bytes) -> str:
+        with self._lock:
+            if job.job_id not in self._jobs:
+                self._jobs[job.job_id] = job.model_copy()
+                self._entradas[job.job_id] = archivo_docx
+        return job.job_id
+
+    def tomar(self, visibilidad_segundos: int) -> Optional[Tuple[ConversionJobModel, bytes]]:
+        ahora = datetime.now()
+        with self._lock:
+            disponibles = [
+                j for j in self._jobs.values()
+                if j.estado in (ESTADO_PENDIENTE, ESTADO_PROCESANDO) and j.visibleDesde <= ahora
+            ]
+            if not disponibles:
+                return None
+            job = min(disponibles, key=lambda j: j.fechaCreacion)
+            job.estado = ESTADO_PROCESANDO
+            job.visibleDesde = ahora + timedelta(seconds=visibilidad_segundos)
+            job.fechaActualizacion = ahora
+            job.intentos += 1
+            return job.model_copy(), self._entradas[job.job_id]
+
+    def completar(self, job_id: str, intentos: int, pdf_bytes: bytes, paginas: Optional[int] = None) -> bool:
+        with self._lock:
+            job = self._con_lease(job_id, intentos)
+            if job is None:
+                return False
+            job.estado = ESTADO_COMPLETADO
+            job.paginas = paginas
+            job.error = None
+            job.fechaActualizacion = datetime.now()
+            self._resultados[job_id] = pdf_bytes
+            self._entradas.pop(job_id, None)
+            return True
+
+    def reintentar(self, job_id: str, intentos: int, error: str, demora_segundos: float) -> bool:
+        ahora = datetime.now()
+        with self._lock:
+            job = self._con_lease(job_id, intentos)
+            if job is None:
+                return False
+            job.estado = ESTADO_PENDIENTE
+            job.error = error
+            job.visibleDesde = ahora + timedelta(seconds=demora_segundos)
+            job.fechaActualizacion = ahora
+            return True
+
+    def mover_a_dead_letter(self, job_id: str, intentos: int, error: str) -> bool:
+        with self._lock:
+            job = self._con_lease(job_id, intentos)
+            if job is None:
+                return False
+            job.estado = ESTADO_DEAD_LETTER
+            job.error = error
+            job.fechaActualizacion = datetime.now()
+            return True
+
+    def obtener(self, job_id: str) -> Optional[ConversionJobModel]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def obtener_resultado(self, job_id: str) -> Optional[bytes]:
+        with self._lock:
+            return self._resultados.get(job_id)
+
+    def listar_por_lote(self, lote_id: str) -> List[ConversionJobModel]:
+        with self._lock:
+            jobs = [j.model_copy() for j in self._jobs.values() if j.lote_id == lote_id]
+        return sorted(jobs, key=lambda j: (j.fechaCreacion, j.job_id))
+
+    def _con_lease(self, job_id: str, intentos: int) -> Optional[ConversionJobModel]:
+        job = self._jobs.get(job_id)
+        if job is None or job.estado != ESTADO_PROCESANDO or job.intentos != intentos:
+            return None
+        return job
@@ -0,0 +1,200 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from exceptions.servicio_saturado_exception import ServicioSaturadoException
+from services.metricas_service import registrar_fase, registro
+from settings.config import logger
+
+# Conversión: espera de slot (cola), escritura temporal, corrida de soffice, lectura del PDF
+CONVERSION_FASE = registro.histograma(
+    "conversion_fase_duracion_segundos", "Duración de cada fase de la conversión DOCX -> PDF", ("fase",)
+)
+RECHAZOS = registro.contador("conversion_rechazos_total", "Conversiones rechazadas por saturación (503)")
+
+
+class ControlAdmisionService:
+    """
+    Limita las conversiones simultáneas (slots) con un límite adaptativo:
+    - Arranca según CPUs y memoria disponible (`mb_por_slot` por conversión).
+    - Cada `intervalo_ajuste_segundos`: si la latencia sube más de `tolerancia_latencia`
+      veces sobre la de referencia o falta memoria, baja el límite (x0.75); si hay
+      demanda, sube de a un slot (AIMD) mientras la memoria alcance.
+    - Los que no consiguen slot esperan en una cola acotada (`max_cola`) hasta
+      `max_espera_segundos`; con la cola llena se rechaza al instante (503 + Retry-After).
+    - Solo las conversiones de un documento cuentan para la latencia: una corrida de N no es comparable
+      (y dividirla por N reparte el arranque de soffice y baja la referencia por debajo de una individual).
+    """
+
+    def __init__(
+        self,
+        min_slots: int = 1,
+        max_slots: Optional[int] = None,      # None = cantidad de CPUs
+        mb_por_slot: int = 300,
+        min_memoria_mb: int = 200,
+        max_cola: int = 32,
+        max_espera_segundos: float = 10,
+        tolerancia_latencia: float = 2.0,
+        intervalo_ajuste_segundos: float = 5,
+        memoria_disponible_mb: Optional[Callable[[], int]] = None,
+    ):
+        self.min_slots = max(1, min_slots)
+        self.max_slots = max(self.min_slots, max_slots or os.cpu_count() or 1)
+        self.mb_por_slot = max(1, mb_por_slot)
+        self.min_memoria_mb = min_memoria_mb
+        self.max_cola = max(0, max_cola)
+        self.max_espera_segundos = max_espera_segundos
+        self.tolerancia_latencia = tolerancia_latencia
+        self.intervalo_ajuste_segundos = intervalo_ajuste_segundos
+        self.memoria_disponible_mb = memoria_disponible_mb
+
+        self._cond = threading.Condition()
+        self._en_uso = 0
+        self._esperando = 0
+        self._latencia_ewma: Optional[float] = None
+        self._latencia_referencia: Optional[float] = None
+        self._proximo_ajuste = time.monotonic() + intervalo_ajuste_segundos
+
+        self.rechazados = 0
+        self.limite = self._limite_inicial()
+        logger.info(f"Control de admisión: {self.limite} slots (min={self.min_slots}, max={self.max_slots})")
+
+    # ----------------- API -----------------
+    @contextmanager
+    def slot(self, documentos: int = 1) -> Iterator[None]:
+        llegada = time.perf_counter()
+        try:
+            self.adquirir()
+        finally:
+            registrar_fase("cola", time.perf_counter() - llegada, CONVERSION_FASE)
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.liberar(time.monotonic() - inicio if documentos == 1 else None)
+
+    def adquirir(self) -> None:
+        """ Toma un slot o lanza ServicioSaturadoException (cola llena o se superó la espera máxima). """
+        with self._cond:
+            self._ajustar_si_corresponde()
+            if self._en_uso < self.limite and not self._esperando:
+                self._en_uso += 1
+                return
+            if self._esperando >= self.max_cola:
+                self._rechazar("No hay capacidad para convertir: la cola de espera está llena.")
+
+            self._esperando += 1
+            limite_espera = time.monotonic() + self.max_espera_segundos
+            try:
+                while self._en_uso >= self.limite:
+                    restante = limite_espera - time.monotonic()
+                    if restante <= 0:
+                        self._rechazar(
+                            f"No hay capacidad para convertir: se superó la espera máxima de {self.max_espera_segundos:g} segundos."
+                        )
+                    self._cond.wait(restante)
+                self._en_uso += 1
+            finally:
+                self._esperando -= 1
+
+    def liberar(self, duracion_segundos: Optional[float] = None) -> None:
+        with self._cond:
+            self._en_uso -= 1
+            if duracion_segundos is not None:
+                self._registrar_latencia(duracion_segundos)
+            self._ajustar_si_corresponde()
+            self._cond.notify()
+
+    def verificar(self) -> None:
+        """ Rechazo temprano (antes de recibir el archivo) si la cola ya está llena. """
+        with self._cond:
+            if self._en_uso >= self.limite and self._esperando >= self.max_cola:
+                self._rechazar("No hay capacidad para convertir: la cola de espera está llena.")
+
+    def hay_slots_libres(self) -> bool:
+        with self._cond:
+            return self._en_uso < self.limite
+
+    def estadisticas(self) -> dict:
+        with self._cond:
+            return {
+                "limite": self.limite,
+                "en_uso": self._en_uso,
+                "esperando": self._esperando,
+                "max_cola": self.max_cola,
+                "rechazados": self.rechazados,
+                "latencia_ewma_segundos": round(self._latencia_ewma, 3) if self._latencia_ewma is not None else None,
+                "latencia_referencia_segundos": round(self._latencia_referencia, 3) if self._latencia_referencia is not None else None,
+            }
+
+    # ----------------- internos -----------------
+    def _limite_inicial(self) -> int:
+        memoria = self._leer_memoria()
+        if memoria is None:
+            return self.max_slots
+        por_memoria = (memoria - self.min_memoria_mb) // self.mb_por_slot
+        return max(self.min_slots, min(self.max_slots, por_memoria))
+
+    def _leer_memoria(self) -> Optional[int]:
+        if self.memoria_disponible_mb is None:
+            return None
+        try:
+            return self.memoria_disponible_mb()
+        except Exception:
+            # Sin /proc/meminfo (p.ej. fuera de Linux): no se limita por memoria
+            return None
+
+    def _rechazar(self, mensaje: str) -> None:
+        """ Requiere self._cond tomado. """
+        self.rechazados += 1
+        RECHAZOS.incrementar()
+        raise ServicioSaturadoException(mensaje, retry_after_segundos=self._estimar_espera())
+
+    def _estimar_espera(self) -> int:
+        """ Tiempo aproximado hasta que se libere lugar para un pedido más. """
+        latencia = self._latencia_ewma or 1.0
+        return max(1, math.ceil(latencia * (self._esperando + 1) / self.limite))
+
+    def _registrar_latencia(self, duracion: float) -> None:
+        if self._latencia_ewma is None:
+            self._latencia_ewma = duracion
+        else:
+            self._latencia_ewma = 0.8 * self._latencia_ewma + 0.2 * duracion
+        # Referencia: la mejor latencia observada, que sube despacio si el tipo de carga cambia
+        if self._latencia_referencia is None or self._latencia_ewma < self._latencia_referencia:
+            self._latencia_referencia = self._latencia_ewma
+        else:
+            self._latencia_referencia = 0.99 * self._latencia_referencia + 0.01 * self._latencia_ewma
+
+    def _ajustar_si_corresponde(self) -> None:
+        """ Requiere self._cond tomado. """
+        ahora = time.monotonic()
+        if ahora < self._proximo_ajuste:
+            return
+        self._proximo_ajuste = ahora + self.intervalo_ajuste_segundos
+
+        anterior = self.limite
+        memoria = self._leer_memoria()
+        if memoria is not None and memoria < self.min_memoria_mb:
+            self.limite = max(self.min_slots, min(self.limite - 1, int(self.limite * 0.75)))
+            motivo = f"memoria disponible {memoria} MB"
+        elif (self._latencia_ewma is not None and self._latencia_referencia
+              and self._latencia_ewma > self._latencia_referencia * self.tolerancia_latencia):
+            self.limite = max(self.min_slots, min(self.limite - 1, int(self.limite * 0.75)))
+            motivo = f"latencia {self._latencia_ewma:.2f}s (referencia {self._latencia_referencia:.2f}s)"
+        elif self._esperando or self._en_uso >= self.limite:
+            techo = self.max_slots
+            if memoria is not None:
+                # Cada slot nuevo necesita `mb_por_slot` libres por encima del mínimo
+                techo = min(techo, self.limite + (memoria - self.min_memoria_mb) // self.mb_por_slot)
+            self.limite = max(self.limite, min(self.limite + 1, techo))
+            motivo = "demanda"
+        else:
+            return
+
+        if self.limite != anterior:
+            logger.info(f"Control de admisión: slots {anterior} -> {self.limite} ({motivo})")
+            self._cond.notify_all()
@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+
+from domain.models.conversion_job_model import ConversionJobModel
+from exceptions.tributarios_exception import TributarioException
+from repositories.conversion_jobs_repository import ConversionJobsRepository
+from settings.config import logger
+
+
+class ConversionWorkerService:
+    """
+    Workers que consumen la cola de jobs de conversión en hilos propios.
+    - Reintenta con backoff exponencial + jitter hasta `max_intentos`.
+    - Pasado ese límite el job queda en dead letter con el último error.
+    - El primer worker purga cada `intervalo_purga_segundos` los archivos que quedaron sin job.
+    - Con `contar_paginas` el PDF se valida al completar y sus páginas quedan en el job (un PDF ilegible
+      cuenta como falla de conversión); unir o indexar un lote no necesita volver a leerlo.
+    """
+
+    def __init__(
+        self,
+        repository: ConversionJobsRepository,
+        convertir: Callable[[bytes], bytes],
+        contar_paginas: Optional[Callable[[bytes], int]] = None,
+        cantidad_workers: int = 1,
+        visibilidad_segundos: int = 300,
+        backoff_base_segundos: float = 2.0,
+        backoff_max_segundos: float = 60.0,
+        intervalo_sondeo_segundos: float = 1.0,
+        intervalo_purga_segundos: float = 3600,
+    ):
+        self.repository = repository
+        self.convertir = convertir
+        self.contar_paginas = contar_paginas
+        self.cantidad_workers = max(1, cantidad_workers)
+        self.visibilidad_segundos = visibilidad_segundos
+        self.backoff_base_segundos = backoff_base_segundos
+        self.backoff_max_segundos = backoff_max_segundos
+        self.intervalo_sondeo_segundos = intervalo_sondeo_segundos
+        self.intervalo_purga_segundos = intervalo_purga_segundos
+
+        self._detenido = threading.Event()
+        self._hilos: List[threading.Thread] = []
+
+    def iniciar(self) -> None:
+        self._detenido.clear()
+        for i in range(self.cantidad_workers):
+            hilo = threading.Thread(target=self._loop, args=(i == 0,), name=f"conversion-worker-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def detener(self, timeout_segundos: float = 10) -> None:
+        self._detenido.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=timeout_segundos)
+        self._hilos = []
+
+    def _loop(self, purga: bool = False) -> None:
+        proxima_purga = time.monotonic()
+        while not self._detenido.is_set():
+            if purga and time.monotonic() >= proxima_purga:
+                proxima_purga = time.monotonic() + self.intervalo_purga_segundos
+                self._purgar()
+            try:
+                procesado = self.procesar_siguiente()
+            except Exception as e:
+                # Error de la cola (p.ej. Mongo caído): esperamos y seguimos
+                logger.error(f"Error en worker de conversión: {e}")
+                procesado = False
+            if not procesado:
+                self._detenido.wait(self.intervalo_sondeo_segundos)
+
+    def procesar_siguiente(self) -> bool:
+        """ Toma y procesa un job. Devuelve False si la cola estaba vacía. """
+        tomado = self.repository.tomar(self.visibilidad_segundos)
+        if tomado is None:
+            return False
+        job, archivo_docx = tomado
+
+        # Superó los intentos (p.ej. el worker murió procesándolo varias veces)
+        if job.intentos > job.max_intentos:
+            self._sin_lease(job, self.repository.mover_a_dead_letter(
+                job.job_id, job.intentos, job.error or "Se agotaron los reintentos."))
+            return True
+        if not archivo_docx:
+            self._sin_lease(job, self.repository.mover_a_dead_letter(
+                job.job_id, job.intentos, "El DOCX del job ya no está disponible."))
+            return True
+
+        try:
+            pdf_bytes = self.convertir(archivo_docx)
+            paginas = self.contar_paginas(pdf_bytes) if self.contar_paginas else None
+        except Exception as e:
+            error = e.mensaje if isinstance(e, TributarioException) else str(e)
+            if job.intentos >= job.max_intentos:
+                logger.error(f"Job {job.job_id} a dead letter luego de {job.intentos} intentos: {error}")
+                self._sin_lease(job, self.repository.mover_a_dead_letter(job.job_id, job.intentos, error))
+            else:
+                demora = self._calcular_backoff(job.intentos)
+                logger.warning(f"Job {job.job_id} falló (intento {job.intentos}), reintento en {demora:.1f}s: {error}")
+                self._sin_lease(job, self.repository.reintentar(job.job_id, job.intentos, error, demora))
+            return True
+
+        self._sin_lease(job, self.repository.completar(job.job_id, job.intentos, pdf_bytes, paginas))
+        return True
+
+    @staticmethod
+    def _sin_lease(job: ConversionJobModel, aplicado: bool) -> None:
+        if not aplicado:
+            # Se venció la visibilidad y otro worker retomó el job: su resultado es el que vale
+            logger.warning(f"Job {job.job_id}: lease del intento {job.intentos} perdido, se descarta el resultado")
+
+    def _purgar(self) -> None:
+        try:
+            borrados = self.repository.purgar_archivos_vencidos()
+        except Exception as e:
+            logger.error(f"No se pudieron purgar archivos de jobs vencidos: {e}")
+            return
+        if borrados:
+            logger.info(f"Purgados {borrados} archivos de jobs vencidos")
+
+    def _calcular_backoff(self, intento: int) -> float:
+        demora = min(self.backoff_max_segundos, self.backoff_base_segundos * (2 ** (intento - 1)))
+        # Full jitter para no sincronizar reintentos de muchos jobs
+        return random.uniform(demora / 2, demora)
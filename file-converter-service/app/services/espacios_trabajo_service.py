@@ -0,0 +1,119 @@
+import fcntl
+import os
+import queue
+import shutil
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from exceptions.tributarios_exception import TributarioException
+from settings.config import logger
+
+
+class EspacioTrabajo:
+    """ Slot de trabajo: perfil de LibreOffice persistente + directorio para entradas/salidas. """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self.perfil = os.path.join(directorio, "perfil")
+        self.trabajo = os.path.join(directorio, "trabajo")
+        # soffice terminó mal (timeout o rc != 0) usando este perfil: no se reutiliza tal cual
+        self.sucio = False
+        self._fd_lock = None
+
+    def reclamar(self) -> bool:
+        """ Toma el slot para este proceso (flock): varios workers de uvicorn pueden compartir el directorio base. """
+        os.makedirs(self.perfil, exist_ok=True)
+        os.makedirs(self.trabajo, exist_ok=True)
+        fd = os.open(os.path.join(self.directorio, ".slot.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd_lock = fd
+        return True
+
+    def soltar(self) -> None:
+        if self._fd_lock is not None:
+            os.close(self._fd_lock)
+            self._fd_lock = None
+
+    def limpiar(self) -> None:
+        """ Borra entradas y salidas; el perfil queda para la próxima conversión. """
+        _vaciar(self.trabajo)
+
+    def reiniciar_perfil(self) -> None:
+        """ El perfil puede haber quedado a medio escribir o con locks: se arma de nuevo en la próxima conversión. """
+        shutil.rmtree(self.perfil, ignore_errors=True)
+        os.makedirs(self.perfil, exist_ok=True)
+        self.sucio = False
+
+    def barrer(self) -> None:
+        """ Al arrancar: restos de una corrida que murió (archivos y locks del perfil). """
+        self.limpiar()
+        for lock in (os.path.join(self.perfil, ".lock"), os.path.join(self.perfil, "user", ".lock")):
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+
+
+class EspaciosTrabajoService:
+    """
+    Conjunto fijo de slots de trabajo para las conversiones con soffice.
+    - Cada slot reutiliza su perfil de LibreOffice (se inicializa en la primera conversión).
+    - Entre conversiones solo se borran los archivos de entrada/salida; si soffice falló, también el perfil.
+    - `directorio_base` puede ser un tmpfs (p.ej. /dev/shm) para no tocar disco.
+    """
+
+    def __init__(self, directorio_base: str, cantidad: int):
+        self.directorio_base = directorio_base
+        self.cantidad = max(1, cantidad)
+        self._libres: "queue.Queue[EspacioTrabajo]" = queue.Queue()
+        self._slots: List[EspacioTrabajo] = []
+
+    def iniciar(self) -> None:
+        os.makedirs(self.directorio_base, exist_ok=True)
+        indice = 0
+        # Los slots tomados por otro proceso se saltean: se usan los siguientes
+        while len(self._slots) < self.cantidad:
+            slot = EspacioTrabajo(os.path.join(self.directorio_base, f"slot_{indice:02d}"))
+            indice += 1
+            if not slot.reclamar():
+                continue
+            slot.barrer()
+            self._slots.append(slot)
+            self._libres.put(slot)
+        logger.info(f"Espacios de trabajo: {self.cantidad} slots en {self.directorio_base}")
+
+    def detener(self) -> None:
+        for slot in self._slots:
+            slot.soltar()
+        self._slots = []
+        self._libres = queue.Queue()
+
+    @contextmanager
+    def tomar(self) -> Iterator[EspacioTrabajo]:
+        if not self._slots:
+            raise TributarioException("Los espacios de trabajo de conversión no están iniciados.")
+        slot = self._libres.get()
+        try:
+            yield slot
+        finally:
+            try:
+                if slot.sucio:
+                    logger.warning(f"Se descarta el perfil de {slot.directorio} tras una falla de soffice")
+                    slot.reiniciar_perfil()
+                slot.limpiar()
+            except OSError as e:
+                logger.warning(f"No se pudo limpiar {slot.trabajo}: {e}")
+            self._libres.put(slot)
+
+
+def _vaciar(directorio: str) -> None:
+    with os.scandir(directorio) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir(follow_symlinks=False):
+                shutil.rmtree(entrada.path, ignore_errors=True)
+            else:
+                os.remove(entrada.path)
@@ -1,8 +1,22 @@
+from typing import Optional
+
+from services.control_admision_service import ControlAdmisionService
+from services.libreoffice_pool_service import LibreOfficePoolService
+
+
 class HealthService:
-    def __init__(self, min_available_mb: int = 100):
+    def __init__(
+        self,
+        min_available_mb: int = 100,
+        libreoffice_pool: Optional[LibreOfficePoolService] = None,
+        admision: Optional[ControlAdmisionService] = None,
+    ):
         self.min_available_mb = min_available_mb
+        self.libreoffice_pool = libreoffice_pool
+        self.admision = admision
 
-    def get_available_memory(self) -> int:
+    @staticmethod
+    def get_available_memory() -> int:
         with open("/proc/meminfo", "r") as f:
             meminfo = f.readlines()
         mem_available = next(
@@ -11,11 +25,25 @@ class HealthService:
         return mem_available // 1024  # Convertir a MB
 
     def is_memory_ok(self) -> bool:
-        available_mb = self.get_available_memory()
-        return True
+        try:
+            available_mb = self.get_available_memory()
+        except (OSError, StopIteration, ValueError):
+            # Sin /proc/meminfo no hay cómo medir: no se bloquea el tráfico por esto
+            return True
+        return available_mb >= self.min_available_mb
+
+    def is_pool_ok(self) -> bool:
+        if self.libreoffice_pool is None:
+            return True
+        return self.libreoffice_pool.esta_sano()
+
+    def has_free_slots(self) -> bool:
+        if self.admision is None:
+            return True
+        return self.admision.hay_slots_libres()
 
     def is_ready(self) -> bool:
-        return self.is_memory_ok()
+        return self.is_memory_ok() and self.is_pool_ok() and self.has_free_slots()
 
     def is_alive(self) -> bool:
         return True
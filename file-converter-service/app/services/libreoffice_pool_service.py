@@ -0,0 +1,298 @@
+import json
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import threading
+from typing import List, Optional
+
+from exceptions.tributarios_exception import TributarioException
+from settings.config import logger
+
+
+class _InstanciaLibreOffice:
+    """
+    Una instancia soffice headless "caliente" con su perfil persistente y el
+    proceso puente UNO que le envía las conversiones.
+    """
+
+    def __init__(self, indice: int, soffice: str, python_uno: str, directorio_base: str):
+        self.indice = indice
+        self.soffice = soffice
+        self.python_uno = python_uno
+        self.perfil_dir = os.path.join(directorio_base, f"perfil_{indice}")
+        self.pipe_name = f"lo_pool_{os.getpid()}_{indice}"
+
+        self.proc_soffice: Optional[subprocess.Popen] = None
+        self.proc_bridge: Optional[subprocess.Popen] = None
+        self._respuestas: "queue.Queue[Optional[str]]" = queue.Queue()
+        self.conversiones = 0
+
+    # ----------------- ciclo de vida -----------------
+    def iniciar(self, timeout_segundos: float) -> None:
+        os.makedirs(self.perfil_dir, exist_ok=True)
+
+        self.proc_soffice = subprocess.Popen(
+            [
+                self.soffice,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--nodefault",
+                "--norestore",
+                "--nolockcheck",
+                f"-env:UserInstallation=file://{self.perfil_dir}",
+                f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,  # para poder matar soffice.bin junto con el wrapper
+        )
+
+        self._respuestas = queue.Queue()
+        self.proc_bridge = subprocess.Popen(
+            [self.python_uno, _ruta_bridge(), self.pipe_name, str(timeout_segundos)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            start_new_session=True,
+        )
+        threading.Thread(
+            target=self._leer_respuestas, args=(self.proc_bridge, self._respuestas), daemon=True
+        ).start()
+
+        respuesta = self._esperar_respuesta(timeout_segundos)
+        if not respuesta.get("ok"):
+            raise TributarioException(
+                f"No se pudo iniciar la instancia {self.indice} de LibreOffice: {respuesta.get('error', '')}"
+            )
+        self.conversiones = 0
+        logger.info(f"Instancia {self.indice} de LibreOffice lista (pid={self.proc_soffice.pid})")
+
+    def detener(self) -> None:
+        for proc in (self.proc_bridge, self.proc_soffice):
+            if proc is None or proc.poll() is not None:
+                continue
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+        self.proc_bridge = None
+        self.proc_soffice = None
+
+    def reiniciar(self, timeout_segundos: float) -> None:
+        self.detener()
+        self.iniciar(timeout_segundos)
+
+    def esta_viva(self) -> bool:
+        return (
+            self.proc_soffice is not None and self.proc_soffice.poll() is None
+            and self.proc_bridge is not None and self.proc_bridge.poll() is None
+        )
+
+    # ----------------- pedidos -----------------
+    def ping(self, timeout_segundos: float) -> bool:
+        try:
+            return bool(self._enviar({"accion": "ping"}, timeout_segundos).get("ok"))
+        except TributarioException:
+            return False
+
+    def convertir(self, path_entrada: str, path_salida: str, filtro: str, timeout_segundos: float) -> dict:
+        """ Lanza TributarioException si la instancia murió o se colgó; los errores de LO vienen en la respuesta. """
+        respuesta = self._enviar(
+            {"accion": "convertir", "entrada": path_entrada, "salida": path_salida, "filtro": filtro},
+            timeout_segundos,
+        )
+        self.conversiones += 1
+        return respuesta
+
+    def rss_mb(self) -> int:
+        """ RSS del árbol de procesos de soffice (el wrapper + soffice.bin). """
+        if self.proc_soffice is None:
+            return 0
+        return _rss_arbol_kb(self.proc_soffice.pid) // 1024
+
+    def _enviar(self, pedido: dict, timeout_segundos: float) -> dict:
+        if not self.esta_viva():
+            raise TributarioException(f"La instancia {self.indice} de LibreOffice no está viva.")
+        try:
+            self.proc_bridge.stdin.write(json.dumps(pedido) + "\n")
+            self.proc_bridge.stdin.flush()
+        except (OSError, ValueError) as e:
+            raise TributarioException(f"No se pudo comunicar con la instancia {self.indice}: {e}")
+        return self._esperar_respuesta(timeout_segundos)
+
+    def _esperar_respuesta(self, timeout_segundos: float) -> dict:
+        try:
+            linea = self._respuestas.get(timeout=timeout_segundos)
+        except queue.Empty:
+            raise TributarioException(
+                f"Timeout de conversión: la instancia {self.indice} de LibreOffice no respondió en {timeout_segundos} segundos."
+            )
+        if linea is None:
+            raise TributarioException(f"La instancia {self.indice} de LibreOffice terminó inesperadamente.")
+        try:
+            return json.loads(linea)
+        except ValueError:
+            return {"ok": False, "error": linea[:300]}
+
+    @staticmethod
+    def _leer_respuestas(proc: subprocess.Popen, destino: "queue.Queue[Optional[str]]") -> None:
+        for linea in proc.stdout:
+            destino.put(linea.strip())
+        destino.put(None)  # EOF: el bridge murió
+
+
+class LibreOfficePoolService:
+    """
+    Pool de N instancias LibreOffice headless siempre levantadas, cada una con su
+    perfil persistente. Evita pagar el arranque de soffice + creación de perfil
+    en cada conversión.
+    - Recicla una instancia tras `max_conversiones` o si su RSS supera `max_rss_mb`.
+    - Reinicia automáticamente instancias caídas o colgadas (timeout).
+    - Chequea la salud de las instancias ociosas cada `intervalo_salud_segundos`.
+    """
+
+    def __init__(
+        self,
+        soffice_cmd: str,
+        tamano: int = 2,
+        max_conversiones: int = 200,
+        max_rss_mb: int = 1024,
+        directorio_perfiles: str = "/tmp/lo_pool",
+        python_uno: str = "/usr/bin/python3",
+        timeout_seconds: int = 60,
+        intervalo_salud_segundos: int = 30,
+    ):
+        if not shutil.which(python_uno) and not os.path.exists(python_uno):
+            raise TributarioException(
+                f"No se encontró el intérprete con UNO '{python_uno}'. Instale python3-uno para usar el modo pool."
+            )
+
+        self.tamano = max(1, tamano)
+        self.max_conversiones = max_conversiones
+        self.max_rss_mb = max_rss_mb
+        self.timeout_seconds = timeout_seconds
+        self.intervalo_salud_segundos = intervalo_salud_segundos
+
+        self._instancias: List[_InstanciaLibreOffice] = [
+            _InstanciaLibreOffice(i, soffice_cmd, python_uno, directorio_perfiles)
+            for i in range(self.tamano)
+        ]
+        self._libres: "queue.Queue[_InstanciaLibreOffice]" = queue.Queue()
+        self._detenido = threading.Event()
+        self._hilo_salud: Optional[threading.Thread] = None
+
+    # ----------------- ciclo de vida -----------------
+    def iniciar(self) -> None:
+        for inst in self._instancias:
+            try:
+                inst.iniciar(self.timeout_seconds)
+            except TributarioException as e:
+                # Arrancamos igual: se reintenta al tomarla o en el chequeo de salud
+                logger.error(e.mensaje)
+            self._libres.put(inst)
+
+        self._detenido.clear()
+        self._hilo_salud = threading.Thread(target=self._loop_salud, name="lo-pool-salud", daemon=True)
+        self._hilo_salud.start()
+
+    def detener(self) -> None:
+        self._detenido.set()
+        for inst in self._instancias:
+            inst.detener()
+
+    # ----------------- conversión -----------------
+    def convertir(self, path_entrada: str, path_salida: str, filtro: str = "writer_pdf_Export") -> None:
+        try:
+            inst = self._libres.get(timeout=self.timeout_seconds)
+        except queue.Empty:
+            raise TributarioException(
+                f"No hay instancias de LibreOffice libres luego de {self.timeout_seconds} segundos."
+            )
+
+        try:
+            if not inst.esta_viva():
+                logger.warning(f"Instancia {inst.indice} de LibreOffice caída, reiniciando")
+                inst.reiniciar(self.timeout_seconds)
+
+            try:
+                respuesta = inst.convertir(path_entrada, path_salida, filtro, self.timeout_seconds)
+            except TributarioException:
+                # Caída o cuelgue: no reutilizamos una instancia en estado dudoso
+                logger.warning(f"Instancia {inst.indice} de LibreOffice caída o colgada, reiniciando")
+                self._reiniciar_seguro(inst)
+                raise
+
+            self._reciclar_si_corresponde(inst)
+            if not respuesta.get("ok"):
+                raise TributarioException(f"Fallo en conversión (pool): {respuesta.get('error', 'desconocido')}")
+        finally:
+            self._libres.put(inst)
+
+    # ----------------- salud -----------------
+    def esta_sano(self) -> bool:
+        return any(inst.esta_viva() for inst in self._instancias)
+
+    def _loop_salud(self) -> None:
+        while not self._detenido.wait(self.intervalo_salud_segundos):
+            # Solo revisamos las que están ociosas; las ocupadas se validan al convertir
+            for _ in range(self._libres.qsize()):
+                try:
+                    inst = self._libres.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not inst.esta_viva() or not inst.ping(5):
+                        logger.warning(f"Chequeo de salud: instancia {inst.indice} de LibreOffice no responde, reiniciando")
+                        self._reiniciar_seguro(inst)
+                    else:
+                        self._reciclar_si_corresponde(inst)
+                finally:
+                    self._libres.put(inst)
+
+    def _reciclar_si_corresponde(self, inst: _InstanciaLibreOffice) -> None:
+        motivo = None
+        if self.max_conversiones > 0 and inst.conversiones >= self.max_conversiones:
+            motivo = f"{inst.conversiones} conversiones"
+        elif self.max_rss_mb > 0:
+            rss = inst.rss_mb()
+            if rss > self.max_rss_mb:
+                motivo = f"RSS {rss} MB"
+        if motivo:
+            logger.info(f"Reciclando instancia {inst.indice} de LibreOffice ({motivo})")
+            self._reiniciar_seguro(inst)
+
+    def _reiniciar_seguro(self, inst: _InstanciaLibreOffice) -> None:
+        try:
+            inst.reiniciar(self.timeout_seconds)
+        except TributarioException as e:
+            logger.error(e.mensaje)
+
+
+def _ruta_bridge() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "libreoffice_uno_bridge.py")
+
+
+def _rss_arbol_kb(pid: int) -> int:
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+                    break
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            hijos = [int(h) for h in f.read().split()]
+    except (OSError, ValueError):
+        return total
+    for hijo in hijos:
+        total += _rss_arbol_kb(hijo)
+    return total
@@ -0,0 +1,103 @@
+"""
+Puente UNO entre el pool de LibreOffice y una instancia soffice ya levantada.
+
+Este script NO se importa desde la aplicación: lo ejecuta el pool con el
+intérprete del sistema (el que trae el paquete python3-uno), uno por instancia.
+Protocolo: una línea JSON por pedido en stdin y una línea JSON por respuesta en stdout.
+
+  {"accion": "ping"}                                         -> {"ok": true}
+  {"accion": "convertir", "entrada": "...", "salida": "...",
+   "filtro": "writer_pdf_Export"}                            -> {"ok": true} | {"ok": false, "error": "..."}
+"""
+import json
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+
+def _prop(nombre, valor):
+    p = PropertyValue()
+    p.Name = nombre
+    p.Value = valor
+    return p
+
+
+def _responder(data):
+    sys.stdout.write(json.dumps(data) + "\n")
+    sys.stdout.flush()
+
+
+def conectar(pipe_name, timeout_segundos):
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_ctx
+    )
+    url = f"uno:pipe,name={pipe_name};urp;StarOffice.ComponentContext"
+
+    # soffice tarda en abrir el pipe: reintentamos hasta el timeout
+    limite = time.monotonic() + timeout_segundos
+    while True:
+        try:
+            ctx = resolver.resolve(url)
+            break
+        except Exception:
+            if time.monotonic() > limite:
+                raise
+            time.sleep(0.2)
+
+    return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+
+def convertir(desktop, entrada, salida, filtro):
+    doc = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(entrada),
+        "_blank",
+        0,
+        (_prop("Hidden", True), _prop("ReadOnly", True)),
+    )
+    if doc is None:
+        raise RuntimeError("LibreOffice no pudo abrir el documento.")
+    try:
+        doc.storeToURL(uno.systemPathToFileUrl(salida), (_prop("FilterName", filtro),))
+    finally:
+        doc.close(True)
+
+
+def main():
+    pipe_name = sys.argv[1]
+    timeout_conexion = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+
+    try:
+        desktop = conectar(pipe_name, timeout_conexion)
+    except Exception as e:
+        _responder({"ok": False, "error": f"No se pudo conectar a soffice: {e}"})
+        return 1
+
+    _responder({"ok": True, "listo": True})
+
+    for linea in sys.stdin:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            pedido = json.loads(linea)
+            accion = pedido.get("accion")
+            if accion == "ping":
+                # Consulta barata que obliga a ir y volver por el bridge
+                desktop.getComponents()
+                _responder({"ok": True})
+            elif accion == "convertir":
+                convertir(desktop, pedido["entrada"], pedido["salida"], pedido.get("filtro", "writer_pdf_Export"))
+                _responder({"ok": True})
+            else:
+                _responder({"ok": False, "error": f"Acción desconocida: {accion}"})
+        except Exception as e:
+            _responder({"ok": False, "error": str(e)})
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from exceptions.tributarios_exception import TributarioException
+from settings.config import logger
+
+
+class _Pedido:
+    __slots__ = ("path_docx", "path_pdf", "listo", "error", "abandonado")
+
+    def __init__(self, path_docx: str, path_pdf: str):
+        self.path_docx = path_docx
+        self.path_pdf = path_pdf
+        self.listo = threading.Event()
+        self.error: Optional[BaseException] = None
+        # El llamador dejó de esperar (timeout): no se convierte ni se escribe su salida
+        self.abandonado = False
+
+
+class MicroLotesConversionService:
+    """
+    Junta las conversiones individuales que llegan dentro de una ventana corta
+    (`ventana_ms`, hasta `max_lote`) y las ejecuta en una sola corrida de soffice.
+    Cada llamador bloquea hasta que su PDF está en `path_pdf` (o recibe su error).
+    Si una corrida de varios documentos falla, los fallidos se reintentan de a uno (en paralelo)
+    para que un documento problemático no arrastre a los demás.
+    Nadie espera más de `timeout_espera_segundos`; detenido el servicio, los pedidos se rechazan.
+    """
+
+    def __init__(
+        self,
+        convertir_lote: Callable[[List[str], str], List[Optional[TributarioException]]],
+        ventana_ms: int = 30,
+        max_lote: int = 16,
+        max_lotes_en_paralelo: int = 2,
+        directorio_temporal: Optional[str] = None,
+        timeout_espera_segundos: float = 300,
+    ):
+        self.convertir_lote = convertir_lote
+        self.timeout_espera_segundos = timeout_espera_segundos
+        self.ventana_segundos = max(0, ventana_ms) / 1000
+        self.max_lote = max(1, max_lote)
+        self.directorio_temporal = directorio_temporal
+
+        self._cola: "queue.Queue[_Pedido]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_lotes_en_paralelo), thread_name_prefix="micro-lote")
+        self._detenido = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self) -> None:
+        self._detenido.clear()
+        self._hilo = threading.Thread(target=self._loop, name="micro-lotes", daemon=True)
+        self._hilo.start()
+
+    def detener(self) -> None:
+        self._detenido.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+        self._executor.shutdown(wait=True)
+        self._fallar_pendientes()
+
+    def convertir(self, path_docx: str, path_pdf: str) -> None:
+        if not self._activo():
+            raise TributarioException("El servicio de micro-lotes está detenido.")
+        pedido = _Pedido(path_docx, path_pdf)
+        self._cola.put(pedido)
+        if not self._activo():
+            # Se detuvo entre el chequeo y el put: nadie va a tomar el pedido
+            self._fallar_pendientes()
+        if not pedido.listo.wait(self.timeout_espera_segundos):
+            pedido.abandonado = True
+            raise TributarioException(
+                f"Timeout de conversión: el micro-lote no respondió en {self.timeout_espera_segundos:.0f} segundos."
+            )
+        if pedido.error is not None:
+            raise pedido.error
+
+    def pendientes(self) -> int:
+        return self._cola.qsize()
+
+    # ----------------- internos -----------------
+    def _activo(self) -> bool:
+        return not self._detenido.is_set() and self._hilo is not None and self._hilo.is_alive()
+
+    def _loop(self) -> None:
+        try:
+            while not self._detenido.is_set():
+                try:
+                    primero = self._cola.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                lote = [primero]
+                limite = time.monotonic() + self.ventana_segundos
+                while len(lote) < self.max_lote:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    try:
+                        lote.append(self._cola.get(timeout=restante))
+                    except queue.Empty:
+                        break
+                lote = [pedido for pedido in lote if not pedido.abandonado]
+                if lote and not self._enviar(lote):
+                    break
+        finally:
+            # Lo que quedó en la cola ya no lo toma nadie
+            self._fallar_pendientes()
+
+    def _enviar(self, lote: List[_Pedido]) -> bool:
+        try:
+            self._executor.submit(self._ejecutar, lote)
+            return True
+        except RuntimeError:
+            # Executor cerrado por detener()
+            self._fallar(lote, TributarioException("El servicio de micro-lotes está detenido."))
+            return False
+
+    def _ejecutar(self, lote: List[_Pedido]) -> None:
+        reintentar: List[_Pedido] = []
+        try:
+            pendientes = self._correr(lote)
+            if pendientes and len(lote) > 1:
+                logger.warning(f"Micro-lote: {len(pendientes)} de {len(lote)} fallaron, se reintentan de a uno")
+                reintentar = [pedido for pedido in pendientes if not pedido.abandonado]
+        except BaseException as e:
+            for pedido in lote:
+                if not pedido.listo.is_set():
+                    pedido.error = e
+        finally:
+            for pedido in lote:
+                if pedido not in reintentar:
+                    pedido.listo.set()
+        # Cada reintento por su lado: el último no espera a que terminen los anteriores
+        for pedido in reintentar:
+            self._enviar([pedido])
+
+    def _fallar(self, lote: List[_Pedido], error: BaseException) -> None:
+        for pedido in lote:
+            if not pedido.listo.is_set():
+                pedido.error = error
+                pedido.listo.set()
+
+    def _fallar_pendientes(self) -> None:
+        error = TributarioException("El servicio de micro-lotes está detenido.")
+        while True:
+            try:
+                pedido = self._cola.get_nowait()
+            except queue.Empty:
+                return
+            self._fallar([pedido], error)
+
+    def _correr(self, lote: List[_Pedido]) -> List[_Pedido]:
+        """ Una corrida de soffice para el lote; devuelve los pedidos que fallaron (con su error cargado). """
+        directorio = tempfile.mkdtemp(prefix="lote_", dir=self.directorio_temporal)
+        try:
+            entradas = []
+            for i, pedido in enumerate(lote):
+                # Nombres base únicos: soffice nombra cada salida según su entrada
+                entrada = os.path.join(directorio, f"doc_{i:04d}.docx")
+                _enlazar_o_copiar(pedido.path_docx, entrada)
+                entradas.append(entrada)
+
+            errores = self.convertir_lote(entradas, directorio)
+
+            fallidos = []
+            for pedido, entrada, error in zip(lote, entradas, errores):
+                if pedido.abandonado:
+                    # Su directorio de salida puede ya no existir
+                    pedido.listo.set()
+                elif error is None:
+                    nombre_base = os.path.splitext(os.path.basename(entrada))[0]
+                    shutil.move(os.path.join(directorio, f"{nombre_base}.pdf"), pedido.path_pdf)
+                    pedido.error = None
+                    pedido.listo.set()
+                else:
+                    pedido.error = error
+                    fallidos.append(pedido)
+            return fallidos
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+def _enlazar_o_copiar(origen: str, destino: str) -> None:
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copyfile(origen, destino)
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from settings.config import logger
+
+
+class _Vuelo:
+    """ Conversión en curso para una clave: los pedidos idénticos esperan este resultado. """
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.resultado: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+class PdfCacheService:
+    """
+    Cache de PDFs convertidos, direccionado por contenido.
+    - Clave: SHA-256 de los bytes del DOCX + filtro de exportación + opciones.
+    - Almacenamiento en disco acotado por tamaño, con índice LRU en memoria.
+    - Expira entradas más viejas que `max_edad_segundos`.
+    - Single-flight: pedidos concurrentes idénticos esperan a una única conversión.
+    - Variante en disco (`obtener_o_convertir_archivo`): los hits se sirven con un
+      hardlink al archivo cacheado, sin leer el PDF a memoria.
+    """
+
+    def __init__(self, directorio: str, max_bytes: int, max_edad_segundos: int):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_edad_segundos = max_edad_segundos
+
+        self._lock = threading.Lock()
+        self._indice: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # clave -> (tamaño, creado_en)
+        self._bytes_totales = 0
+        self._en_vuelo: Dict[str, _Vuelo] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.deduplicados = 0
+        self.desalojos = 0
+
+        os.makedirs(self.directorio, exist_ok=True)
+        self._cargar_indice()
+
+    # ----------------- API -----------------
+    @staticmethod
+    def calcular_clave(archivo_docx: bytes, filtro: str, opciones: Optional[dict] = None) -> str:
+        return PdfCacheService.finalizar_clave(hashlib.sha256(archivo_docx), filtro, opciones)
+
+    @staticmethod
+    def finalizar_clave(h: "hashlib._Hash", filtro: str, opciones: Optional[dict] = None) -> str:
+        """ Cierra la clave a partir de un sha256 ya alimentado con el DOCX (p.ej. mientras se recibía). """
+        h.update(b"\0" + filtro.encode("utf-8"))
+        h.update(b"\0" + json.dumps(opciones or {}, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def obtener_o_convertir(self, clave: str, convertir: Callable[[], bytes]) -> bytes:
+        while True:
+            hay_entrada, lider, vuelo = self._tomar_vuelo(clave)
+            if not hay_entrada:
+                break
+            pdf_bytes = self._leer(clave)
+            if pdf_bytes is not None:
+                self._contar_hit()
+                return pdf_bytes
+            self._descartar(clave)
+
+        if not lider:
+            vuelo.listo.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            if vuelo.resultado is not None:
+                return vuelo.resultado
+            # El líder convirtió a disco (variante archivo): se lee lo cacheado
+            pdf_bytes = self._leer(clave)
+            return pdf_bytes if pdf_bytes is not None else convertir()
+
+        try:
+            pdf_bytes = convertir()
+            vuelo.resultado = pdf_bytes
+            self._guardar(clave, pdf_bytes)
+            return pdf_bytes
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+            vuelo.listo.set()
+
+    def obtener_o_convertir_archivo(self, clave: str, convertir: Callable[[], None], destino: str) -> None:
+        """
+        Igual que `obtener_o_convertir` pero el PDF queda en `destino`: `convertir()`
+        debe generarlo ahí. Un hit es un hardlink del archivo cacheado (copia si el
+        cache está en otro filesystem).
+        """
+        while True:
+            hay_entrada, lider, vuelo = self._tomar_vuelo(clave)
+            if not hay_entrada:
+                break
+            if self._enlazar(clave, destino):
+                self._contar_hit()
+                return
+            self._descartar(clave)
+
+        if not lider:
+            vuelo.listo.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            # Si el PDF no entró en el cache (muy grande) convertimos nosotros
+            if not self._enlazar(clave, destino):
+                convertir()
+            return
+
+        try:
+            convertir()
+            self._guardar_archivo(clave, destino)
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+            vuelo.listo.set()
+
+    def obtener_archivo(self, clave: str, destino: str) -> bool:
+        """ Sin single-flight (para lotes): si está cacheado lo deja en `destino` y devuelve True. """
+        with self._lock:
+            vigente = self._vigente(clave)
+        if vigente and self._enlazar(clave, destino):
+            self._contar_hit()
+            return True
+        with self._lock:
+            self.misses += 1
+        return False
+
+    def guardar_archivo(self, clave: str, origen: str) -> None:
+        self._guardar_archivo(clave, origen)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "deduplicados": self.deduplicados,
+                "desalojos": self.desalojos,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "entradas": len(self._indice),
+                "bytes": self._bytes_totales,
+                "max_bytes": self.max_bytes,
+            }
+
+    # ----------------- internos -----------------
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.pdf")
+
+    def _tomar_vuelo(self, clave: str) -> Tuple[bool, bool, Optional[_Vuelo]]:
+        """ (hay_entrada, lider, vuelo): o está cacheada, o lideramos la conversión, o esperamos al líder. """
+        with self._lock:
+            if self._vigente(clave):
+                return True, False, None
+            vuelo = self._en_vuelo.get(clave)
+            if vuelo is None:
+                vuelo = _Vuelo()
+                self._en_vuelo[clave] = vuelo
+                self.misses += 1
+                return False, True, vuelo
+            self.deduplicados += 1
+            return False, False, vuelo
+
+    def _contar_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def _descartar(self, clave: str) -> None:
+        """ Se desalojó entre el chequeo y la lectura: se saca del índice y se reintenta. """
+        with self._lock:
+            if clave in self._indice:
+                self._desalojar(clave)
+
+    def _vigente(self, clave: str) -> bool:
+        entrada = self._indice.get(clave)
+        if entrada is None:
+            return False
+        _, creado_en = entrada
+        if self.max_edad_segundos > 0 and time.time() - creado_en > self.max_edad_segundos:
+            self._desalojar(clave)
+            return False
+        self._indice.move_to_end(clave)
+        return True
+
+    def _leer(self, clave: str) -> Optional[bytes]:
+        """ Lee fuera del lock; si la entrada fue desalojada mientras tanto, es un miss. """
+        try:
+            with open(self._ruta(clave), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _enlazar(self, clave: str, destino: str) -> bool:
+        """ Deja el PDF cacheado en `destino` sin leerlo; False si ya no está en disco. """
+        try:
+            os.link(self._ruta(clave), destino)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # Otro filesystem (EXDEV) o sin soporte de hardlinks
+            try:
+                shutil.copyfile(self._ruta(clave), destino)
+                return True
+            except OSError:
+                return False
+
+    def _guardar(self, clave: str, pdf_bytes: bytes) -> None:
+        if len(pdf_bytes) > self.max_bytes:
+            return
+        ruta = self._ruta(clave)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp, ruta)  # atómico: nunca se lee un PDF a medio escribir
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el PDF en cache: {e}")
+            return
+        self._indexar(clave, len(pdf_bytes))
+
+    def _guardar_archivo(self, clave: str, origen: str) -> None:
+        try:
+            tamano = os.path.getsize(origen)
+        except OSError:
+            return
+        if tamano > self.max_bytes:
+            return
+        ruta = self._ruta(clave)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            try:
+                os.link(origen, tmp)  # el PDF de la respuesta y el cacheado comparten inodo
+            except OSError:
+                shutil.copyfile(origen, tmp)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el PDF en cache: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._indexar(clave, tamano)
+
+    def _indexar(self, clave: str, tamano: int) -> None:
+        with self._lock:
+            if clave in self._indice:
+                self._bytes_totales -= self._indice[clave][0]
+            self._indice[clave] = (tamano, time.time())
+            self._indice.move_to_end(clave)
+            self._bytes_totales += tamano
+            while self._bytes_totales > self.max_bytes and self._indice:
+                self._desalojar(next(iter(self._indice)))
+
+    def _desalojar(self, clave: str) -> None:
+        """ Requiere self._lock tomado. """
+        tamano, _ = self._indice.pop(clave)
+        self._bytes_totales -= tamano
+        self.desalojos += 1
+        try:
+            os.remove(self._ruta(clave))
+        except OSError:
+            pass
+
+    def _cargar_indice(self) -> None:
+        """ Reconstruye el índice con lo que quedó en disco (más viejo primero). """
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre.endswith(".tmp"):
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    pass
+                continue
+            if not nombre.endswith(".pdf"):
+                continue
+            try:
+                st = os.stat(ruta)
+            except OSError:
+                continue
+            entradas.append((st.st_mtime, nombre[:-4], st.st_size))
+
+        for mtime, clave, tamano in sorted(entradas):
+            self._indice[clave] = (tamano, mtime)
+            self._bytes_totales += tamano
+        while self._bytes_totales > self.max_bytes and self._indice:
+            self._desalojar(next(iter(self._indice)))
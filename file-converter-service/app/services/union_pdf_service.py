@@ -0,0 +1,194 @@
+import io
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NullObject, PdfObject, \
+    StreamObject, TextStringObject
+
+from exceptions.tributarios_exception import TributarioException
+
+# Números fijos en el PDF unido: el catálogo y la raíz del árbol de páginas se escriben al final
+_CATALOGO = 1
+_PAGINAS = 2
+
+
+class UnionPdfService:
+    """
+    Concatena PDFs ya convertidos en uno solo, escribiéndolo a medida que avanza: cada PDF
+    de entrada se lee, se copian sus páginas (y lo que referencian) con los objetos
+    renumerados y se libera antes del siguiente. No se reconvierte nada con LibreOffice
+    ni se arma el documento completo en memoria.
+    """
+
+    def unir(self, documentos: Iterable[Tuple[str, Callable[[], Optional[bytes]]]]) -> Iterator[bytes]:
+        """
+        `documentos`: (título, función que devuelve el PDF) en orden; cada PDF se pide recién al
+        escribirlo y tiene que estar (quien llama valida antes de empezar a responder).
+        Cada título queda como marcador en su primera página.
+        """
+        return _PdfUnido().escribir(documentos)
+
+    @staticmethod
+    def contar_paginas(pdf_bytes: bytes) -> int:
+        try:
+            return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+        except Exception as e:
+            raise TributarioException(f"No se pudo leer el PDF: {e}")
+
+
+class _PdfUnido:
+    """ Estado de una unión: números de objeto asignados, offsets para la xref y páginas escritas. """
+
+    def __init__(self):
+        # offset del objeto n en la posición n-1 (los números se asignan consecutivos)
+        self._offsets: List[int] = [0, 0]  # catálogo y raíz de páginas: se escriben al final
+        self._escritos = 0
+        self._paginas: List[int] = []
+        self._marcadores: List[Tuple[str, int]] = []  # (título, número de su primera página)
+
+    def escribir(self, documentos: Iterable[Tuple[str, Callable[[], Optional[bytes]]]]) -> Iterator[bytes]:
+        yield self._salida(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+        for titulo, obtener_pdf in documentos:
+            pdf_bytes = obtener_pdf()
+            if pdf_bytes is None:
+                raise TributarioException(f"El PDF de '{titulo}' ya no está disponible para unir.")
+            bloque = self._copiar_documento(pdf_bytes, titulo)
+            if bloque:
+                yield bloque
+        yield self._cerrar()
+
+    def _salida(self, datos: bytes) -> bytes:
+        self._escritos += len(datos)
+        return datos
+
+    def _nuevo_numero(self) -> int:
+        self._offsets.append(0)
+        return len(self._offsets)
+
+    def _objeto(self, numero: int, cuerpo: bytes) -> bytes:
+        self._offsets[numero - 1] = self._escritos
+        return self._salida(b"%d 0 obj\n" % numero + cuerpo + b"\nendobj\n")
+
+    def _copiar_documento(self, pdf_bytes: bytes, titulo: str) -> bytes:
+        try:
+            lector = PdfReader(io.BytesIO(pdf_bytes))
+            paginas = list(lector.pages)
+        except Exception as e:
+            raise TributarioException(f"El PDF de '{titulo}' no se pudo leer para unir: {e}")
+
+        # (idnum, generación) en el PDF de entrada -> número en el PDF unido
+        mapa: Dict[Tuple[int, int], int] = {}
+        pendientes: List[Tuple[int, PdfObject]] = []
+
+        def renumerar(ref: IndirectObject) -> int:
+            clave = (ref.idnum, ref.generation)
+            if clave not in mapa:
+                destino = ref.get_object()
+                tipo = destino.get("/Type") if isinstance(destino, DictionaryObject) else None
+                # Nodos del árbol de páginas o el catálogo de la entrada: se apuntan a los del PDF unido
+                if tipo == "/Pages":
+                    mapa[clave] = _PAGINAS
+                elif tipo == "/Catalog":
+                    mapa[clave] = _CATALOGO
+                else:
+                    mapa[clave] = self._nuevo_numero()
+                    pendientes.append((mapa[clave], destino))
+            return mapa[clave]
+
+        # Primero se numeran todas las páginas: otra página (un link) puede referenciarlas antes de escribirlas
+        numeros = []
+        for pagina in paginas:
+            numero = self._nuevo_numero()
+            if pagina.indirect_reference is not None:
+                mapa[(pagina.indirect_reference.idnum, pagina.indirect_reference.generation)] = numero
+            numeros.append(numero)
+        if numeros:
+            self._marcadores.append((titulo, numeros[0]))
+
+        partes = []
+        for numero, pagina in zip(numeros, paginas):
+            # Los atributos heredados (MediaBox, Resources, ...) ya vienen copiados en la página
+            self._paginas.append(numero)
+            partes.append(self._objeto(numero, _serializar(pagina, renumerar, padre=_PAGINAS)))
+            while pendientes:
+                numero, objeto = pendientes.pop()
+                partes.append(self._objeto(numero, _serializar(objeto, renumerar)))
+        return b"".join(partes)
+
+    def _cerrar(self) -> bytes:
+        partes = []
+        kids = b" ".join(b"%d 0 R" % n for n in self._paginas)
+        partes.append(self._objeto(_PAGINAS, b"<< /Type /Pages /Count %d /Kids [%s] >>" % (len(self._paginas), kids)))
+
+        raiz_marcadores = self._nuevo_numero()
+        marcadores = [self._nuevo_numero() for _ in self._marcadores]
+        for i, (numero, (titulo, primera_pagina)) in enumerate(zip(marcadores, self._marcadores)):
+            titulo_pdf = io.BytesIO()
+            TextStringObject(titulo or f"Documento {i + 1}").write_to_stream(titulo_pdf)
+            cuerpo = b"<< /Title %s /Parent %d 0 R /Dest [%d 0 R /Fit]" % (
+                titulo_pdf.getvalue(), raiz_marcadores, primera_pagina)
+            if i > 0:
+                cuerpo += b" /Prev %d 0 R" % marcadores[i - 1]
+            if i + 1 < len(marcadores):
+                cuerpo += b" /Next %d 0 R" % marcadores[i + 1]
+            partes.append(self._objeto(numero, cuerpo + b" >>"))
+        if marcadores:
+            cuerpo = b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>" % (
+                marcadores[0], marcadores[-1], len(marcadores))
+        else:
+            cuerpo = b"<< /Type /Outlines /Count 0 >>"
+        partes.append(self._objeto(raiz_marcadores, cuerpo))
+        partes.append(self._objeto(_CATALOGO, b"<< /Type /Catalog /Pages %d 0 R /Outlines %d 0 R /PageMode /UseOutlines >>"
+                                   % (_PAGINAS, raiz_marcadores)))
+
+        inicio_xref = self._escritos
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % (len(self._offsets) + 1)]
+        xref.extend(b"%010d 00000 n \n" % offset for offset in self._offsets)
+        xref.append(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (len(self._offsets) + 1, _CATALOGO, inicio_xref))
+        partes.append(self._salida(b"".join(xref)))
+        return b"".join(partes)
+
+
+def _serializar(objeto: PdfObject, renumerar: Callable[[IndirectObject], int], padre: Optional[int] = None) -> bytes:
+    salida = io.BytesIO()
+    _escribir(objeto, salida, renumerar, padre)
+    return salida.getvalue()
+
+
+def _escribir(objeto: PdfObject, salida: io.BytesIO, renumerar: Callable[[IndirectObject], int],
+              padre: Optional[int] = None) -> None:
+    """ Como write_to_stream de pypdf, pero con las referencias indirectas renumeradas. """
+    if isinstance(objeto, IndirectObject):
+        salida.write(b"%d 0 R" % renumerar(objeto))
+    elif isinstance(objeto, DictionaryObject):
+        salida.write(b"<<\n")
+        for clave, valor in objeto.items():
+            if clave == "/Parent" and padre is not None:
+                continue
+            if clave == "/Length" and isinstance(objeto, StreamObject):
+                continue
+            clave.write_to_stream(salida)
+            salida.write(b" ")
+            _escribir(valor, salida, renumerar)
+            salida.write(b"\n")
+        if padre is not None:
+            salida.write(b"/Parent %d 0 R\n" % padre)
+        if isinstance(objeto, StreamObject):
+            # _data: el contenido tal como está en el archivo (todavía con sus filtros)
+            salida.write(b"/Length %d\n>>\nstream\n" % len(objeto._data))
+            salida.write(objeto._data)
+            salida.write(b"\nendstream")
+        else:
+            salida.write(b">>")
+    elif isinstance(objeto, ArrayObject):
+        salida.write(b"[")
+        for i, valor in enumerate(objeto):
+            if i:
+                salida.write(b" ")
+            _escribir(valor, salida, renumerar)
+        salida.write(b"]")
+    elif objeto is None:
+        NullObject().write_to_stream(salida)
+    else:
+        objeto.write_to_stream(salida)
@@ -1,25 +1,41 @@
 import os
 import re
 import shutil
+import signal
 import subprocess
 import tempfile
-import threading
-from typing import Optional
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
 from exceptions.tributarios_exception import TributarioException
+from services.control_admision_service import CONVERSION_FASE, ControlAdmisionService
+from services.espacios_trabajo_service import EspacioTrabajo, EspaciosTrabajoService
+from services.libreoffice_pool_service import LibreOfficePoolService
+from services.metricas_service import medir_fase
+from services.micro_lotes_service import MicroLotesConversionService
+from settings.config import logger
 
 
 class WordToPdfConverterService:
     """
     Conversor DOCX -> PDF usando LibreOffice/soffice headless.
     Sincrónico, seguro para concurrencia y con manejo de errores.
+    Si recibe un pool, convierte con instancias LO ya levantadas en lugar de
+    lanzar un soffice por conversión.
+    Con micro-lotes (modo proceso), las conversiones individuales que llegan juntas
+    se resuelven en una sola corrida de soffice.
+    Con espacios de trabajo, cada soffice usa un perfil ya inicializado en lugar de crear uno.
     """
 
     def __init__(
         self,
         soffice_cmd: Optional[str] = None,   # p.ej. "soffice" o "/usr/bin/soffice"
         timeout_seconds: int = 60,           # timeout por conversión
-        max_concurrency: int = 2             # para no saturar el host
+        admision: Optional[ControlAdmisionService] = None,  # slots de conversión (None = uno por CPU)
+        pool: Optional[LibreOfficePoolService] = None,  # instancias LO calientes (modo pool)
+        directorio_temporal: Optional[str] = None,  # None = el del sistema
+        espacios: Optional[EspaciosTrabajoService] = None,  # slots con perfil LO reutilizable
+        timeout_lote_max_segundos: Optional[int] = None,  # tope de una corrida de varios DOCX (None = 3 conversiones)
     ):
         # Resolver binario
         self.soffice = soffice_cmd or shutil.which("soffice") or shutil.which("libreoffice")
@@ -29,84 +45,245 @@ class WordToPdfConverterService:
             )
 
         self.timeout_seconds = timeout_seconds
-        if max_concurrency < 1:
-            max_concurrency = 1
-        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self.timeout_lote_max_segundos = timeout_lote_max_segundos or timeout_seconds * 3
+        self.admision = admision or ControlAdmisionService()
+        self.pool = pool
+        self.directorio_temporal = directorio_temporal
+        self.espacios = espacios
+        self.micro_lotes: Optional[MicroLotesConversionService] = None
+        # Nota: "writer_pdf_Export" suele ser más estable que el alias "pdf"
+        self.filtro_pdf = "writer_pdf_Export"
 
     def convertir_docx_a_pdf(self, archivo_docx: bytes) -> bytes:
         if not archivo_docx:
             raise TributarioException("No se pudo convertir: el archivo vino vacío.")
 
-        # Limitar concurrencia global del proceso (sin async)
-        with self._sem:
+        if self.micro_lotes is None and self.pool is None:
+            # Entrada y salida en el mismo slot de trabajo: sin directorio temporal propio
             try:
-                with tempfile.TemporaryDirectory(prefix="conv_") as tmpdir:
-                    path_docx = os.path.join(tmpdir, "entrada.docx")
-                    path_pdf = os.path.join(tmpdir, "entrada.pdf")
+                with self.admision.slot(), self._tomar_espacio() as espacio:
+                    path_docx = os.path.join(espacio.trabajo, "entrada.docx")
+                    path_pdf = os.path.join(espacio.trabajo, "entrada.pdf")
+                    with medir_fase("escritura_temporal", CONVERSION_FASE), open(path_docx, "wb") as f:
+                        f.write(archivo_docx)
+                    self._convertir_y_validar(espacio, path_docx, path_pdf)
+                    with medir_fase("lectura_pdf", CONVERSION_FASE), open(path_pdf, "rb") as f:
+                        return f.read()
+            except OSError as e:
+                raise TributarioException(f"Error del sistema al convertir: {e}")
 
-                    # Perfil de usuario aislado para evitar locks entre procesos
-                    user_profile_dir = os.path.join(tmpdir, "lo_profile")
-                    os.makedirs(user_profile_dir, exist_ok=True)
-                    user_install_arg = f"-env:UserInstallation=file://{user_profile_dir}"
+        try:
+            with tempfile.TemporaryDirectory(prefix="conv_", dir=self.directorio_temporal) as tmpdir:
+                path_docx = os.path.join(tmpdir, "entrada.docx")
+                path_pdf = os.path.join(tmpdir, "entrada.pdf")
 
-                    # Guardar DOCX
-                    with open(path_docx, "wb") as f:
-                        f.write(archivo_docx)
+                # Guardar DOCX
+                with medir_fase("escritura_temporal", CONVERSION_FASE), open(path_docx, "wb") as f:
+                    f.write(archivo_docx)
 
-                    # Ejecutar conversión
-                    # Nota: "writer_pdf_Export" suele ser más estable que el alias "pdf"
-                    cmd = [
-                        self.soffice,
-                        "--headless",
-                        "--nologo",
-                        "--nolockcheck",
-                        user_install_arg,
-                        "--convert-to", "pdf:writer_pdf_Export",
-                        "--outdir", tmpdir,
-                        path_docx,
-                    ]
-
-                    completed = subprocess.run(
-                        cmd,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True,
-                        check=False,
-                        timeout=self.timeout_seconds,
-                    )
+                self.convertir_archivo(path_docx, path_pdf)
 
-                    if completed.returncode != 0:
-                        # Limpieza de logs (para no volcar paredes de texto)
-                        stdout = (completed.stdout or "").strip()
-                        stderr = (completed.stderr or "").strip()
-                        msg = stderr or stdout or "Fallo desconocido en LibreOffice."
-                        msg = self._compactar_mensaje(msg)
-                        raise TributarioException(f"Fallo en conversión (rc={completed.returncode}): {msg}")
-
-                    # Validar salida
-                    if not os.path.exists(path_pdf):
-                        stdout = (completed.stdout or "").strip()
-                        stderr = (completed.stderr or "").strip()
-                        msg = self._compactar_mensaje(stderr or stdout or "No se generó el PDF.")
-                        raise TributarioException(f"Conversión incompleta: {msg}")
+                with medir_fase("lectura_pdf", CONVERSION_FASE), open(path_pdf, "rb") as f:
+                    return f.read()
+        except OSError as e:
+            raise TributarioException(f"Error del sistema al convertir: {e}")
 
-                    with open(path_pdf, "rb") as f:
-                        pdf_bytes = f.read()
+    def convertir_archivo(self, path_docx: str, path_pdf: str) -> None:
+        """
+        Convierte un DOCX que ya está en disco; el PDF queda en `path_pdf`
+        (mismo directorio y mismo nombre base que el DOCX). No pasa el documento por memoria.
+        """
+        if self.micro_lotes is not None and self.pool is None:
+            # Incluye la ventana de espera del lote; cola y soffice del lote se miden en su hilo
+            with medir_fase("micro_lote", CONVERSION_FASE):
+                self.micro_lotes.convertir(path_docx, path_pdf)
+            return
+
+        if self.pool is not None:
+            with self.admision.slot():
+                self._convertir_y_validar(None, path_docx, path_pdf)
+            return
+        self._convertir_individual(path_docx, path_pdf)
+
+    def _convertir_individual(self, path_docx: str, path_pdf: str) -> None:
+        """ Un soffice para un solo DOCX, sin pasar por micro-lotes. """
+        # Limitar concurrencia global del proceso: espera acotada o 503
+        with self.admision.slot():
+            try:
+                with self._tomar_espacio() as espacio:
+                    self._convertir_y_validar(espacio, path_docx, path_pdf)
+            except OSError as e:
+                raise TributarioException(f"Error del sistema al convertir: {e}")
+
+    def _convertir_y_validar(self, espacio: Optional[EspacioTrabajo], path_docx: str, path_pdf: str) -> None:
+        try:
+            # Ejecutar conversión: instancia caliente del pool o proceso soffice con el perfil del slot
+            if self.pool is not None:
+                with medir_fase("soffice", CONVERSION_FASE):
+                    self.pool.convertir(path_docx, path_pdf, self.filtro_pdf)
+            else:
+                self._convertir_con_proceso(espacio, path_docx, path_pdf)
 
-                    if not pdf_bytes:
-                        raise TributarioException("El PDF generado está vacío.")
-                    if not pdf_bytes.startswith(b"%PDF-"):
-                        raise TributarioException("El archivo generado no es un PDF válido.")
+            if os.path.getsize(path_pdf) == 0:
+                raise TributarioException("El PDF generado está vacío.")
+            with open(path_pdf, "rb") as f:
+                if f.read(5) != b"%PDF-":
+                    raise TributarioException("El archivo generado no es un PDF válido.")
 
-                    return pdf_bytes
+        except subprocess.TimeoutExpired:
+            raise TributarioException(
+                f"Timeout de conversión: LibreOffice excedió {self.timeout_seconds} segundos."
+            )
+        except OSError as e:
+            # Errores del sistema (p.ej., permisos, disco, binario faltante)
+            raise TributarioException(f"Error del sistema al convertir: {e}")
 
+    def convertir_lote_archivos(self, paths_docx: List[str], directorio_salida: str,
+                                reintentar_pendientes: bool = False) -> List[Optional[TributarioException]]:
+        """
+        Convierte N DOCX (con nombres base distintos) en una sola corrida de soffice:
+        el arranque de LibreOffice se paga una vez por lote. El PDF de cada entrada queda
+        en `directorio_salida/<nombre_base>.pdf`. Devuelve, por entrada, None si se
+        convirtió o la excepción con el motivo si falló (las demás no se ven afectadas).
+        La corrida tiene tope `timeout_lote_max_segundos`; con `reintentar_pendientes`, si se corta,
+        los que no llegaron se convierten de a uno con el timeout normal (micro-lotes ya reintenta por su cuenta).
+        """
+        if self.pool is not None:
+            # Con instancias calientes no hay arranque que amortizar: una por una
+            errores = []
+            for path_docx in paths_docx:
+                try:
+                    self.convertir_archivo(path_docx, self.ruta_pdf(path_docx, directorio_salida))
+                    errores.append(None)
+                except TributarioException as e:
+                    errores.append(e)
+            return errores
+
+        error_corrida: Optional[TributarioException] = None
+        timeout = min(self.timeout_seconds * max(1, len(paths_docx)), self.timeout_lote_max_segundos)
+        cortada = False
+        with self.admision.slot(documentos=len(paths_docx)):
+            try:
+                with self._tomar_espacio() as espacio:
+                    completed = self._ejecutar_soffice(espacio, paths_docx, directorio_salida, timeout=timeout)
+                if completed.returncode != 0:
+                    msg = self._compactar_mensaje(
+                        (completed.stderr or "").strip() or (completed.stdout or "").strip() or "Fallo desconocido en LibreOffice."
+                    )
+                    error_corrida = TributarioException(f"Fallo en conversión (rc={completed.returncode}): {msg}")
             except subprocess.TimeoutExpired:
-                raise TributarioException(
-                    f"Timeout de conversión: LibreOffice excedió {self.timeout_seconds} segundos."
-                )
+                cortada = True
+                error_corrida = TributarioException(f"Timeout de conversión: LibreOffice excedió {timeout} segundos.")
             except OSError as e:
-                # Errores del sistema (p.ej., permisos, disco, binario faltante)
-                raise TributarioException(f"Error del sistema al convertir: {e}")
+                error_corrida = TributarioException(f"Error del sistema al convertir: {e}")
+
+        # Cada entrada se valida por su salida: un rc != 0 no invalida los PDF que sí se generaron
+        errores: List[Optional[TributarioException]] = []
+        for path_docx in paths_docx:
+            path_pdf = self.ruta_pdf(path_docx, directorio_salida)
+            try:
+                if os.path.getsize(path_pdf) > 0:
+                    with open(path_pdf, "rb") as f:
+                        if f.read(5) == b"%PDF-":
+                            errores.append(None)
+                            continue
+                errores.append(TributarioException("El archivo generado no es un PDF válido."))
+            except OSError:
+                errores.append(error_corrida or TributarioException("Conversión incompleta: No se generó el PDF."))
+
+        if cortada and reintentar_pendientes and len(paths_docx) > 1:
+            pendientes = [i for i, error in enumerate(errores) if error is not None]
+            logger.warning(f"Lote cortado por timeout: {len(pendientes)} de {len(paths_docx)} se reintentan de a uno")
+            for i in pendientes:
+                try:
+                    self._convertir_individual(paths_docx[i], self.ruta_pdf(paths_docx[i], directorio_salida))
+                    errores[i] = None
+                except TributarioException as e:
+                    errores[i] = e
+        return errores
+
+    @staticmethod
+    def ruta_pdf(path_docx: str, directorio_salida: str) -> str:
+        nombre_base = os.path.splitext(os.path.basename(path_docx))[0]
+        return os.path.join(directorio_salida, f"{nombre_base}.pdf")
+
+    @contextmanager
+    def _tomar_espacio(self) -> Iterator[EspacioTrabajo]:
+        """ Slot reutilizable; sin espacios configurados, uno descartable (perfil nuevo por conversión). """
+        if self.espacios is not None:
+            with self.espacios.tomar() as espacio:
+                yield espacio
+            return
+        directorio = tempfile.mkdtemp(prefix="conv_", dir=self.directorio_temporal)
+        try:
+            espacio = EspacioTrabajo(directorio)
+            os.makedirs(espacio.perfil)
+            os.makedirs(espacio.trabajo)
+            yield espacio
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def _ejecutar_soffice(self, espacio: EspacioTrabajo, paths_docx: List[str], outdir: str,
+                          timeout: float) -> subprocess.CompletedProcess:
+        # Perfil de usuario propio del slot: aislado de otros procesos y ya inicializado
+        user_install_arg = f"-env:UserInstallation=file://{espacio.perfil}"
+
+        cmd = [
+            self.soffice,
+            "--headless",
+            "--nologo",
+            "--nolockcheck",
+            user_install_arg,
+            "--convert-to", f"pdf:{self.filtro_pdf}",
+            "--outdir", outdir,
+            *paths_docx,
+        ]
+
+        with medir_fase("soffice", CONVERSION_FASE):
+            # Sesión propia: soffice lanza soffice.bin como hijo y el timeout tiene que matar a los dos
+            proceso = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=True,
+            )
+            try:
+                stdout, stderr = proceso.communicate(timeout=timeout)
+            except BaseException:
+                espacio.sucio = True
+                self._matar_grupo(proceso)
+                raise
+        if proceso.returncode != 0:
+            espacio.sucio = True
+        return subprocess.CompletedProcess(cmd, proceso.returncode, stdout, stderr)
+
+    @staticmethod
+    def _matar_grupo(proceso: subprocess.Popen) -> None:
+        try:
+            os.killpg(proceso.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        proceso.communicate()
+
+    def _convertir_con_proceso(self, espacio: EspacioTrabajo, path_docx: str, path_pdf: str) -> None:
+        """ Levanta un soffice headless con el perfil del slot para esta conversión. """
+        completed = self._ejecutar_soffice(espacio, [path_docx], os.path.dirname(path_pdf), timeout=self.timeout_seconds)
+
+        if completed.returncode != 0:
+            # Limpieza de logs (para no volcar paredes de texto)
+            stdout = (completed.stdout or "").strip()
+            stderr = (completed.stderr or "").strip()
+            msg = stderr or stdout or "Fallo desconocido en LibreOffice."
+            msg = self._compactar_mensaje(msg)
+            raise TributarioException(f"Fallo en conversión (rc={completed.returncode}): {msg}")
+
+        # Validar salida
+        if not os.path.exists(path_pdf):
+            stdout = (completed.stdout or "").strip()
+            stderr = (completed.stderr or "").strip()
+            msg = self._compactar_mensaje(stderr or stdout or "No se generó el PDF.")
+            raise TributarioException(f"Conversión incompleta: {msg}")
 
     @staticmethod
     def _compactar_mensaje(msg: str, max_len: int = 700) -> str:
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
+from typing import Optional
 import logging.config
 
 env_file_path = "/local-envs/.env" if Path("/local-envs/.env").exists() else None
@@ -7,6 +8,54 @@ env_file_path = "/local-envs/.env" if Path("/local-envs/.env").exists() else Non
 class Settings(BaseSettings):
     entorno: str
 
+    # Conversión DOCX -> PDF
+    soffice_cmd: Optional[str] = None
+    conversion_timeout_segundos: int = 60
+    # Control de admisión: slots de conversión adaptativos y cola de espera acotada
+    conversion_slots_min: int = 1
+    conversion_slots_max: int = 0  # 0 = cantidad de CPUs
+    conversion_mb_por_slot: int = 300
+    conversion_memoria_minima_mb: int = 200
+    conversion_cola_max: int = 32
+    conversion_espera_max_segundos: float = 10
+    conversion_tolerancia_latencia: float = 2.0
+    conversion_ajuste_intervalo_segundos: float = 5
+    conversion_modo: str = "proceso"  # "proceso" (un soffice por conversión) | "pool" (instancias calientes)
+    # Directorio de trabajo de cada conversión; conviene en el mismo filesystem que el cache (hardlinks)
+    conversion_directorio_temporal: Optional[str] = None
+    # Micro-lotes: conversiones que llegan dentro de la ventana se hacen en una sola corrida (0 = desactivado)
+    conversion_micro_lote_ventana_ms: int = 30
+    conversion_micro_lote_max: int = 16
+    conversion_lote_max_archivos: int = 100
+    # Tope de una corrida de soffice con varios DOCX (0 = 3 x conversion_timeout_segundos)
+    conversion_lote_timeout_max_segundos: int = 0
+    # Slots de trabajo con perfil de LibreOffice reutilizable (conviene un tmpfs, p.ej. /dev/shm/conversion)
+    conversion_espacios_directorio: str = "/tmp/conversion_espacios"
+
+    # Pool de instancias LibreOffice (conversion_modo="pool")
+    pool_instancias: int = 2
+    pool_max_conversiones: int = 200
+    pool_max_rss_mb: int = 1024
+    pool_directorio_perfiles: str = "/tmp/lo_pool"
+    pool_python_uno: str = "/usr/bin/python3"
+    pool_intervalo_salud_segundos: int = 30
+
+    # Cache de PDFs convertidos (por SHA-256 del DOCX)
+    cache_habilitado: bool = True
+    cache_directorio: str = "/tmp/pdf_cache"
+    cache_max_mb: int = 512
+    cache_max_edad_horas: int = 24
+
+    # Jobs de conversión asincrónica
+    mongo_url: Optional[str] = None
+    jobs_cola: str = "mongo"  # "mongo" | "memoria" (solo un proceso, para tests)
+    jobs_workers: int = 1
+    jobs_visibilidad_segundos: int = 300
+    jobs_max_intentos: int = 3
+    jobs_backoff_base_segundos: float = 2.0
+    jobs_backoff_max_segundos: float = 60.0
+    jobs_intervalo_sondeo_segundos: float = 1.0
+    jobs_retencion_horas: int = 72
 
     model_config = SettingsConfigDict(
         env_file=env_file_path,
@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from pydantic import BaseModel
-from typing import Optional, Generic, TypeVar
+from typing import Optional, Generic, TypeVar, List
 
 from domain.models.plantilla_model import PlantillaModel
 
@@ -17,6 +17,31 @@ class BaseResponseDTO(BaseModel, Generic[T]):
 class CambiarWordDTO(BaseModel):
     archivo: str
     metadata: dict
+    motor: Optional[str] = None  # "docx" | "xml"; None = el configurado en el servicio
+
+## DTO para remplazar la metadata en una plantilla ya guardada (se indica el id en la ruta)
+class CambiarPlantillaDTO(BaseModel):
+    metadata: dict
+    motor: Optional[str] = None  # "docx" | "xml"; None = el configurado en el servicio
+
+## Placeholders de la plantilla sin valor en la metadata y claves de la metadata que la plantilla no usa
+class ReportePlaceholdersDTO(BaseModel):
+    sin_completar: List[str] = []
+    desconocidos: List[str] = []
+
+## Fila de un lote: la metadata de un documento a generar
+class FilaLoteDTO(BaseModel):
+    demanda_id: str
+    metadata: dict
+
+## DTO para generar muchos documentos de una misma plantilla en una sola llamada
+class GenerarLoteDTO(BaseModel):
+    archivo: Optional[str] = None  # DOCX en base64, o bien...
+    plantilla_id: Optional[str] = None  # ...el id de una plantilla guardada
+    lote_id: Optional[str] = None
+    formato: str = "pdf"  # "pdf" | "docx"
+    motor: Optional[str] = None  # "docx" | "xml"; None = el configurado en el servicio
+    filas: List[FilaLoteDTO]
 
 ## Dto para query de filtracion de plantillas
 class FiltroPlantillasDTO(BaseModel):
@@ -25,6 +50,13 @@ class FiltroPlantillasDTO(BaseModel):
     texto: Optional[str] = None
     fechaDesde: Optional[datetime] = None
     fechaHasta: Optional[datetime] = None
+    limite: Optional[int] = None  # None = el configurado en el servicio
+    cursor: Optional[str] = None  # 'siguiente_cursor' de la página anterior
+
+## Página de resultados (paginación por cursor: la siguiente se pide con 'siguiente_cursor')
+class PaginaDTO(BaseModel, Generic[T]):
+    items: List[T] = []
+    siguiente_cursor: Optional[str] = None
 
 ## DTO para subir una plantilla nueva
 class SubirPlantillaDTO(BaseModel):
@@ -42,6 +74,7 @@ class PlantillaOutShortDTO(BaseModel):
     tipo: str
     juzgado: str
     fechaSubida: datetime
+    placeholders: Optional[List[str]] = None
 
     @classmethod
     def from_model(cls, model: "PlantillaModel") -> "PlantillaOutShortDTO":
@@ -51,6 +84,19 @@ class PlantillaOutShortDTO(BaseModel):
             tipo=model.tipo,
             juzgado=model.juzgado,
             fechaSubida=model.fechaSubida,
+            placeholders=model.placeholders,
+        )
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "PlantillaOutShortDTO":
+        """ Desde el documento proyectado de Mongo (sin armar el PlantillaModel completo). """
+        return cls(
+            id=doc["id"],
+            nombre=doc["nombre"],
+            tipo=doc["tipo"],
+            juzgado=doc["juzgado"],
+            fechaSubida=doc["fechaSubida"],
+            placeholders=doc.get("placeholders"),
         )
 
 ## DTO para mostrar toda la informacion de la plantilla
@@ -66,6 +112,7 @@ class PlantillaOutDTO(BaseModel):
     subidoPorId: str
     subidoPorNombre: str
     fechaSubida: datetime
+    placeholders: Optional[List[str]] = None
 
     @classmethod
     def from_model(cls, model: "PlantillaModel") -> "PlantillaOutDTO":
@@ -81,4 +128,5 @@ class PlantillaOutDTO(BaseModel):
             subidoPorId=model.subidoPorId,
             subidoPorNombre=model.subidoPorNombre,
             fechaSubida=model.fechaSubida,
+            placeholders=model.placeholders,
         )
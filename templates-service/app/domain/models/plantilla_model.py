@@ -2,7 +2,7 @@ import re
 import uuid
 import unicodedata
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 
@@ -20,6 +20,12 @@ def _slugify_nombre(nombre: str, max_len: int = 80) -> str:
     n = n[:max_len] if len(n) > max_len else n
     return n or "plantilla"
 
+def palabras_busqueda(*textos: Optional[str]) -> List[str]:
+    """ Palabras normalizadas (sin acentos, minúsculas) para buscar con un índice: "Demanda Ejecución" -> ["demanda", "ejecucion"]. """
+    normalizado = unicodedata.normalize("NFKD", " ".join(t for t in textos if t))
+    normalizado = normalizado.encode("ascii", "ignore").decode("ascii").lower()
+    return sorted(set(re.findall(r"[a-z0-9]+", normalizado)))
+
 class PlantillaModel(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     nombre: str
@@ -35,6 +41,13 @@ class PlantillaModel(BaseModel):
     subidoPorId: str
     subidoPorNombre: str
     fechaSubida: datetime = Field(default_factory=datetime.now)
+    # Se deriva de nombre + descripcion (búsqueda por texto con índice)
+    palabrasBusqueda: List[str] = []
+    # Claves de los {{KEY}} del DOCX (sin llaves), extraídas al subir. None = subida antes de que existiera
+    placeholders: Optional[List[str]] = None
+    # DOCX normalizado al subir (es el que se renderiza); None = igual al original o subida anterior
+    hashNormalizado: Optional[str] = None
+    ubicacionNormalizada: Optional[str] = None
 
     # =========================
     # Validadores de campos
@@ -70,4 +83,9 @@ class PlantillaModel(BaseModel):
             base = _slugify_nombre(self.nombre)
             filename = f"{base}.docx"
             self.ubicacionObs = f"templates/{self.id}/{filename}"
+        return self
+
+    @model_validator(mode="after")
+    def calcular_palabras_busqueda(self):
+        self.palabrasBusqueda = palabras_busqueda(self.nombre, self.descripcion)
         return self
\ No newline at end of file
@@ -0,0 +1,9 @@
+from exceptions.tributarios_exception import TributarioException
+
+
+class ServicioSaturadoException(TributarioException):
+    """ No hay capacidad para atender el pedido ahora: se responde 503 con Retry-After. """
+
+    def __init__(self, mensaje: str, retry_after_segundos: int = 1):
+        self.retry_after_segundos = retry_after_segundos
+        super().__init__(mensaje)
@@ -1,80 +1,409 @@
+import asyncio
 import base64
-from typing import List, Union
+import json
+import re
+from typing import List, Union, AsyncIterator, Optional, Tuple, Callable, Awaitable
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
 
 from domain.dtos.plantilla_dto import PlantillaOutShortDTO, PlantillaOutDTO, SubirPlantillaDTO, \
-    CambiarWordDTO
+    CambiarWordDTO, GenerarLoteDTO, FilaLoteDTO, CambiarPlantillaDTO, ReportePlaceholdersDTO, PaginaDTO
+from domain.models.plantilla_model import PlantillaModel
+from exceptions.tributarios_exception import TributarioException
+from services.documentos_cache_service import DocumentosCacheService
 from services.files_converter_client import FileConverterClient
 from services.files_service import FileService
+from services.normalizador_docx import NormalizadorDocx
+from services.plantillas_binarios_service import PlantillasBinariosService
 from services.plantillas_service import PlantillasService
+from services.render_pool_service import RenderPoolService
 from services.word_replacer_service import WordReplacerService
-from settings.config import logger
+from services.zip_streaming import ZipStreaming
+from settings.config import logger, settings
 
 
 class PlantillasFacade:
     def __init__(self, plantillas_service: PlantillasService, replacer_service : WordReplacerService, files_service : FileService,
-                 files_converter_client: FileConverterClient):
+                 files_converter_client: FileConverterClient, binarios_service: PlantillasBinariosService,
+                 render_pool: Optional[RenderPoolService] = None,
+                 documentos_cache: Optional[DocumentosCacheService] = None,
+                 normalizador: Optional[NormalizadorDocx] = None):
         self.plantillas_service = plantillas_service
         self.files_service = files_service
         self.replacer_service = replacer_service
         self.files_converter_client = files_converter_client
+        self.binarios_service = binarios_service
+        # Con pool los renders corren en otros procesos; sin pool, en el threadpool
+        self.render_pool = render_pool
+        # Documentos ya generados (reimpresiones, reintentos); None = sin cache
+        self.documentos_cache = documentos_cache
+        # Normalización del DOCX al subir; None = se renderiza el original
+        self.normalizador = normalizador
+
+    async def remplazar(self, data: CambiarWordDTO) -> str:
+        archivo_docx_bytes = await run_in_threadpool(self.files_service.base64_a_bytes, b64=data.archivo)
+        hash_sha256, obtener_archivo = await self._origen_subido(archivo_docx_bytes)
+        docx_bytes = await self._documento(hash_sha256, obtener_archivo, data.metadata, data.motor, "docx")
+        return base64.b64encode(docx_bytes).decode("utf-8")
+
+    async def remplazar_por_id(self, id: str, data: CambiarPlantillaDTO) -> str:
+        hash_sha256, obtener_archivo = await self._origen_por_id(id, data.metadata)
+        docx_bytes = await self._documento(hash_sha256, obtener_archivo, data.metadata, data.motor, "docx")
+        return base64.b64encode(docx_bytes).decode("utf-8")
 
-    def remplazar(self, data: CambiarWordDTO) -> Union[str, bytes]:
-        archivo_docx_bytes = self.files_service.base64_a_bytes(b64=data.archivo)
-        base64nuevo = self.replacer_service.reemplazar_placeholder_word(archivo_docx=archivo_docx_bytes, metadata=data.metadata, formato='base64')
-        return base64nuevo
+    async def verificar_placeholders_por_id(self, id: str, data: CambiarPlantillaDTO) -> ReportePlaceholdersDTO:
+        """ Qué placeholders quedarían sin completar con esta metadata (y qué claves sobran), sin renderizar. """
+        model = await self.plantillas_service.obtener_por_id(id)
+        return self.replacer_service.reporte_inventario(await self._placeholders_de(model), data.metadata)
 
-    def remplazar_y_devolver_pdf(self, data: CambiarWordDTO, devolver_en_base64: bool = False) -> Union[str, bytes]:
+    async def remplazar_y_devolver_pdf(self, data: CambiarWordDTO, devolver_en_base64: bool = False) -> Union[str, bytes]:
         """
         1) Decodifica el DOCX base64.
         2) Reemplaza placeholders -> DOCX en bytes (formato='file').
         3) Llama a file-converter-service y obtiene el PDF en bytes.
         4) Devuelve bytes o base64 del PDF según 'devolver_en_base64'.
+        Lo que usa CPU corre en el threadpool; la espera de la conversión no ocupa ningún hilo.
+        Con cache de documentos, un PDF ya generado con la misma plantilla y metadata se devuelve sin 2) ni 3).
         """
         # 1) DOCX original (bytes)
-        archivo_docx_bytes = self.files_service.base64_a_bytes(b64=data.archivo)
+        archivo_docx_bytes = await run_in_threadpool(self.files_service.base64_a_bytes, b64=data.archivo)
+        hash_sha256, obtener_archivo = await self._origen_subido(archivo_docx_bytes)
+        pdf_bytes = await self._documento(hash_sha256, obtener_archivo, data.metadata, data.motor, "pdf")
+        return base64.b64encode(pdf_bytes).decode("ascii") if devolver_en_base64 else pdf_bytes
+
+    async def remplazar_y_devolver_pdf_por_id(self, id: str, data: CambiarPlantillaDTO,
+                                              devolver_en_base64: bool = False) -> Union[str, bytes]:
+        """ Igual que remplazar_y_devolver_pdf pero con la plantilla guardada: no viaja el DOCX. """
+        hash_sha256, obtener_archivo = await self._origen_por_id(id, data.metadata)
+        pdf_bytes = await self._documento(hash_sha256, obtener_archivo, data.metadata, data.motor, "pdf")
+        return base64.b64encode(pdf_bytes).decode("ascii") if devolver_en_base64 else pdf_bytes
+
+    async def abrir_pdf(self, data: CambiarWordDTO) -> Union[bytes, httpx.Response]:
+        """
+        Como remplazar_y_devolver_pdf pero devuelve la respuesta del conversor abierta para reenviarla en chunks.
+        Si el PDF estaba en el cache de documentos (o lo terminó de generar un pedido idéntico en curso)
+        se devuelven directamente los bytes.
+        """
+        archivo_docx_bytes = await run_in_threadpool(self.files_service.base64_a_bytes, b64=data.archivo)
+        return await self.abrir_pdf_desde_archivo(archivo_docx_bytes, data.metadata, data.motor)
+
+    async def abrir_pdf_por_id(self, id: str, data: CambiarPlantillaDTO) -> Union[bytes, httpx.Response]:
+        hash_sha256, obtener_archivo = await self._origen_por_id(id, data.metadata)
+        return await self._abrir_pdf(hash_sha256, obtener_archivo, data.metadata, data.motor)
+
+    async def abrir_pdf_subido(self, archivo_docx_bytes: bytes, metadata_json: str,
+                               motor: Optional[str]) -> Union[bytes, httpx.Response]:
+        """ DOCX subido en binario (sin base64) y metadata como JSON en texto. """
+        metadata = self.files_service.json_a_dict(metadata_json)
+        return await self.abrir_pdf_desde_archivo(archivo_docx_bytes, metadata, motor)
+
+    async def remplazar_subido(self, archivo_docx_bytes: bytes, metadata_json: str, motor: Optional[str]) -> bytes:
+        metadata = self.files_service.json_a_dict(metadata_json)
+        hash_sha256, obtener_archivo = await self._origen_subido(archivo_docx_bytes)
+        return await self._documento(hash_sha256, obtener_archivo, metadata, motor, "docx")
+
+    async def abrir_pdf_desde_archivo(self, archivo_docx_bytes: bytes, metadata: dict, motor: Optional[str],
+                                      hash_sha256: Optional[str] = None) -> Union[bytes, httpx.Response]:
+        if hash_sha256 is None:
+            hash_sha256, obtener_archivo = await self._origen_subido(archivo_docx_bytes)
+        else:
+            obtener_archivo = self._devolver(archivo_docx_bytes)
+        return await self._abrir_pdf(hash_sha256, obtener_archivo, metadata, motor)
+
+    async def _origen_subido(self, archivo_docx_bytes: bytes) -> Tuple[str, Callable[[], Awaitable[bytes]]]:
+        hash_sha256 = await run_in_threadpool(self.files_service.sha256_hex, archivo_docx_bytes)
+        return hash_sha256, self._devolver(archivo_docx_bytes)
+
+    async def _origen_por_id(self, id: str, metadata: dict) -> Tuple[str, Callable[[], Awaitable[bytes]]]:
+        """
+        El hash sale de la metadata; el DOCX se lee solo si hay que generar el documento.
+        Si a la metadata le faltan placeholders se rechaza acá, sin parsear ni convertir nada.
+        """
+        model = await self.plantillas_service.obtener_por_id(id)
+        if settings.render_validar_placeholders:
+            faltantes = self.replacer_service.reporte_inventario(await self._placeholders_de(model), metadata).sin_completar
+            if faltantes:
+                raise TributarioException(mensaje=self._mensaje_faltantes(faltantes))
+        hash_sha256, ubicacion = self._binario_render(model)
+        return hash_sha256, lambda: self.binarios_service.obtener(ubicacion)
+
+    @staticmethod
+    def _binario_render(model: PlantillaModel) -> Tuple[str, str]:
+        """ Hash y ubicación del DOCX que se renderiza: el normalizado si la plantilla lo tiene. """
+        if model.hashNormalizado and model.ubicacionNormalizada:
+            return model.hashNormalizado, model.ubicacionNormalizada
+        return model.hashSha256, model.ubicacionObs
+
+    async def _placeholders_de(self, model: PlantillaModel) -> List[str]:
+        """ Inventario guardado; las plantillas subidas antes de que existiera se compilan una vez y se completa. """
+        if model.placeholders is not None:
+            return model.placeholders
+        hash_sha256, ubicacion = self._binario_render(model)
+        archivo_docx_bytes = await self.binarios_service.obtener(ubicacion)
+        placeholders = await run_in_threadpool(self._inventario, archivo_docx_bytes, hash_sha256)
+        await self.plantillas_service.guardar_placeholders(model.id, placeholders)
+        logger.info(f"Se completó el inventario de placeholders de la plantilla {model.id} ({len(placeholders)})")
+        return placeholders
+
+    def _inventario(self, archivo_docx_bytes: bytes, hash_sha256: str) -> List[str]:
+        # Queda compilada en el LRU del replacer: el primer render no vuelve a parsear
+        plantilla = self.replacer_service.compilar_plantilla(archivo_docx_bytes, hash_sha256=hash_sha256)
+        return self.replacer_service.inventario(plantilla)
+
+    def _normalizar(self, archivo_docx_bytes: bytes, hash_sha256: str) -> Optional[Tuple[bytes, str]]:
+        """ DOCX normalizado y su hash; None si no hay normalizador o no cambió nada. """
+        if self.normalizador is None:
+            return None
+        try:
+            normalizado = self.normalizador.normalizar(archivo_docx_bytes)
+        except Exception as e:
+            raise TributarioException(f"Error al procesar el Word: {str(e)}")
+        hash_normalizado = self.files_service.sha256_hex(normalizado)
+        if hash_normalizado == hash_sha256:
+            return None
+        return normalizado, hash_normalizado
+
+    @staticmethod
+    def _mensaje_faltantes(faltantes: List[str]) -> str:
+        return (f"A la metadata le faltan valores para {len(faltantes)} placeholders de la plantilla: "
+                f"{', '.join(faltantes[:20])}{'...' if len(faltantes) > 20 else ''}")
+
+    @staticmethod
+    def _devolver(archivo_docx_bytes: bytes) -> Callable[[], Awaitable[bytes]]:
+        async def obtener() -> bytes:
+            return archivo_docx_bytes
+        return obtener
+
+    def _clave_documento(self, hash_sha256: str, metadata: dict, motor: Optional[str], formato: str) -> str:
+        motor = (motor or self.replacer_service.motor_default).lower()
+        return self.documentos_cache.calcular_clave(hash_sha256, metadata, formato, motor)
 
-        # 2) DOCX con placeholders reemplazados -> en BYTES
-        #    (cambiado de formato='base64' a formato='file')
-        docx_reemplazado_bytes = self.replacer_service.reemplazar_placeholder_word(
+    async def _documento(self, hash_sha256: str, obtener_archivo: Callable[[], Awaitable[bytes]], metadata: dict,
+                         motor: Optional[str], formato: str) -> bytes:
+        """ DOCX reemplazado (formato 'docx') o PDF ('pdf'), pasando por el cache de documentos si está habilitado. """
+        async def generar() -> bytes:
+            # 2) DOCX con placeholders reemplazados -> en BYTES
+            docx_reemplazado_bytes = await self._renderizar(await obtener_archivo(), metadata, motor, hash_sha256)
+            if formato == "docx":
+                return docx_reemplazado_bytes
+            # 3) Convertir a PDF llamando al servicio externo
+            return await self.files_converter_client.convertir_word_to_pdf(docx_bytes=docx_reemplazado_bytes)
+
+        if self.documentos_cache is None:
+            return await generar()
+        clave = self._clave_documento(hash_sha256, metadata, motor, formato)
+        return await self.documentos_cache.obtener_o_generar(clave, generar)
+
+    async def _abrir_pdf(self, hash_sha256: str, obtener_archivo: Callable[[], Awaitable[bytes]], metadata: dict,
+                         motor: Optional[str]) -> Union[bytes, httpx.Response]:
+        async def abrir() -> httpx.Response:
+            docx_reemplazado_bytes = await self._renderizar(await obtener_archivo(), metadata, motor, hash_sha256)
+            return await self.files_converter_client.abrir_conversion(docx_bytes=docx_reemplazado_bytes)
+
+        if self.documentos_cache is None:
+            return await abrir()
+        # Se reenvía en streaming igual que sin cache; se guarda al terminar y los pedidos idénticos lo esperan
+        clave = self._clave_documento(hash_sha256, metadata, motor, "pdf")
+        return await self.documentos_cache.abrir_o_compartir(clave, abrir)
+
+    async def _renderizar(self, archivo_docx_bytes: bytes, metadata: dict, motor: Optional[str],
+                          hash_sha256: Optional[str] = None, formato: str = "file") -> Union[str, bytes]:
+        if self.render_pool is not None:
+            return await self.render_pool.renderizar(archivo_docx_bytes, metadata, formato, motor, hash_sha256)
+        return await run_in_threadpool(
+            self.replacer_service.reemplazar_placeholder_word,
             archivo_docx=archivo_docx_bytes,
-            metadata=data.metadata,
-            formato="file"
+            metadata=metadata,
+            formato=formato,
+            motor=motor,
+            hash_sha256=hash_sha256
         )
 
-        # 3) Convertir a PDF llamando al servicio externo
-        pdf_bytes = self.files_converter_client.convertir_word_to_pdf(
-            docx_bytes=docx_reemplazado_bytes
-        )
+    async def generar_lote(self, data: GenerarLoteDTO) -> AsyncIterator[bytes]:
+        """
+        Genera un documento por fila a partir de una única plantilla.
+        La plantilla se decodifica y compila una sola vez; las filas se renderizan
+        (y convierten a PDF) en paralelo hasta `lote_max_concurrencia`.
+        Devuelve un ZIP en streaming con un archivo por fila y 'errores.json'
+        con las filas que fallaron y las que quedaron con placeholders sin completar.
+        """
+        formato = (data.formato or "").lower()
+        if formato not in ("pdf", "docx"):
+            raise TributarioException(f"Se ingresó el formato '{data.formato}' que no es aceptado. Debe ser 'pdf' o 'docx'.")
+        if not data.filas:
+            raise TributarioException("El lote no tiene filas para generar.")
+        if len(data.filas) > settings.lote_max_filas:
+            raise TributarioException(f"El lote supera el máximo de {settings.lote_max_filas} filas.")
+
+        if data.plantilla_id:
+            archivo_docx_bytes, hash_sha256 = await self._obtener_archivo_plantilla(data.plantilla_id)
+        elif data.archivo:
+            archivo_docx_bytes = await run_in_threadpool(self.files_service.base64_a_bytes, b64=data.archivo)
+            hash_sha256 = None
+        else:
+            raise TributarioException("Se debe indicar 'archivo' o 'plantilla_id'.")
+        if hash_sha256 is None:
+            hash_sha256 = await run_in_threadpool(self.files_service.sha256_hex, archivo_docx_bytes)
+        # Se compila acá también con pool: valida la plantilla antes de empezar y arma el reporte de placeholders
+        plantilla = await run_in_threadpool(self.replacer_service.compilar_plantilla, archivo_docx_bytes, data.motor,
+                                            hash_sha256)
+
+        # Con plantilla guardada, las filas con placeholders sin completar van a errores sin renderizarse
+        validar = bool(data.plantilla_id) and settings.render_validar_placeholders
+        return self._stream_lote(plantilla, data.filas, formato, data.lote_id,
+                                 (archivo_docx_bytes, hash_sha256, data.motor), validar)
+
+    async def _stream_lote(self, plantilla, filas: List[FilaLoteDTO], formato: str, lote_id,
+                           origen: Tuple[bytes, str, Optional[str]], validar: bool = False) -> AsyncIterator[bytes]:
+        zip_stream = ZipStreaming()
+        errores = []
+        advertencias = []
+        max_en_vuelo = max(1, settings.lote_max_concurrencia)
+
+        pendientes = {}
+        siguiente = 0
+        try:
+            while siguiente < len(filas) or pendientes:
+                # Mantener a lo sumo 'max_en_vuelo' filas en proceso (memoria acotada)
+                while siguiente < len(filas) and len(pendientes) < max_en_vuelo:
+                    fila = filas[siguiente]
+                    # Una vez por fila: sirve para validar y para las advertencias del resumen
+                    reporte = self.replacer_service.reporte_placeholders(plantilla, fila.metadata)
+                    if validar and reporte.sin_completar:
+                        errores.append({"fila": siguiente, "demanda_id": fila.demanda_id,
+                                        "error": self._mensaje_faltantes(reporte.sin_completar)})
+                    else:
+                        futuro = asyncio.ensure_future(self._renderizar_fila(plantilla, fila, formato, origen, reporte))
+                        pendientes[futuro] = (siguiente, fila, reporte)
+                    siguiente += 1
+                if not pendientes:
+                    break
 
-        # 4) Salida
-        if devolver_en_base64:
-            return base64.b64encode(pdf_bytes).decode("ascii")
-        return pdf_bytes
+                listos, _ = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for futuro in listos:
+                    indice, fila, reporte = pendientes.pop(futuro)
+                    try:
+                        contenido = futuro.result()
+                    except Exception as e:
+                        mensaje = e.mensaje if isinstance(e, TributarioException) else str(e)
+                        logger.info(f"Lote {lote_id or ''}: falló la fila {indice} ({fila.demanda_id}): {mensaje}")
+                        errores.append({"fila": indice, "demanda_id": fila.demanda_id, "error": mensaje})
+                        continue
+                    zip_stream.agregar(self._nombre_archivo_fila(indice, fila, formato), contenido)
+                    if reporte.sin_completar or reporte.desconocidos:
+                        advertencias.append({"fila": indice, "demanda_id": fila.demanda_id, **reporte.model_dump()})
+                    yield zip_stream.pendiente()
+        finally:
+            # El cliente cortó la descarga: no seguimos convirtiendo filas que nadie va a leer
+            for futuro in pendientes:
+                futuro.cancel()
 
-    def agregar_plantilla(self, data: SubirPlantillaDTO) -> str:
-        archivo_bytes = self.files_service.base64_a_bytes(data.archivo)
+        resumen = {"lote_id": lote_id, "total": len(filas), "generados": len(filas) - len(errores), "errores": errores,
+                   "advertencias": sorted(advertencias, key=lambda a: a["fila"])}
+        zip_stream.agregar("errores.json", json.dumps(resumen, ensure_ascii=False, indent=2).encode("utf-8"))
+        yield zip_stream.cerrar()
+
+    async def _renderizar_fila(self, plantilla, fila: FilaLoteDTO, formato: str,
+                               origen: Tuple[bytes, str, Optional[str]], reporte: ReportePlaceholdersDTO) -> bytes:
+        if self.render_pool is not None:
+            archivo_docx_bytes, hash_sha256, motor = origen
+            # Una fila no falla por saturación: espera lugar en el pool (el 503 es para los pedidos interactivos)
+            docx_bytes = await self.render_pool.renderizar(archivo_docx_bytes, fila.metadata, "file", motor, hash_sha256,
+                                                           esperar=True)
+        else:
+            # El reporte ya se armó al programar la fila
+            docx_bytes = await run_in_threadpool(self.replacer_service.reemplazar_en_plantilla, plantilla,
+                                                 metadata=fila.metadata, formato="file", informar=False)
+            self.replacer_service.informar_placeholders(reporte)
+        if formato == "docx":
+            return docx_bytes
+        return await self.files_converter_client.convertir_word_to_pdf(docx_bytes=docx_bytes, filename=fila.demanda_id or None)
+
+    @staticmethod
+    def _nombre_archivo_fila(indice: int, fila: FilaLoteDTO, formato: str) -> str:
+        stem = re.sub(r'[\\/*?:"<>|\s]+', "_", fila.demanda_id or "").strip("_") or "documento"
+        return f"{indice + 1:05d}_{stem}.{formato}"
+
+    async def agregar_plantilla(self, data: SubirPlantillaDTO) -> str:
+        archivo_bytes = await run_in_threadpool(self.files_service.base64_a_bytes, data.archivo)
         data.archivo = ""
 
         id_usuario = "SACARLO DEL JWT CUANDO ESTE"
         nombre_usuario = "SACARLO DEL JWT CUANDO ESTE"
-        hashSha256 = self.files_service.sha256_hex(archivo_bytes)
+        hashSha256 = await run_in_threadpool(self.files_service.sha256_hex, archivo_bytes)
         tamano = self.files_service.tamano_bytes(archivo_bytes)
-        nuevo_id,ubicacion_obs = self.plantillas_service.agregar_plantilla(data,hashSha256,tamano,id_usuario,nombre_usuario)
+
+        # Misma plantilla (mismo contenido y datos) ya subida: se devuelve la existente sin escribir nada
+        existente = await self.plantillas_service.obtener_duplicada(data, hashSha256)
+        if existente is not None:
+            logger.info(f"La plantilla ya existía con id {existente.id} (hash {hashSha256[:12]})")
+            return existente.id
+
+        # Runs unidos y sin marcas de corrección: el render siempre encuentra cada placeholder en un solo <w:t>
+        normalizado = await run_in_threadpool(self._normalizar, archivo_bytes, hashSha256)
+        hash_normalizado = normalizado[1] if normalizado else None
+        ubicacion_normalizada = self.binarios_service.ubicacion_por_hash(hash_normalizado) if normalizado else None
+
+        # Se recorre el DOCX una sola vez (cuerpo, tablas, encabezados/pies, tokens partidos): valida el Word
+        # y deja guardados los placeholders que pide
+        archivo_render, hash_render = normalizado or (archivo_bytes, hashSha256)
+        placeholders = await run_in_threadpool(self._inventario, archivo_render, hash_render)
+
+        ubicacion_obs = self.binarios_service.ubicacion_por_hash(hashSha256)
+        nuevo_id,ubicacion_obs = await self.plantillas_service.agregar_plantilla(data,hashSha256,tamano,id_usuario,nombre_usuario,
+                                                                                ubicacion_obs=ubicacion_obs,
+                                                                                placeholders=placeholders,
+                                                                                hash_normalizado=hash_normalizado,
+                                                                                ubicacion_normalizada=ubicacion_normalizada)
+
+        # Guardar los DOCX (o sumar una referencia si el contenido ya existe); si falla no dejamos un registro sin archivo
+        guardados = []
+        try:
+            await self.binarios_service.guardar(hashSha256, archivo_bytes)
+            guardados.append((hashSha256, ubicacion_obs))
+            if normalizado:
+                await self.binarios_service.guardar(hash_normalizado, normalizado[0])
+        except Exception as e:
+            logger.error(f"No se pudo guardar el archivo de la plantilla {nuevo_id}: {e}")
+            await self.plantillas_service.revertir_agregar_plantilla(nuevo_id)
+            for hash_guardado, ubicacion in guardados:
+                try:
+                    await self.binarios_service.liberar(hash_guardado, ubicacion)
+                except Exception as e_liberar:
+                    logger.error(f"No se pudo liberar el archivo {ubicacion}: {e_liberar}")
+            raise TributarioException(mensaje="No se pudo guardar el archivo de la plantilla.", mensaje_original=str(e))
         return nuevo_id
 
-    def obtener_plantilla_por_id(self, id: str) -> PlantillaOutDTO:
-        model = self.plantillas_service.obtener_por_id(id)
+    async def _obtener_archivo_plantilla(self, id: str) -> Tuple[bytes, str]:
+        model = await self.plantillas_service.obtener_por_id(id)
+        hash_sha256, ubicacion = self._binario_render(model)
+        return await self.binarios_service.obtener(ubicacion), hash_sha256
+
+    async def obtener_plantilla_por_id(self, id: str) -> PlantillaOutDTO:
+        model = await self.plantillas_service.obtener_por_id(id)
         return PlantillaOutDTO.from_model(model)
 
-    def eliminar_plantilla(self, id: str) -> str:
-        model = self.plantillas_service.obtener_por_id(id)
+    async def eliminar_plantilla(self, id: str) -> str:
+        model = await self.plantillas_service.obtener_por_id(id)
         logger.info(model.ubicacionObs)
 
         #Eliminar registro de la base de datos
-        self.plantillas_service.eliminar_plantilla(id)
+        await self.plantillas_service.eliminar_plantilla(id)
+
+        #Liberar los archivos: se borran cuando ninguna otra plantilla los usa (si falla quedan huérfanos)
+        binarios = [(model.hashSha256, model.ubicacionObs)]
+        if model.hashNormalizado and model.ubicacionNormalizada:
+            binarios.append((model.hashNormalizado, model.ubicacionNormalizada))
+        for hash_sha256, ubicacion in binarios:
+            try:
+                await self.binarios_service.liberar(hash_sha256, ubicacion)
+            except Exception as e:
+                logger.error(f"No se pudo eliminar el archivo {ubicacion}: {e}")
         return id
 
-    def filtrar_plantillas(self, **filtros) -> List[PlantillaOutShortDTO]:
-        plantillas = self.plantillas_service.filtrar_plantillas(**filtros)
-        return [PlantillaOutShortDTO.from_model(plantilla) for plantilla in plantillas]
+    async def filtrar_plantillas(self, **filtros) -> PaginaDTO[PlantillaOutShortDTO]:
+        docs, siguiente_cursor = await self.plantillas_service.filtrar_plantillas(**filtros)
+        return PaginaDTO[PlantillaOutShortDTO](items=[PlantillaOutShortDTO.from_doc(doc) for doc in docs],
+                                               siguiente_cursor=siguiente_cursor)
 
@@ -1,14 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from pymongo import MongoClient
 from fastapi.middleware.cors import CORSMiddleware
 from exceptions.tributarios_exception import TributarioException
+from exceptions.servicio_saturado_exception import ServicioSaturadoException
 from facades.plantillas_facade import PlantillasFacade
-from presentation.handler import global_exception_handler,tributario_exception_handler
+from presentation.handler import global_exception_handler,tributario_exception_handler,servicio_saturado_exception_handler
+from presentation.metricas_controller import get_metricas_router
+from presentation.metricas_middleware import MetricasMiddleware
 from presentation.plantillas_controller import get_plantillas_router
+from repositories.mongo_conexion import MongoConexion
 from repositories.plantillas_repository import PlantillasRepository
+from repositories.plantillas_cache_repository import PlantillasCacheRepository
+from repositories.plantillas_binarios_repository import GridFsPlantillasBinariosRepository, \
+    LocalPlantillasBinariosRepository
+from repositories.plantillas_binarios_refs_repository import PlantillasBinariosRefsRepository
+from services.documentos_cache_service import DocumentosCacheService
 from services.files_converter_client import FileConverterClient
 from services.files_service import FileService
+from services.metricas_service import registro
 from services.plantillas_service import PlantillasService
+from services.normalizador_docx import NormalizadorDocx
+from services.plantillas_binarios_service import PlantillasBinariosService
+from services.render_pool_service import RenderPoolService
 from services.word_replacer_service import WordReplacerService
 from settings.config import settings,logger
 from services.health_service import HealthService
@@ -18,28 +32,116 @@ import logging
 
 logger.info(f"Iniciando aplicación de plantillas con configuracion: {settings}")
 
-# Conectar a MongoDB usando la URL de configuración
-mongo_client = MongoClient(settings.mongo_url)
-db = mongo_client.get_default_database()
-plantillas_collection = db["plantillas"]
+# Cliente de MongoDB: se conecta en el arranque de la app (lifespan)
+mongo_conexion = MongoConexion(
+    settings.mongo_url,
+    pool_max=settings.mongo_pool_max,
+    pool_min=settings.mongo_pool_min,
+    max_idle_ms=settings.mongo_max_idle_ms,
+    timeout_seleccion_ms=settings.mongo_timeout_seleccion_ms,
+    timeout_conexion_ms=settings.mongo_timeout_conexion_ms,
+    timeout_socket_ms=settings.mongo_timeout_socket_ms,
+    read_preference=settings.mongo_read_preference,
+    write_concern=settings.mongo_write_concern,
+)
 
 # Instanciar las dependencias
-plantillas_repository = PlantillasRepository(plantillas_collection)
-plantillas_service = PlantillasService(plantillas_repository)
+plantillas_repository = PlantillasRepository(mongo_conexion)
+plantillas_cache_repository = None
+if settings.plantillas_metadata_cache_entradas > 0:
+    plantillas_cache_repository = PlantillasCacheRepository(
+        plantillas_repository,
+        max_entradas=settings.plantillas_metadata_cache_entradas,
+        ttl_segundos=settings.plantillas_metadata_cache_ttl_segundos,
+        polling_segundos=settings.plantillas_metadata_cache_polling_segundos,
+    )
+plantillas_service = PlantillasService(plantillas_cache_repository or plantillas_repository, limite_busqueda=settings.busqueda_limite,
+                                       limite_busqueda_max=settings.busqueda_limite_max)
+
+if settings.storage_plantillas == "local":
+    binarios_repository = LocalPlantillasBinariosRepository(settings.storage_directorio)
+else:
+    binarios_repository = GridFsPlantillasBinariosRepository(mongo_conexion)
+binarios_refs_repository = PlantillasBinariosRefsRepository(mongo_conexion)
+binarios_service = PlantillasBinariosService(binarios_repository, binarios_refs_repository,
+                                             max_cache_mb=settings.plantillas_cache_mb)
 
 files_service = FileService()
-replacer_service = WordReplacerService()
-files_client = FileConverterClient()
+replacer_service = WordReplacerService(max_plantillas_compiladas=settings.plantillas_compiladas_max,
+                                       motor_default=settings.motor_render)
+render_pool = None
+if settings.render_procesos != 0:
+    render_pool = RenderPoolService(replacer_service, procesos=settings.render_procesos,
+                                    max_cola=settings.render_cola_max,
+                                    max_plantillas_compiladas=settings.plantillas_compiladas_max)
+    registro.gauge("render_pool_en_vuelo", "Renders en el pool de procesos (en curso + esperando)",
+                   funcion=lambda: render_pool.estadisticas()["en_vuelo"])
+files_client = FileConverterClient(
+    base_urls=settings.file_converter_urls_list,
+    max_conexiones=settings.file_converter_max_conexiones,
+    max_keepalive=settings.file_converter_max_keepalive,
+    keepalive_segundos=settings.file_converter_keepalive_segundos,
+    timeout_conexion=settings.file_converter_timeout_conexion_segundos,
+    timeout_lectura=settings.file_converter_timeout_lectura_segundos,
+    timeout_escritura=settings.file_converter_timeout_escritura_segundos,
+    timeout_pool=settings.file_converter_timeout_pool_segundos,
+    reintentos=settings.file_converter_reintentos,
+    backoff_base_segundos=settings.file_converter_backoff_base_segundos,
+    backoff_max_segundos=settings.file_converter_backoff_max_segundos,
+    afinidad=settings.file_converter_afinidad,
+    holgura_afinidad=settings.file_converter_afinidad_holgura,
+    fallas_para_abrir=settings.file_converter_fallas_para_abrir,
+    circuito_abierto_segundos=settings.file_converter_circuito_abierto_segundos,
+    hedge_segundos=settings.file_converter_hedge_segundos,
+    segundos_por_pedido=settings.file_converter_segundos_por_pedido,
+)
+documentos_cache = None
+if settings.documentos_cache_habilitado:
+    documentos_cache = DocumentosCacheService(
+        directorio=settings.documentos_cache_directorio,
+        max_memoria_bytes=settings.documentos_cache_memoria_mb * 1024 * 1024,
+        max_disco_bytes=settings.documentos_cache_disco_mb * 1024 * 1024,
+        max_edad_segundos=settings.documentos_cache_max_edad_horas * 3600,
+        max_entrada_bytes=settings.documentos_cache_max_documento_mb * 1024 * 1024,
+    )
+    registro.gauge("documentos_cache_memoria_bytes", "Bytes de documentos generados en el cache en memoria",
+                   funcion=lambda: documentos_cache.estadisticas()["memoria_bytes"])
+    registro.gauge("documentos_cache_disco_bytes", "Bytes de documentos generados en el cache en disco",
+                   funcion=lambda: documentos_cache.estadisticas()["disco_bytes"])
 plantillas_facade = PlantillasFacade(plantillas_service=plantillas_service,files_service=files_service,
-                                     replacer_service=replacer_service, files_converter_client=files_client)
-health_service = HealthService(db)
+                                     replacer_service=replacer_service, files_converter_client=files_client,
+                                     binarios_service=binarios_service, render_pool=render_pool,
+                                     documentos_cache=documentos_cache,
+                                     normalizador=NormalizadorDocx() if settings.plantillas_normalizar else None)
+health_service = HealthService(mongo_conexion)
+
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mongo_conexion.conectar()
+    await plantillas_repository.crear_indices()
+    await plantillas_repository.completar_palabras_busqueda()
+    if plantillas_cache_repository is not None:
+        plantillas_cache_repository.iniciar()
+    await binarios_refs_repository.crear_indices()
+    if render_pool is not None:
+        render_pool.iniciar()
+    yield
+    await files_client.cerrar()
+    if render_pool is not None:
+        render_pool.detener()
+    if plantillas_cache_repository is not None:
+        await plantillas_cache_repository.detener()
+    await mongo_conexion.cerrar()
 
 
-app = FastAPI(docs_url="/plantillas/docs",openapi_url="/plantillas/openapi.json")
+app = FastAPI(docs_url="/plantillas/docs",openapi_url="/plantillas/openapi.json", lifespan=lifespan)
 
 app.include_router(get_plantillas_router(plantillas_facade), prefix="/plantillas/api", tags=["Plantillas"])
 app.include_router(get_health_router(health_service))
+app.include_router(get_metricas_router(registro))
+app.add_exception_handler(ServicioSaturadoException,servicio_saturado_exception_handler)
 app.add_exception_handler(TributarioException,tributario_exception_handler)
 app.add_exception_handler(Exception,global_exception_handler)
 
@@ -49,6 +151,7 @@ class HealthEndpointFilter(logging.Filter):
         return not (
             "GET /health" in record.getMessage()
             or "POST /health" in record.getMessage()
+            or "GET /metrics" in record.getMessage()
         )
 
 # Agregar el filtro al logger de access logs de uvicorn
@@ -68,3 +171,4 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricasMiddleware)
@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from settings.config import logger
 from domain.dtos.plantilla_dto import BaseResponseDTO
 from exceptions.tributarios_exception import TributarioException
+from exceptions.servicio_saturado_exception import ServicioSaturadoException
 
 def tributario_exception_handler(request: Request, exc: TributarioException):
     logger.info(f"[ERROR] Excepción controlada en {request.url.path}")
@@ -16,6 +17,18 @@ def tributario_exception_handler(request: Request, exc: TributarioException):
         ).model_dump()
     )
 
+def servicio_saturado_exception_handler(request: Request, exc: ServicioSaturadoException):
+    logger.warning(f"[SATURADO] {request.url.path}: {exc.mensaje}")
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after_segundos)},
+        content=BaseResponseDTO(
+            error=True,
+            mensaje=exc.mensaje,
+            data=None
+        ).model_dump()
+    )
+
 def global_exception_handler(request: Request, exc: Exception):
     logger.info(f"[ERROR] Excepción no controlada en {request.url.path}")
     logger.info(f"{exc}")
@@ -9,8 +9,8 @@ def get_health_router(health_service: HealthService) -> APIRouter:
         return {"status": "ok"}
 
     @router.get("/health/readiness", tags=["Health"])
-    def readiness_check():
-        if health_service.is_ready():
+    async def readiness_check():
+        if await health_service.is_ready():
             return {"status": "ready"}
         return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
 
@@ -0,0 +1,59 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metricas_service import HTTP_DURACION, HTTP_EN_CURSO, formatear_server_timing, iniciar_fases, \
+    terminar_fases
+
+
+def _plantilla_ruta(scope: Scope) -> str:
+    """ '/plantillas/api/plantillas/{id}' en lugar de la URL con el id (acota la cardinalidad). """
+    route = scope.get("route")
+    plantilla = getattr(route, "path", None)
+    if not plantilla:
+        return "sin_ruta"
+    # Según la versión de FastAPI, la ruta de un router incluido no trae el prefijo: se toma de la URL
+    segmentos = scope["path"].rstrip("/").split("/")
+    sobrantes = len(segmentos) - len(plantilla.rstrip("/").split("/"))
+    if sobrantes > 0:
+        plantilla = "/".join(segmentos[:sobrantes + 1]) + plantilla
+    return plantilla
+
+
+class MetricasMiddleware:
+    """
+    Mide cada request HTTP por ruta (el template, no la URL con ids) y agrega el
+    header Server-Timing con las fases medidas durante el request.
+    ASGI puro: no bufferiza los cuerpos de las respuestas streaming.
+    Igual en los dos servicios, como services/metricas_service.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        fases, token = iniciar_fases()
+        estado = 500
+
+        async def enviar(message: Message) -> None:
+            nonlocal estado
+            if message["type"] == "http.response.start":
+                estado = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", formatear_server_timing(fases, time.perf_counter() - inicio))
+            await send(message)
+
+        HTTP_EN_CURSO.incrementar()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            HTTP_EN_CURSO.decrementar()
+            terminar_fases(token)
+            ruta = _plantilla_ruta(scope)
+            HTTP_DURACION.observar(time.perf_counter() - inicio, metodo=scope["method"], ruta=ruta, estado=str(estado))
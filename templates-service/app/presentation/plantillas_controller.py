@@ -1,38 +1,75 @@
-from typing import List, Optional
+from typing import Optional, Tuple, Union
 
-from fastapi import APIRouter,Depends
-from starlette.responses import StreamingResponse
+import httpx
+from fastapi import APIRouter, Depends, File, Form, Request, UploadFile
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse, Response
 
-from domain.dtos.plantilla_dto import BaseResponseDTO, PlantillaOutShortDTO, FiltroPlantillasDTO, SubirPlantillaDTO, PlantillaOutDTO, CambiarWordDTO
+from domain.dtos.plantilla_dto import BaseResponseDTO, PlantillaOutShortDTO, FiltroPlantillasDTO, SubirPlantillaDTO, PlantillaOutDTO, CambiarWordDTO, \
+    GenerarLoteDTO, CambiarPlantillaDTO, ReportePlaceholdersDTO, PaginaDTO
+from exceptions.tributarios_exception import TributarioException
 from facades.plantillas_facade import PlantillasFacade
 
+_DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _respuesta_pdf(resp: Union[bytes, httpx.Response], out_name: str) -> Response:
+    """ Reenvía el PDF del conversor a medida que llega, sin juntarlo en memoria (o el PDF del cache, ya en bytes). """
+    headers = {"Content-Disposition": f'attachment; filename="{out_name}"'}
+    if isinstance(resp, bytes):
+        return Response(content=resp, media_type="application/pdf", headers=headers)
+    if "content-length" in resp.headers and "content-encoding" not in resp.headers:
+        headers["Content-Length"] = resp.headers["content-length"]
+    return StreamingResponse(
+        content=resp.aiter_bytes(),
+        media_type="application/pdf",
+        headers=headers,
+        background=BackgroundTask(resp.aclose),
+    )
+
+
+async def _leer_subida(request: Request, archivo: Optional[UploadFile], metadata: Optional[str],
+                       motor: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+    """
+    DOCX en binario:
+    - multipart/form-data: campo 'archivo' + 'metadata' (JSON) + 'motor' opcional
+    - application/octet-stream: el cuerpo es el DOCX; 'metadata' y 'motor' van en la query
+    """
+    content_type = (request.headers.get("content-type") or "").lower()
+    if archivo is not None:
+        return await archivo.read(), metadata or "{}", motor
+    if content_type.startswith("application/octet-stream"):
+        return (await request.body(), request.query_params.get("metadata") or "{}",
+                request.query_params.get("motor"))
+    raise TributarioException("Content-Type no soportado. Use multipart/form-data o application/octet-stream.")
+
 
 def get_plantillas_router(facade: PlantillasFacade) -> APIRouter:
     router = APIRouter()
 
     @router.post("/", response_model=BaseResponseDTO[str])
-    def agregar_plantilla(data: SubirPlantillaDTO):
-        nuevo_id = facade.agregar_plantilla(data)
+    async def agregar_plantilla(data: SubirPlantillaDTO):
+        nuevo_id = await facade.agregar_plantilla(data)
         return BaseResponseDTO[str](error=False, data=nuevo_id)
 
     @router.delete("/{id}", response_model=BaseResponseDTO)
-    def eliminar_plantilla(id: str):
-        facade.eliminar_plantilla(id)
+    async def eliminar_plantilla(id: str):
+        await facade.eliminar_plantilla(id)
         return BaseResponseDTO(error=False, data=None)
 
-    @router.get("/buscar_plantillas", response_model=BaseResponseDTO[List[PlantillaOutShortDTO]])
-    def buscar_plantillas(filtros: FiltroPlantillasDTO = Depends()):
-        resultados = facade.filtrar_plantillas(**filtros.model_dump(exclude_none=True))
-        return BaseResponseDTO[List[PlantillaOutShortDTO]](error=False, data=resultados)
+    @router.get("/buscar_plantillas", response_model=BaseResponseDTO[PaginaDTO[PlantillaOutShortDTO]])
+    async def buscar_plantillas(filtros: FiltroPlantillasDTO = Depends()):
+        resultados = await facade.filtrar_plantillas(**filtros.model_dump(exclude_none=True))
+        return BaseResponseDTO[PaginaDTO[PlantillaOutShortDTO]](error=False, data=resultados)
 
     @router.get("/{id}", response_model=BaseResponseDTO[PlantillaOutDTO])
-    def obtener_plantilla(id: str):
-        data = facade.obtener_plantilla_por_id(id)
+    async def obtener_plantilla(id: str):
+        data = await facade.obtener_plantilla_por_id(id)
         return BaseResponseDTO[PlantillaOutDTO](error=False, data=data)
 
     @router.post("/remplazar", response_model=BaseResponseDTO[str])
-    def remplazar(data: CambiarWordDTO):
-        codificado = facade.remplazar(data)
+    async def remplazar(data: CambiarWordDTO):
+        codificado = await facade.remplazar(data)
         return BaseResponseDTO[str](error=False, data=codificado)
 
     @router.post(
@@ -40,8 +77,8 @@ def get_plantillas_router(facade: PlantillasFacade) -> APIRouter:
         response_model=BaseResponseDTO[str],
         summary="Reemplaza placeholders y devuelve el PDF en base64",
     )
-    def remplazar_pdf_base64(data: CambiarWordDTO):
-        pdf_b64 = facade.remplazar_y_devolver_pdf(data, devolver_en_base64=True)
+    async def remplazar_pdf_base64(data: CambiarWordDTO):
+        pdf_b64 = await facade.remplazar_y_devolver_pdf(data, devolver_en_base64=True)
         return BaseResponseDTO[str](error=False, data=pdf_b64)
 
     @router.post(
@@ -49,16 +86,87 @@ def get_plantillas_router(facade: PlantillasFacade) -> APIRouter:
         summary="Reemplaza placeholders y devuelve el PDF como archivo",
         responses={200: {"content": {"application/pdf": {}}}},
     )
-    def remplazar_pdf_file(data: CambiarWordDTO):
-        pdf_bytes = facade.remplazar_y_devolver_pdf(data, devolver_en_base64=False)
-        out_name = "plantilla.pdf"
+    async def remplazar_pdf_file(data: CambiarWordDTO):
+        resp = await facade.abrir_pdf(data)
+        return _respuesta_pdf(resp, "plantilla.pdf")
+
+    @router.post(
+        "/remplazar_archivo",
+        summary="Reemplaza placeholders en un DOCX subido en binario y devuelve el DOCX",
+        responses={200: {"content": {_DOCX_MEDIA_TYPE: {}}}},
+    )
+    async def remplazar_archivo(
+        request: Request,
+        archivo: Optional[UploadFile] = File(default=None, description="DOCX (multipart/form-data)"),
+        metadata: Optional[str] = Form(default=None, description="Metadata en JSON"),
+        motor: Optional[str] = Form(default=None),
+    ):
+        docx_bytes, metadata_json, motor = await _leer_subida(request, archivo, metadata, motor)
+        contenido = await facade.remplazar_subido(docx_bytes, metadata_json, motor)
+        return Response(
+            content=contenido,
+            media_type=_DOCX_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="plantilla.docx"'},
+        )
+
+    @router.post(
+        "/remplazar_pdf_archivo",
+        summary="Reemplaza placeholders en un DOCX subido en binario y devuelve el PDF como archivo",
+        responses={200: {"content": {"application/pdf": {}}}},
+    )
+    async def remplazar_pdf_archivo(
+        request: Request,
+        archivo: Optional[UploadFile] = File(default=None, description="DOCX (multipart/form-data)"),
+        metadata: Optional[str] = Form(default=None, description="Metadata en JSON"),
+        motor: Optional[str] = Form(default=None),
+    ):
+        docx_bytes, metadata_json, motor = await _leer_subida(request, archivo, metadata, motor)
+        resp = await facade.abrir_pdf_subido(docx_bytes, metadata_json, motor)
+        return _respuesta_pdf(resp, "plantilla.pdf")
+
+    @router.post("/remplazar/{id}", response_model=BaseResponseDTO[str],
+                 summary="Reemplaza placeholders en una plantilla guardada y devuelve el DOCX en base64")
+    async def remplazar_por_id(id: str, data: CambiarPlantillaDTO):
+        codificado = await facade.remplazar_por_id(id, data)
+        return BaseResponseDTO[str](error=False, data=codificado)
+
+    @router.post("/verificar_placeholders/{id}", response_model=BaseResponseDTO[ReportePlaceholdersDTO],
+                 summary="Informa los placeholders que quedarían sin completar y las claves desconocidas de la metadata "
+                         "(contra el inventario guardado, sin leer el DOCX)")
+    async def verificar_placeholders(id: str, data: CambiarPlantillaDTO):
+        reporte = await facade.verificar_placeholders_por_id(id, data)
+        return BaseResponseDTO[ReportePlaceholdersDTO](error=False, data=reporte)
+
+    @router.post(
+        "/remplazar_pdf_base64/{id}",
+        response_model=BaseResponseDTO[str],
+        summary="Reemplaza placeholders en una plantilla guardada y devuelve el PDF en base64",
+    )
+    async def remplazar_pdf_base64_por_id(id: str, data: CambiarPlantillaDTO):
+        pdf_b64 = await facade.remplazar_y_devolver_pdf_por_id(id, data, devolver_en_base64=True)
+        return BaseResponseDTO[str](error=False, data=pdf_b64)
+
+    @router.post(
+        "/remplazar_pdf_file/{id}",
+        summary="Reemplaza placeholders en una plantilla guardada y devuelve el PDF como archivo",
+        responses={200: {"content": {"application/pdf": {}}}},
+    )
+    async def remplazar_pdf_file_por_id(id: str, data: CambiarPlantillaDTO):
+        resp = await facade.abrir_pdf_por_id(id, data)
+        return _respuesta_pdf(resp, "plantilla.pdf")
+
+    @router.post(
+        "/generar_lote",
+        summary="Genera un documento por fila con una misma plantilla y los devuelve en un ZIP",
+        responses={200: {"content": {"application/zip": {}}}},
+    )
+    async def generar_lote(data: GenerarLoteDTO):
+        contenido = await facade.generar_lote(data)
+        out_name = f"lote_{data.lote_id or 'documentos'}.zip"
         return StreamingResponse(
-            content=iter([pdf_bytes]),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="{out_name}"',
-                "Content-Length": str(len(pdf_bytes)),
-            },
+            content=contenido,
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{out_name}"'},
         )
 
     return router
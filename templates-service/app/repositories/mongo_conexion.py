@@ -0,0 +1,52 @@
+from typing import Optional
+
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+
+from exceptions.tributarios_exception import TributarioException
+from settings.config import logger
+
+
+class MongoConexion:
+    """
+    Cliente async de Mongo compartido por los repositorios. Se crea al arrancar la app
+    (lifespan) y se cierra al apagarla; los repositorios piden la base recién al usarla.
+    """
+
+    def __init__(self, url: str, pool_max: int = 100, pool_min: int = 0, max_idle_ms: int = 60000,
+                 timeout_seleccion_ms: int = 5000, timeout_conexion_ms: int = 5000, timeout_socket_ms: int = 20000,
+                 read_preference: str = "primary", write_concern: str = "majority"):
+        self.url = url
+        self.opciones = {
+            "maxPoolSize": pool_max,
+            "minPoolSize": pool_min,
+            "maxIdleTimeMS": max_idle_ms,
+            "serverSelectionTimeoutMS": timeout_seleccion_ms,
+            "connectTimeoutMS": timeout_conexion_ms,
+            "socketTimeoutMS": timeout_socket_ms,
+            "readPreference": read_preference,
+            # "majority" o la cantidad de nodos que tienen que confirmar la escritura
+            "w": int(write_concern) if write_concern.isdigit() else write_concern,
+            "appname": "templates-service",
+        }
+        self._cliente: Optional[AsyncMongoClient] = None
+        self._db: Optional[AsyncDatabase] = None
+
+    def conectar(self) -> None:
+        # El driver conecta en la primera operación; acá solo se arma el cliente con el pool configurado
+        self._cliente = AsyncMongoClient(self.url, **self.opciones)
+        self._db = self._cliente.get_default_database()
+        logger.info(f"Cliente de Mongo creado (pool {self.opciones['minPoolSize']}-{self.opciones['maxPoolSize']}, "
+                    f"read preference {self.opciones['readPreference']}, w={self.opciones['w']})")
+
+    async def cerrar(self) -> None:
+        if self._cliente is not None:
+            await self._cliente.close()
+            self._cliente = None
+            self._db = None
+
+    @property
+    def db(self) -> AsyncDatabase:
+        if self._db is None:
+            raise TributarioException(mensaje="La conexión a Mongo no está iniciada.")
+        return self._db
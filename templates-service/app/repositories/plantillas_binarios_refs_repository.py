@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.asynchronous.collection import AsyncCollection
+
+from repositories.mongo_conexion import MongoConexion
+from services.metricas_service import instrumentar_repositorio
+
+
+@instrumentar_repositorio("plantillas_binarios_refs")
+class PlantillasBinariosRefsRepository:
+    """
+    Un documento por contenido distinto (hashSha256 único) con la cantidad de
+    plantillas que lo usan. El binario se guarda una vez y se borra al llegar a 0:
+    mientras se borra el registro queda marcado (`borrando`) y se elimina recién después del binario.
+    """
+
+    def __init__(self, conexion: MongoConexion, nombre_coleccion: str = "plantillas_binarios_refs"):
+        self.conexion = conexion
+        self.nombre_coleccion = nombre_coleccion
+
+    @property
+    def collection(self) -> AsyncCollection:
+        return self.conexion.db[self.nombre_coleccion]
+
+    async def crear_indices(self) -> None:
+        await self.collection.create_index([("hashSha256", ASCENDING)], unique=True)
+
+    async def obtener_ubicacion(self, hash_sha256: str) -> Optional[str]:
+        data = await self.collection.find_one({"hashSha256": hash_sha256, "referencias": {"$gt": 0}},
+                                        {"_id": 0, "ubicacion": 1})
+        return data["ubicacion"] if data else None
+
+    async def incrementar(self, hash_sha256: str, ubicacion: str, tamano_bytes: int) -> int:
+        """ Suma una referencia (creando el registro si no existe). Devuelve las referencias previas. """
+        anterior = await self.collection.find_one_and_update(
+            {"hashSha256": hash_sha256},
+            {
+                "$inc": {"referencias": 1},
+                "$setOnInsert": {"ubicacion": ubicacion, "tamanoBytes": tamano_bytes, "fechaCreacion": datetime.now()},
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        return anterior["referencias"] if anterior else 0
+
+    async def decrementar(self, hash_sha256: str) -> Optional[str]:
+        """
+        Resta una referencia. Si no quedan, marca el registro como `borrando` y devuelve la ubicación
+        del binario para que se elimine (después, terminar_borrado); si todavía hay plantillas usándolo devuelve None.
+        """
+        anterior = await self.collection.find_one_and_update(
+            {"hashSha256": hash_sha256, "referencias": {"$gt": 0}},
+            {"$inc": {"referencias": -1}},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if not anterior or anterior["referencias"] > 1:
+            return None
+        # Solo borra quien marca el registro, y solo si nadie sumó una referencia entre medio
+        result = await self.collection.update_one(
+            {"hashSha256": hash_sha256, "referencias": {"$lte": 0}, "borrando": {"$exists": False}},
+            {"$set": {"borrando": datetime.now()}},
+        )
+        return anterior["ubicacion"] if result.modified_count else None
+
+    async def terminar_borrado(self, hash_sha256: str) -> None:
+        """ Ya eliminado el binario: borra el registro si sigue sin referencias; si no, le saca la marca. """
+        result = await self.collection.delete_one({"hashSha256": hash_sha256, "referencias": {"$lte": 0}})
+        if not result.deleted_count:
+            await self.collection.update_one({"hashSha256": hash_sha256}, {"$unset": {"borrando": ""}})
+
+    async def borrando(self, hash_sha256: str) -> bool:
+        data = await self.collection.find_one({"hashSha256": hash_sha256, "borrando": {"$exists": True}}, {"_id": 1})
+        return data is not None
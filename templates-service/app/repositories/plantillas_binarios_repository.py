@@ -0,0 +1,117 @@
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import gridfs
+from fastapi.concurrency import run_in_threadpool
+
+from exceptions.tributarios_exception import TributarioException
+from repositories.mongo_conexion import MongoConexion
+from services.metricas_service import instrumentar_repositorio
+
+
+class PlantillasBinariosRepository(ABC):
+    """
+    Almacenamiento de los DOCX de las plantillas. La clave es `ubicacionObs`
+    del PlantillaModel (p.ej. 'templates/<id>/<nombre>.docx').
+    """
+
+    @abstractmethod
+    async def guardar(self, ubicacion: str, contenido: bytes) -> None: ...
+
+    @abstractmethod
+    async def obtener(self, ubicacion: str) -> bytes: ...
+
+    @abstractmethod
+    async def eliminar(self, ubicacion: str) -> None: ...
+
+    def disparar_error_no_existe_binario(self, ubicacion: str):
+        raise TributarioException(
+            mensaje=f"No existe el archivo de la plantilla en '{ubicacion}'"
+        )
+
+
+@instrumentar_repositorio("plantillas_binarios_gridfs")
+class GridFsPlantillasBinariosRepository(PlantillasBinariosRepository):
+    """ GridFS en la misma base de Mongo (colecciones '<bucket>.files' y '<bucket>.chunks'). """
+
+    def __init__(self, conexion: MongoConexion, bucket: str = "plantillas_binarios"):
+        self.conexion = conexion
+        self.nombre_bucket = bucket
+        self._bucket = None
+
+    @property
+    def bucket(self) -> gridfs.AsyncGridFSBucket:
+        # Se arma con la primera operación: el cliente de Mongo se crea en el arranque de la app
+        if self._bucket is None:
+            self._bucket = gridfs.AsyncGridFSBucket(self.conexion.db, bucket_name=self.nombre_bucket)
+        return self._bucket
+
+    async def guardar(self, ubicacion: str, contenido: bytes) -> None:
+        await self.bucket.upload_from_stream(ubicacion, contenido)
+
+    async def obtener(self, ubicacion: str) -> bytes:
+        try:
+            # Si hubiera revisiones con el mismo nombre, devuelve la última
+            stream = await self.bucket.open_download_stream_by_name(ubicacion)
+            return await stream.read()
+        except gridfs.errors.NoFile:
+            self.disparar_error_no_existe_binario(ubicacion)
+
+    async def eliminar(self, ubicacion: str) -> None:
+        async for archivo in self.bucket.find({"filename": ubicacion}):
+            await self.bucket.delete(archivo._id)
+
+
+class LocalPlantillasBinariosRepository(PlantillasBinariosRepository):
+    """ Disco local (o volumen montado): un archivo por ubicación bajo `directorio`. El disco se usa desde el threadpool. """
+
+    def __init__(self, directorio: str):
+        self.directorio = Path(directorio).resolve()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _ruta(self, ubicacion: str) -> Path:
+        ruta = (self.directorio / ubicacion).resolve()
+        if self.directorio not in ruta.parents:
+            raise TributarioException(mensaje=f"Ubicación de plantilla inválida: '{ubicacion}'")
+        return ruta
+
+    async def guardar(self, ubicacion: str, contenido: bytes) -> None:
+        await run_in_threadpool(self._guardar, ubicacion, contenido)
+
+    async def obtener(self, ubicacion: str) -> bytes:
+        return await run_in_threadpool(self._obtener, ubicacion)
+
+    async def eliminar(self, ubicacion: str) -> None:
+        await run_in_threadpool(self._eliminar, ubicacion)
+
+    def _guardar(self, ubicacion: str, contenido: bytes) -> None:
+        ruta = self._ruta(ubicacion)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: nunca queda un DOCX a medio escribir
+        fd, tmp = tempfile.mkstemp(dir=ruta.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(contenido)
+            os.replace(tmp, ruta)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _obtener(self, ubicacion: str) -> bytes:
+        ruta = self._ruta(ubicacion)
+        if not ruta.is_file():
+            self.disparar_error_no_existe_binario(ubicacion)
+        return ruta.read_bytes()
+
+    def _eliminar(self, ubicacion: str) -> None:
+        ruta = self._ruta(ubicacion)
+        if ruta.is_file():
+            ruta.unlink()
+        # Borra la carpeta 'templates/<id>/' si quedó vacía
+        try:
+            ruta.parent.rmdir()
+        except OSError:
+            pass
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from domain.models.plantilla_model import PlantillaModel
+from repositories.plantillas_repository import PlantillasRepository
+from services.metricas_service import registro
+from settings.config import logger
+
+CONSULTAS_CACHE = registro.contador(
+    "plantillas_cache_consultas_total", "Lecturas de plantillas por id según el cache de metadata", ("resultado",)
+)
+
+
+class PlantillasCacheRepository:
+    """
+    Cache de lectura (TTL + LRU) de PlantillaModel ya validados, delante de PlantillasRepository.
+    - obtener_por_id: si está en cache no hay consulta a Mongo ni validación de Pydantic.
+    - Alta y baja desde esta réplica invalidan en el momento.
+    - Cambios hechos por otras réplicas: change stream de Mongo; si no está disponible
+      (Mongo sin replica set), se verifica cada `polling_segundos` que las plantillas cacheadas sigan existiendo.
+    El resto de los métodos se delega sin cache. Todo corre en el event loop: no hace falta lock.
+    """
+
+    def __init__(self, repository: PlantillasRepository, max_entradas: int = 1000, ttl_segundos: float = 300,
+                 polling_segundos: float = 10):
+        self.repository = repository
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.polling_segundos = polling_segundos
+        # id -> (vence, modelo)
+        self._cache: "OrderedDict[str, Tuple[float, PlantillaModel]]" = OrderedDict()
+        # Sube con cada invalidación: una lectura que empezó antes no guarda un dato viejo
+        self._generacion = 0
+        self._detener: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self.modo_invalidacion = "ninguno"
+
+    def __getattr__(self, nombre):
+        return getattr(self.repository, nombre)
+
+    # ----------------- lectura -----------------
+    async def obtener_por_id(self, id: str) -> PlantillaModel:
+        entrada = self._cache.get(id)
+        if entrada is not None and entrada[0] > time.monotonic():
+            self._cache.move_to_end(id)
+            CONSULTAS_CACHE.incrementar(resultado="hit")
+            # Copia superficial: sin validar, y quien llama no modifica la instancia cacheada
+            return entrada[1].model_copy()
+        generacion = self._generacion
+
+        CONSULTAS_CACHE.incrementar(resultado="miss")
+        modelo = await self.repository.obtener_por_id(id)
+        if generacion == self._generacion:
+            self._cache[id] = (time.monotonic() + self.ttl_segundos, modelo)
+            self._cache.move_to_end(id)
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+        return modelo.model_copy()
+
+    # ----------------- escritura (invalida) -----------------
+    async def crear_plantilla(self, plantilla: PlantillaModel) -> None:
+        self.invalidar(plantilla.id)
+        await self.repository.crear_plantilla(plantilla)
+
+    async def guardar_placeholders(self, id: str, placeholders: List[str]) -> None:
+        try:
+            await self.repository.guardar_placeholders(id, placeholders)
+        finally:
+            self.invalidar(id)
+
+    async def eliminar_por_id(self, id: str) -> None:
+        try:
+            await self.repository.eliminar_por_id(id)
+        finally:
+            self.invalidar(id)
+
+    def invalidar(self, id: Optional[str] = None) -> None:
+        """ Sin id se vacía todo el cache. """
+        self._generacion += 1
+        if id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(id, None)
+
+    # ----------------- invalidación entre réplicas -----------------
+    def iniciar(self) -> None:
+        # Se crea acá: el Event queda atado al event loop de la app
+        self._detener = asyncio.Event()
+        self._tarea = asyncio.create_task(self._loop_invalidacion(), name="plantillas-cache")
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._detener.set()
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    async def _esperar(self, segundos: float) -> bool:
+        """ Espera `segundos` o hasta que se pida detener; True si hay que detenerse. """
+        try:
+            await asyncio.wait_for(self._detener.wait(), timeout=segundos)
+        except asyncio.TimeoutError:
+            pass
+        return self._detener.is_set()
+
+    async def _loop_invalidacion(self) -> None:
+        while not self._detener.is_set():
+            try:
+                await self._escuchar_cambios()
+            except (OperationFailure, NotImplementedError) as e:
+                logger.info(f"Cache de plantillas: sin change streams ({e}); se verifica cada {self.polling_segundos}s")
+                await self._loop_polling()
+                return
+            except PyMongoError as e:
+                if self._detener.is_set():
+                    return
+                # Pudimos perder eventos mientras el stream estuvo caído
+                logger.warning(f"Cache de plantillas: se cortó el change stream ({e}); se reintenta")
+                self.invalidar()
+                await self._esperar(self.polling_segundos)
+
+    async def _escuchar_cambios(self) -> None:
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete", "invalidate"]}}}]
+        stream = await self.repository.collection.watch(pipeline, full_document="updateLookup",
+                                                        max_await_time_ms=1000)
+        async with stream:
+            self.modo_invalidacion = "change_stream"
+            # Lo que se cacheó antes de abrir el stream pudo cambiar sin aviso
+            self.invalidar()
+            while not self._detener.is_set() and stream.alive:
+                cambio = await stream.try_next()
+                if cambio is not None:
+                    self._aplicar_cambio(cambio)
+
+    def _aplicar_cambio(self, cambio: dict) -> None:
+        documento = cambio.get("fullDocument") or {}
+        if documento.get("id"):
+            self.invalidar(documento["id"])
+        else:
+            # Un delete solo trae el _id de Mongo: las bajas son raras, se vacía todo
+            self.invalidar()
+
+    async def _loop_polling(self) -> None:
+        self.modo_invalidacion = "polling"
+        while not await self._esperar(self.polling_segundos):
+            ids = list(self._cache)
+            if not ids:
+                continue
+            try:
+                existentes = await self.repository.ids_existentes(ids)
+            except PyMongoError as e:
+                logger.warning(f"Cache de plantillas: no se pudo verificar ({e}); se vacía")
+                self.invalidar()
+                continue
+            for id in set(ids) - existentes:
+                self.invalidar(id)
@@ -1,37 +1,94 @@
-from typing import List, Dict, Any
-from pymongo.collection import Collection
-
-from domain.models.plantilla_model import PlantillaModel
+import base64
+import json
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Tuple
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.asynchronous.collection import AsyncCollection
+
+from domain.models.plantilla_model import PlantillaModel, palabras_busqueda
 from exceptions.tributarios_exception import TributarioException
+from repositories.mongo_conexion import MongoConexion
+from services.metricas_service import instrumentar_repositorio
 from settings.config import logger
 
+# Campos de PlantillaOutShortDTO: la búsqueda no trae ni arma el documento completo
+CAMPOS_RESUMEN = {"_id": 0, "id": 1, "nombre": 1, "tipo": 1, "juzgado": 1, "fechaSubida": 1, "placeholders": 1}
+# Orden estable de la búsqueda (y clave del cursor): más nuevas primero, desempate por id
+ORDEN_BUSQUEDA = [("fechaSubida", DESCENDING), ("id", DESCENDING)]
 
-class PlantillasRepository:
-
-    def __init__(self, collection: Collection):
-        self.collection = collection
 
-    def crear_plantilla(self, plantilla: PlantillaModel) -> None:
-        self.collection.insert_one(plantilla.model_dump())
+@instrumentar_repositorio("plantillas")
+class PlantillasRepository:
 
-    def obtener_por_id(self, id: str) -> PlantillaModel:
-        data = self.collection.find_one({"id": id})
+    def __init__(self, conexion: MongoConexion, nombre_coleccion: str = "plantillas"):
+        self.conexion = conexion
+        self.nombre_coleccion = nombre_coleccion
+
+    @property
+    def collection(self) -> AsyncCollection:
+        return self.conexion.db[self.nombre_coleccion]
+
+    async def crear_indices(self) -> None:
+        await self.collection.create_index([("id", ASCENDING)], unique=True)
+        await self.collection.create_index([("hashSha256", ASCENDING)])
+        # Búsqueda: igualdad (juzgado/tipo) + orden por fecha, sin ordenar en memoria
+        await self.collection.create_index([("juzgado", ASCENDING), ("tipo", ASCENDING)] + ORDEN_BUSQUEDA)
+        await self.collection.create_index([("tipo", ASCENDING)] + ORDEN_BUSQUEDA)
+        await self.collection.create_index(ORDEN_BUSQUEDA)
+        await self.collection.create_index([("palabrasBusqueda", ASCENDING)] + ORDEN_BUSQUEDA)
+
+    async def completar_palabras_busqueda(self, lote: int = 500) -> int:
+        """ Plantillas guardadas antes de que existiera 'palabrasBusqueda': se calcula una sola vez. """
+        cursor = self.collection.find({"palabrasBusqueda": {"$exists": False}},
+                                      {"_id": 1, "nombre": 1, "descripcion": 1})
+        operaciones = []
+        total = 0
+        async for doc in cursor:
+            palabras = palabras_busqueda(doc.get("nombre"), doc.get("descripcion"))
+            operaciones.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"palabrasBusqueda": palabras}}))
+            if len(operaciones) >= lote:
+                total += (await self.collection.bulk_write(operaciones, ordered=False)).modified_count
+                operaciones = []
+        if operaciones:
+            total += (await self.collection.bulk_write(operaciones, ordered=False)).modified_count
+        if total:
+            logger.info(f"Se completaron las palabras de búsqueda de {total} plantillas")
+        return total
+
+    async def crear_plantilla(self, plantilla: PlantillaModel) -> None:
+        await self.collection.insert_one(plantilla.model_dump())
+
+    async def obtener_por_id(self, id: str) -> PlantillaModel:
+        data = await self.collection.find_one({"id": id})
         if not data:
             self.disparar_error_no_existe_plantilla(id)
         return PlantillaModel(**data)
 
-    def eliminar_por_id(self, id: str) -> None:
-        result = self.collection.delete_one({"id": id})
+    async def ids_existentes(self, ids: List[str]) -> Set[str]:
+        return {doc["id"] async for doc in self.collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})}
+
+    async def obtener_por_hash(self, hashSha256: str, **campos) -> Optional[PlantillaModel]:
+        data = await self.collection.find_one({"hashSha256": hashSha256.lower(), **campos})
+        return PlantillaModel(**data) if data else None
+
+    async def guardar_placeholders(self, id: str, placeholders: List[str]) -> None:
+        await self.collection.update_one({"id": id}, {"$set": {"placeholders": placeholders}})
+
+    async def eliminar_por_id(self, id: str) -> None:
+        result = await self.collection.delete_one({"id": id})
         if result.deleted_count == 0:
             logger.warn(f"no se borro nada de la base pq no existia la plantilla con id {id}")
 
-    def filtrar(self, **filtros) -> List[PlantillaModel]:
+    async def filtrar(self, limite: int, cursor: Optional[str] = None, **filtros) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        Retorna una lista de plantillas que cumplan los filtros.
+        Retorna una página de plantillas (solo los campos de CAMPOS_RESUMEN) que cumplan los filtros,
+        y el cursor de la página siguiente (None si no hay más).
         - juzgado: igualdad exacta (case-sensitive por defecto en Mongo)
         - tipo: igualdad exacta
-        - texto: busca en nombre o descripcion (regex case-insensitive)
+        - texto: cada palabra debe ser el comienzo de una palabra del nombre o la descripcion
+          (sin distinguir mayúsculas ni acentos)
         - fechaDesde/fechaHasta: rango sobre fechaSubida (inclusive)
+        - cursor: paginación por clave (fechaSubida, id): el costo no crece con el número de página
         """
 
         juzgado = filtros.get('juzgado')
@@ -42,6 +99,7 @@ class PlantillasRepository:
 
 
         query: Dict[str, Any] = {}
+        condiciones: List[Dict[str, Any]] = []
 
         if juzgado:
             query["juzgado"] = juzgado
@@ -50,11 +108,9 @@ class PlantillasRepository:
             query["tipo"] = tipo
 
         if texto:
-            # Búsqueda simple con regex en nombre o descripcion
-            query["$or"] = [
-                {"nombre": {"$regex": texto, "$options": "i"}},
-                {"descripcion": {"$regex": texto, "$options": "i"}},
-            ]
+            # Regex anclado al inicio sobre el array indexado: usa el índice (un '$regex' libre recorre todo)
+            for palabra in palabras_busqueda(texto):
+                condiciones.append({"palabrasBusqueda": {"$regex": f"^{palabra}"}})
 
         if fechaDesde or fechaHasta:
             rango: Dict[str, Any] = {}
@@ -64,9 +120,33 @@ class PlantillasRepository:
                 rango["$lte"] = fechaHasta
             query["fechaSubida"] = rango
 
-        cursor = self.collection.find(query).sort("fechaSubida", -1)
-
-        return [PlantillaModel(**doc) for doc in cursor]
+        if cursor:
+            fecha, id = self._leer_cursor(cursor)
+            condiciones.append({"$or": [{"fechaSubida": {"$lt": fecha}}, {"fechaSubida": fecha, "id": {"$lt": id}}]})
+
+        if condiciones:
+            query["$and"] = condiciones
+
+        # Uno más que el límite: indica si hay página siguiente
+        docs = await self.collection.find(query, CAMPOS_RESUMEN).sort(ORDEN_BUSQUEDA).limit(limite + 1).to_list(None)
+        siguiente = None
+        if len(docs) > limite:
+            docs = docs[:limite]
+            siguiente = self._armar_cursor(docs[-1])
+        return docs, siguiente
+
+    @staticmethod
+    def _armar_cursor(doc: Dict[str, Any]) -> str:
+        clave = json.dumps([doc["fechaSubida"].isoformat(), doc["id"]])
+        return base64.urlsafe_b64encode(clave.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _leer_cursor(cursor: str) -> Tuple[datetime, str]:
+        try:
+            fecha, id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return datetime.fromisoformat(fecha), id
+        except Exception:
+            raise TributarioException(mensaje="El cursor de la búsqueda no es válido.")
 
     def disparar_error_no_existe_plantilla(self, id: str):
         raise TributarioException(
@@ -0,0 +1,146 @@
+import hashlib
+import random
+import time
+from typing import List, Optional, Sequence, Set
+
+from services.metricas_service import registro
+from settings.config import logger
+
+EN_VUELO = registro.gauge(
+    "file_converter_en_vuelo", "Conversiones esperando respuesta, por réplica del file-converter-service", ("endpoint",)
+)
+CIRCUITO_ABIERTO = registro.gauge(
+    "file_converter_circuito_abierto", "1 si la réplica está fuera de rotación por fallas seguidas", ("endpoint",)
+)
+ELECCIONES = registro.contador(
+    "file_converter_elecciones_total", "Réplica elegida para cada llamada según el motivo", ("motivo",)
+)
+
+
+class EndpointConverter:
+    """ Una réplica del file-converter-service y su estado visto desde este proceso. """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.pedidos: Set["PedidoConverter"] = set()
+        self.fallas_seguidas = 0
+        # Circuito abierto (fuera de rotación) hasta este momento (time.monotonic); 0 = cerrado
+        self.abierto_hasta = 0.0
+        # Medio abierto: ya hay un request de prueba en curso
+        self.probando = False
+
+    @property
+    def en_vuelo(self) -> int:
+        return len(self.pedidos)
+
+
+class PedidoConverter:
+    """ Un request en vuelo a una réplica; `prueba`: es el único request de prueba con el circuito medio abierto. """
+
+    def __init__(self, endpoint: EndpointConverter, prueba: bool):
+        self.endpoint = endpoint
+        self.prueba = prueba
+        self.inicio = time.monotonic()
+
+
+class BalanceadorConverter:
+    """
+    Elige la réplica del file-converter-service para cada conversión:
+    - la de menor carga (empates al azar): cada pedido en vuelo pesa 1 + su edad / `segundos_por_pedido`, así una
+      réplica trabada con pocos pedidos viejos no parece libre;
+    - con `clave` (hash del DOCX), rendezvous hashing: el mismo documento va a la misma réplica, que lo tiene
+      en su cache de PDFs, salvo que esa tenga más de `holgura_afinidad` de carga por encima de la menos ocupada;
+    - circuit breaker por réplica: `fallas_para_abrir` fallas seguidas la sacan de rotación `abierto_segundos`;
+      después entra un solo request de prueba y, si sale bien, vuelve.
+    Si todas están fuera de rotación se usa igual la menos ocupada: el balanceador nunca rechaza.
+    Todo corre en el event loop: no hace falta lock.
+    """
+
+    def __init__(self, urls: Sequence[str], afinidad: bool = True, holgura_afinidad: int = 2,
+                 fallas_para_abrir: int = 5, abierto_segundos: float = 10, segundos_por_pedido: float = 5):
+        if not urls:
+            raise ValueError("Se necesita al menos una URL del file-converter-service.")
+        self.endpoints: List[EndpointConverter] = [EndpointConverter(url) for url in urls]
+        self.afinidad = afinidad and len(self.endpoints) > 1
+        self.holgura_afinidad = max(0, holgura_afinidad)
+        self.fallas_para_abrir = max(1, fallas_para_abrir)
+        self.abierto_segundos = abierto_segundos
+        self.segundos_por_pedido = max(0.001, segundos_por_pedido)
+        for endpoint in self.endpoints:
+            EN_VUELO.fijar(0, endpoint=endpoint.url)
+            CIRCUITO_ABIERTO.fijar(0, endpoint=endpoint.url)
+
+    def elegir(self, clave: Optional[str] = None,
+               excluir: Sequence[EndpointConverter] = ()) -> EndpointConverter:
+        """ `excluir`: réplicas ya probadas en este pedido; si no queda ninguna se vuelve a considerar todas. """
+        candidatos = [ep for ep in self.endpoints if ep not in excluir] or self.endpoints
+        ahora = time.monotonic()
+        disponibles = [ep for ep in candidatos if self._disponible(ep, ahora)]
+        if not disponibles:
+            ELECCIONES.incrementar(motivo="sin_disponibles")
+            return self._menos_cargada(candidatos, ahora)
+
+        elegido = None
+        if self.afinidad and clave is not None:
+            preferido = max(disponibles, key=lambda ep: self._peso(clave, ep.url))
+            minimo = min(self._carga(ep, ahora) for ep in disponibles)
+            if self._carga(preferido, ahora) <= minimo + self.holgura_afinidad:
+                elegido = preferido
+                ELECCIONES.incrementar(motivo="afinidad")
+        if elegido is None:
+            elegido = self._menos_cargada(disponibles, ahora)
+            ELECCIONES.incrementar(motivo="menos_ocupada")
+        return elegido
+
+    def iniciar(self, endpoint: EndpointConverter) -> PedidoConverter:
+        """ Se llama al mandar el request a la réplica elegida (sin await en el medio: sin carreras). """
+        # Con el circuito abierto solo el request que toma la prueba la libera al terminar
+        prueba = bool(endpoint.abierto_hasta) and not endpoint.probando
+        if prueba:
+            endpoint.probando = True
+        pedido = PedidoConverter(endpoint, prueba)
+        endpoint.pedidos.add(pedido)
+        EN_VUELO.incrementar(endpoint=endpoint.url)
+        return pedido
+
+    def terminar(self, pedido: PedidoConverter, ok: Optional[bool]) -> None:
+        """
+        ok: True respondió, False falló o quedó lenta (conexión, timeout, 502/504, perdió el hedge sin headers),
+        None no dice nada de la réplica (p.ej. cancelado por el llamador).
+        """
+        endpoint = pedido.endpoint
+        endpoint.pedidos.discard(pedido)
+        EN_VUELO.decrementar(endpoint=endpoint.url)
+        if pedido.prueba:
+            endpoint.probando = False
+        if ok is True:
+            endpoint.fallas_seguidas = 0
+            if endpoint.abierto_hasta:
+                endpoint.abierto_hasta = 0.0
+                CIRCUITO_ABIERTO.fijar(0, endpoint=endpoint.url)
+                logger.info(f"File-converter {endpoint.url}: vuelve a rotación")
+        elif ok is False:
+            endpoint.fallas_seguidas += 1
+            if pedido.prueba or endpoint.fallas_seguidas >= self.fallas_para_abrir:
+                endpoint.abierto_hasta = time.monotonic() + self.abierto_segundos
+                CIRCUITO_ABIERTO.fijar(1, endpoint=endpoint.url)
+                logger.warning(f"File-converter {endpoint.url}: {endpoint.fallas_seguidas} fallas seguidas, "
+                               f"fuera de rotación por {self.abierto_segundos}s")
+
+    def _carga(self, endpoint: EndpointConverter, ahora: float) -> float:
+        return sum(1 + (ahora - p.inicio) / self.segundos_por_pedido for p in endpoint.pedidos)
+
+    def _menos_cargada(self, endpoints: Sequence[EndpointConverter], ahora: float) -> EndpointConverter:
+        cargas = [(self._carga(ep, ahora), ep) for ep in endpoints]
+        minimo = min(carga for carga, _ in cargas)
+        return random.choice([ep for carga, ep in cargas if carga == minimo])
+
+    def _disponible(self, endpoint: EndpointConverter, ahora: float) -> bool:
+        if not endpoint.abierto_hasta:
+            return True
+        # Pasado el tiempo de castigo entra un solo request de prueba
+        return ahora >= endpoint.abierto_hasta and not endpoint.probando
+
+    @staticmethod
+    def _peso(clave: str, url: str) -> int:
+        return int.from_bytes(hashlib.blake2b(f"{clave}|{url}".encode("utf-8"), digest_size=8).digest(), "big")
@@ -0,0 +1,304 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from services.metricas_service import registro
+from settings.config import logger
+
+CONSULTAS_DOCUMENTOS = registro.contador(
+    "documentos_cache_consultas_total", "Documentos pedidos según dónde se resolvieron (memoria, disco, compartido, miss)",
+    ("resultado",)
+)
+
+
+class DocumentosCacheService:
+    """
+    Cache de documentos ya generados (DOCX reemplazado o PDF), para reimpresiones y reintentos.
+    - Clave: SHA-256 de la plantilla + hash de la metadata en JSON canónico + formato + motor.
+    - Memoria: LRU acotado por bytes. Disco: LRU acotado por bytes y edad; lo leído del disco sube a memoria.
+    - Single-flight: pedidos idénticos concurrentes esperan a una única generación (también en streaming).
+    Un hit no pasa por el replacer ni por el file-converter-service.
+    """
+
+    def __init__(self, directorio: str, max_memoria_bytes: int, max_disco_bytes: int, max_edad_segundos: int,
+                 max_entrada_bytes: int):
+        self.directorio = directorio
+        self.max_memoria_bytes = max_memoria_bytes
+        self.max_disco_bytes = max_disco_bytes
+        self.max_edad_segundos = max_edad_segundos
+        self.max_entrada_bytes = max_entrada_bytes
+
+        self._lock = threading.Lock()
+        self._memoria: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes_memoria = 0
+        self._indice: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # clave -> (tamaño, creado_en)
+        self._bytes_disco = 0
+        self._en_vuelo: Dict[str, asyncio.Future] = {}
+
+        if self.max_disco_bytes > 0:
+            os.makedirs(self.directorio, exist_ok=True)
+            self._cargar_indice()
+
+    # ----------------- API -----------------
+    @staticmethod
+    def calcular_clave(hash_plantilla: str, metadata: Dict[str, Any], formato: str, motor: str) -> str:
+        # default=str: fechas u otros tipos se representan igual que al reemplazar
+        canonica = json.dumps(metadata or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        h = hashlib.sha256(hash_plantilla.encode("ascii"))
+        for parte in (hashlib.sha256(canonica.encode("utf-8")).hexdigest(), formato, motor):
+            h.update(b"\0" + parte.encode("utf-8"))
+        return h.hexdigest()
+
+    async def obtener(self, clave: str) -> Optional[bytes]:
+        contenido = self._leer_memoria(clave)
+        if contenido is not None:
+            CONSULTAS_DOCUMENTOS.incrementar(resultado="memoria")
+            return contenido
+        contenido = await run_in_threadpool(self._leer_disco, clave)
+        if contenido is not None:
+            CONSULTAS_DOCUMENTOS.incrementar(resultado="disco")
+            self._guardar_memoria(clave, contenido)
+        return contenido
+
+    async def guardar(self, clave: str, contenido: bytes) -> None:
+        if len(contenido) > self.max_entrada_bytes:
+            return
+        self._guardar_memoria(clave, contenido)
+        await run_in_threadpool(self._guardar_disco, clave, contenido)
+
+    async def obtener_o_generar(self, clave: str, generar: Callable[[], Awaitable[bytes]]) -> bytes:
+        contenido = await self._obtener_o_esperar(clave)
+        if contenido is not None:
+            return contenido
+        vuelo = self._iniciar_vuelo(clave)
+        try:
+            contenido = await generar()
+            await self.guardar(clave, contenido)
+            self._completar_vuelo(clave, vuelo, contenido)
+            return contenido
+        except asyncio.CancelledError:
+            self._soltar_vuelo(clave, vuelo)
+            raise
+        except Exception as e:
+            self._fallar_vuelo(clave, vuelo, e)
+            raise
+
+    async def abrir_o_compartir(self, clave: str, abrir: Callable[[], Awaitable[httpx.Response]]
+                                ) -> Union[bytes, "RespuestaQueCachea"]:
+        """
+        Como obtener_o_generar, para respuestas en streaming: el primer pedido reenvía la respuesta abierta
+        y la guarda al terminar; los idénticos que llegan mientras tanto esperan ese documento.
+        """
+        contenido = await self._obtener_o_esperar(clave)
+        if contenido is not None:
+            return contenido
+        vuelo = self._iniciar_vuelo(clave)
+        try:
+            resp = await abrir()
+        except asyncio.CancelledError:
+            self._soltar_vuelo(clave, vuelo)
+            raise
+        except Exception as e:
+            self._fallar_vuelo(clave, vuelo, e)
+            raise
+        return RespuestaQueCachea(self, clave, resp, vuelo)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "memoria_entradas": len(self._memoria),
+                "memoria_bytes": self._bytes_memoria,
+                "disco_entradas": len(self._indice),
+                "disco_bytes": self._bytes_disco,
+            }
+
+    # ----------------- single-flight -----------------
+    async def _obtener_o_esperar(self, clave: str) -> Optional[bytes]:
+        """ Hit o resultado de una generación idéntica en curso; None si le toca generar a quien llama. """
+        while True:
+            contenido = await self.obtener(clave)
+            if contenido is not None:
+                return contenido
+            vuelo = self._en_vuelo.get(clave)
+            if vuelo is None:
+                return None
+            try:
+                contenido = await asyncio.shield(vuelo)
+                CONSULTAS_DOCUMENTOS.incrementar(resultado="compartido")
+                return contenido
+            except asyncio.CancelledError:
+                if not vuelo.cancelled():
+                    raise
+                # Se soltó la generación (el cliente cortó o no entra en el cache): se reintenta
+
+    def _iniciar_vuelo(self, clave: str) -> asyncio.Future:
+        CONSULTAS_DOCUMENTOS.incrementar(resultado="miss")
+        vuelo = asyncio.get_running_loop().create_future()
+        # Si nadie más lo esperaba, que el error no quede como "never retrieved"
+        vuelo.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._en_vuelo[clave] = vuelo
+        return vuelo
+
+    def _completar_vuelo(self, clave: str, vuelo: asyncio.Future, contenido: bytes) -> None:
+        if not vuelo.done():
+            vuelo.set_result(contenido)
+        self._quitar_vuelo(clave, vuelo)
+
+    def _fallar_vuelo(self, clave: str, vuelo: asyncio.Future, error: Exception) -> None:
+        if not vuelo.done():
+            vuelo.set_exception(error)
+        self._quitar_vuelo(clave, vuelo)
+
+    def _soltar_vuelo(self, clave: str, vuelo: asyncio.Future) -> None:
+        """ Sin resultado para compartir: los que esperaban reintentan por su cuenta. """
+        if not vuelo.done():
+            vuelo.cancel()
+        self._quitar_vuelo(clave, vuelo)
+
+    def _quitar_vuelo(self, clave: str, vuelo: asyncio.Future) -> None:
+        if self._en_vuelo.get(clave) is vuelo:
+            del self._en_vuelo[clave]
+
+    # ----------------- memoria -----------------
+    def _leer_memoria(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            contenido = self._memoria.get(clave)
+            if contenido is not None:
+                self._memoria.move_to_end(clave)
+            return contenido
+
+    def _guardar_memoria(self, clave: str, contenido: bytes) -> None:
+        if len(contenido) > self.max_memoria_bytes:
+            return
+        with self._lock:
+            anterior = self._memoria.pop(clave, None)
+            if anterior is not None:
+                self._bytes_memoria -= len(anterior)
+            self._memoria[clave] = contenido
+            self._bytes_memoria += len(contenido)
+            while self._bytes_memoria > self.max_memoria_bytes and self._memoria:
+                _, desalojado = self._memoria.popitem(last=False)
+                self._bytes_memoria -= len(desalojado)
+
+    # ----------------- disco -----------------
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, clave[:2], clave)
+
+    def _leer_disco(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._indice.get(clave)
+            if entrada is None:
+                return None
+            if self.max_edad_segundos > 0 and time.time() - entrada[1] > self.max_edad_segundos:
+                self._desalojar(clave)
+                return None
+            self._indice.move_to_end(clave)
+        try:
+            with open(self._ruta(clave), "rb") as f:
+                return f.read()
+        except OSError:
+            # Se desalojó entre el chequeo y la lectura
+            return None
+
+    def _guardar_disco(self, clave: str, contenido: bytes) -> None:
+        if len(contenido) > self.max_disco_bytes:
+            return
+        ruta = self._ruta(clave)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(contenido)
+            os.replace(tmp, ruta)  # atómico: nunca se lee un documento a medio escribir
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el documento en cache: {e}")
+            return
+        with self._lock:
+            if clave in self._indice:
+                self._bytes_disco -= self._indice[clave][0]
+            self._indice[clave] = (len(contenido), time.time())
+            self._indice.move_to_end(clave)
+            self._bytes_disco += len(contenido)
+            while self._bytes_disco > self.max_disco_bytes and self._indice:
+                self._desalojar(next(iter(self._indice)))
+
+    def _desalojar(self, clave: str) -> None:
+        """ Requiere self._lock tomado. """
+        tamano, _ = self._indice.pop(clave)
+        self._bytes_disco -= tamano
+        try:
+            os.remove(self._ruta(clave))
+        except OSError:
+            pass
+
+    def _cargar_indice(self) -> None:
+        """ Reconstruye el índice con lo que quedó en disco (más viejo primero). """
+        entradas = []
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                ruta = os.path.join(raiz, nombre)
+                if nombre.endswith(".tmp"):
+                    try:
+                        os.remove(ruta)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    st = os.stat(ruta)
+                except OSError:
+                    continue
+                entradas.append((st.st_mtime, nombre, st.st_size))
+
+        for mtime, clave, tamano in sorted(entradas):
+            self._indice[clave] = (tamano, mtime)
+            self._bytes_disco += tamano
+        while self._bytes_disco > self.max_disco_bytes and self._indice:
+            self._desalojar(next(iter(self._indice)))
+
+
+class RespuestaQueCachea:
+    """
+    Respuesta abierta del conversor que junta lo reenviado y, si llegó completa, la guarda en el cache
+    y se la entrega a los pedidos idénticos que esperaban (`vuelo`).
+    """
+
+    def __init__(self, cache: DocumentosCacheService, clave: str, resp: httpx.Response, vuelo: asyncio.Future):
+        self.cache = cache
+        self.clave = clave
+        self.resp = resp
+        self.vuelo = vuelo
+        self.headers = resp.headers
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        partes = []
+        tamano = 0
+        try:
+            async for chunk in self.resp.aiter_bytes():
+                if partes is not None:
+                    tamano += len(chunk)
+                    if tamano <= self.cache.max_entrada_bytes:
+                        partes.append(chunk)
+                    else:
+                        # Demasiado grande para el cache: se sigue reenviando sin juntar y los demás no esperan
+                        partes = None
+                        self.cache._soltar_vuelo(self.clave, self.vuelo)
+                yield chunk
+            if partes is not None:
+                contenido = b"".join(partes)
+                await self.cache.guardar(self.clave, contenido)
+                self.cache._completar_vuelo(self.clave, self.vuelo, contenido)
+        finally:
+            # Cortado a mitad (cliente o conversor): sin documento para compartir
+            self.cache._soltar_vuelo(self.clave, self.vuelo)
+
+    async def aclose(self) -> None:
+        self.cache._soltar_vuelo(self.clave, self.vuelo)
+        await self.resp.aclose()
@@ -1,49 +1,256 @@
-import requests
-from typing import Optional
+import asyncio
+import hashlib
+import random
+import time
+from typing import Dict, List, Optional, Set
 
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from services.balanceador_converter import BalanceadorConverter, EndpointConverter
+from services.metricas_service import registro, registrar_fase
 from settings.config import settings, logger
 
+_RUTA_CONVERSION = "/archivos/api/convertir_word_to_pdf"
+
+# Errores donde el request no llegó (o no pudo llegar) al servicio: es seguro reintentar
+_ERRORES_REINTENTABLES = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+# Respuestas de un proxy delante de la réplica: cuentan como falla de la réplica para el circuit breaker
+_ESTADOS_FALLA_REPLICA = (502, 504)
+
+LLAMADA_DURACION = registro.histograma(
+    "file_converter_llamada_duracion_segundos",
+    "Duración de las llamadas al file-converter-service hasta recibir los headers (incluye reintentos)",
+    ("resultado",),
+)
+REINTENTOS = registro.contador("file_converter_reintentos_total", "Reintentos de conexión al file-converter-service")
+HEDGES = registro.contador(
+    "file_converter_hedges_total", "Conversiones lentas reenviadas a otra réplica, según cuál respondió primero",
+    ("ganador",),
+)
+
 
 class FileConverterClient:
     """
-    Cliente sincrónico para consumir /convertir_word_to_pdf del file-converter-service.
+    Cliente asincrónico para consumir /convertir_word_to_pdf del file-converter-service.
+    Comparte un pool de conexiones keep-alive entre todos los requests; se cierra en el lifespan.
+    Con varias réplicas balancea del lado del cliente (ver BalanceadorConverter): reintenta en otra réplica
+    y, con `hedge_segundos`, manda una conversión lenta también a otra y se queda con la primera respuesta.
     """
 
-    def __init__(self, timeout: int = 60):
-        self.base_url = settings.file_converter_base_url
-        self.timeout = timeout
+    def __init__(
+        self,
+        base_urls: Optional[List[str]] = None,
+        max_conexiones: int = 100,
+        max_keepalive: int = 20,
+        keepalive_segundos: float = 30,
+        timeout_conexion: float = 5,
+        timeout_lectura: float = 120,
+        timeout_escritura: float = 30,
+        timeout_pool: float = 10,
+        reintentos: int = 3,
+        backoff_base_segundos: float = 0.2,
+        backoff_max_segundos: float = 2.0,
+        afinidad: bool = True,
+        holgura_afinidad: int = 2,
+        fallas_para_abrir: int = 5,
+        circuito_abierto_segundos: float = 10,
+        hedge_segundos: float = 0,
+        segundos_por_pedido: float = 5,
+    ):
+        self.base_urls = [url.rstrip("/") for url in (base_urls or settings.file_converter_urls_list)]
+        self.balanceador = BalanceadorConverter(self.base_urls, afinidad=afinidad, holgura_afinidad=holgura_afinidad,
+                                                fallas_para_abrir=fallas_para_abrir,
+                                                abierto_segundos=circuito_abierto_segundos,
+                                                segundos_por_pedido=segundos_por_pedido)
+        self.limits = httpx.Limits(
+            max_connections=max_conexiones,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_segundos,
+        )
+        # La lectura incluye la conversión en LibreOffice: es la fase más larga
+        self.timeout = httpx.Timeout(
+            connect=timeout_conexion, read=timeout_lectura, write=timeout_escritura, pool=timeout_pool
+        )
+        self.reintentos = max(0, reintentos)
+        self.backoff_base_segundos = backoff_base_segundos
+        self.backoff_max_segundos = backoff_max_segundos
+        # Sin headers de respuesta en este tiempo se manda también a otra réplica (0 = sin hedge)
+        self.hedge_segundos = hedge_segundos if len(self.base_urls) > 1 else 0
+        # Requests que perdieron el hedge sin mandar headers: para el circuit breaker cuentan como falla
+        self._lentas: Set[asyncio.Task] = set()
+        self._cliente: Optional[httpx.AsyncClient] = None
 
-    def convertir_word_to_pdf(self, docx_bytes: bytes, filename: Optional[str] = None) -> bytes:
-        logger.info("dentro del cliente para hacer llamada al files-converter-service")
+    def _obtener_cliente(self) -> httpx.AsyncClient:
+        # Un solo pool para todas las réplicas (las URLs van completas en cada request)
+        if self._cliente is None or self._cliente.is_closed:
+            self._cliente = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._cliente
+
+    async def cerrar(self) -> None:
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
 
+    async def convertir_word_to_pdf(self, docx_bytes: bytes, filename: Optional[str] = None) -> bytes:
         """
-        Envía un DOCX por multipart/form-data al endpoint y devuelve los bytes del PDF.
+        Envía el DOCX al endpoint y devuelve los bytes del PDF.
         - filename: nombre sugerido (sin .pdf); el servicio lo usa para Content-Disposition.
         """
-        url = f"{self.base_url}/archivos/api/convertir_word_to_pdf"
+        resp = await self.abrir_conversion(docx_bytes, filename)
+        try:
+            return await resp.aread()  # bytes del PDF
+        finally:
+            await resp.aclose()
+
+    async def abrir_conversion(self, docx_bytes: bytes, filename: Optional[str] = None) -> httpx.Response:
+        """
+        Envía el DOCX como application/octet-stream (sin armar un multipart en memoria) y
+        devuelve la respuesta abierta, sin leer el cuerpo: el PDF se puede reenviar en chunks
+        con `aiter_bytes()`. El llamador debe cerrarla con `aclose()`.
+        """
+        logger.info("dentro del cliente para hacer llamada al files-converter-service")
+
         params = {}
         if filename:
             params["filename"] = filename
+        # Afinidad: el conversor cachea los PDFs por el SHA-256 del DOCX
+        clave = await run_in_threadpool(self._clave, docx_bytes) if self.balanceador.afinidad else None
 
-        files = {
-            # campo debe llamarse 'file' (así lo espera tu endpoint)
-            "file": (
-                (filename or "documento") + ".docx",
-                docx_bytes,
-                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            )
-        }
-
+        inicio = time.perf_counter()
+        resultado = "error"
         try:
-            resp = requests.post(url, params=params, files=files, timeout=self.timeout)
-        except requests.RequestException as ex:
-            # Podés mapearlo a tu excepción de dominio
-            raise RuntimeError(f"Error conectando a file-converter-service: {ex}") from ex
+            intento = 0
+            probados: List[EndpointConverter] = []
+            while True:
+                endpoint = self.balanceador.elegir(clave, excluir=probados)
+                try:
+                    resp = await self._enviar(endpoint, docx_bytes, params, clave)
+                except _ERRORES_REINTENTABLES as ex:
+                    intento += 1
+                    if intento > self.reintentos:
+                        raise RuntimeError(f"Error conectando a file-converter-service: {ex}") from ex
+                    REINTENTOS.incrementar()
+                    probados.append(endpoint)
+                    if len(probados) < len(self.balanceador.endpoints):
+                        logger.warning(f"Error conectando a file-converter-service {endpoint.url} (intento {intento}), "
+                                       f"se prueba otra réplica: {ex}")
+                        continue
+                    # Ya se probaron todas: se espera antes de la siguiente vuelta
+                    probados = []
+                    demora = self._calcular_backoff(intento)
+                    logger.warning(f"Error conectando a file-converter-service (intento {intento}), reintento en {demora:.2f}s: {ex}")
+                    await asyncio.sleep(demora)
+                    continue
+                except httpx.HTTPError as ex:
+                    # Timeout de lectura/escritura: el servicio pudo haber recibido el trabajo, no se reintenta
+                    raise RuntimeError(f"Error en la llamada a file-converter-service: {ex}") from ex
+
+                probados.append(endpoint)
+                if resp.status_code == 503 and intento < self.reintentos \
+                        and len(probados) < len(self.balanceador.endpoints):
+                    # Réplica saturada: rechazó antes de convertir, se prueba otra sin esperar
+                    intento += 1
+                    REINTENTOS.incrementar()
+                    await resp.aclose()
+                    logger.warning(f"File-converter {endpoint.url} saturado (intento {intento}), se prueba otra réplica")
+                    continue
+                break
+            resultado = str(resp.status_code)
+        finally:
+            registrar_fase("conversion", time.perf_counter() - inicio, LLAMADA_DURACION, resultado=resultado)
 
         if resp.status_code != 200:
             # Trae texto por si hay detalle en HTML/JSON
+            await resp.aread()
+            await resp.aclose()
             raise RuntimeError(
                 f"Conversión a PDF falló ({resp.status_code}): {resp.text[:500]}"
             )
 
-        return resp.content  # bytes del PDF
+        return resp
+
+    @staticmethod
+    def _clave(docx_bytes: bytes) -> str:
+        return hashlib.sha256(docx_bytes).hexdigest()
+
+    async def _enviar(self, endpoint: EndpointConverter, docx_bytes: bytes, params: Dict[str, str],
+                      clave: Optional[str]) -> httpx.Response:
+        """
+        Manda el DOCX a `endpoint`. Con hedge, si no hay respuesta en `hedge_segundos` lo manda también a otra
+        réplica: gana la primera que responde y la otra se cancela (convertir no tiene efectos, es seguro).
+        Si gana el hedge, la original cuenta como falla: una réplica trabada termina fuera de rotación.
+        """
+        tareas = [self._lanzar(endpoint, docx_bytes, params)]
+        ganadora = None
+        try:
+            if self.hedge_segundos > 0:
+                listas, _ = await asyncio.wait(tareas, timeout=self.hedge_segundos)
+                if not listas:
+                    otro = self.balanceador.elegir(clave, excluir=[endpoint])
+                    logger.info(f"File-converter {endpoint.url} sin respuesta en {self.hedge_segundos}s, "
+                                f"se manda también a {otro.url}")
+                    tareas.append(self._lanzar(otro, docx_bytes, params))
+
+            pendientes = set(tareas)
+            while True:
+                listas, pendientes = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in tareas:
+                    if tarea in listas and tarea.exception() is None:
+                        ganadora = tarea
+                        break
+                if ganadora is not None or not pendientes:
+                    break
+            if len(tareas) > 1:
+                HEDGES.incrementar(ganador="original" if ganadora is tareas[0] else
+                                   "hedge" if ganadora is not None else "ninguno")
+            if ganadora is None:
+                # Fallaron todas: se informa el error de la réplica original
+                return tareas[0].result()
+            return ganadora.result()
+        finally:
+            for tarea in tareas:
+                if tarea is not ganadora:
+                    self._descartar(tarea, lenta=tarea is tareas[0] and ganadora is not None)
+
+    def _lanzar(self, endpoint: EndpointConverter, docx_bytes: bytes, params: Dict[str, str]) -> asyncio.Task:
+        cliente = self._obtener_cliente()
+        request = cliente.build_request(
+            "POST", f"{endpoint.url}{_RUTA_CONVERSION}", params=params, content=docx_bytes,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        pedido = self.balanceador.iniciar(endpoint)
+        tarea = asyncio.ensure_future(cliente.send(request, stream=True))
+        # En un callback: también cuenta si la tarea se cancela antes de arrancar
+        tarea.add_done_callback(lambda t: self.balanceador.terminar(pedido, self._resultado_replica(t)))
+        return tarea
+
+    def _resultado_replica(self, tarea: asyncio.Task) -> Optional[bool]:
+        """ Para el circuit breaker: True respondió, False falló o quedó lenta, None no dice nada de ella. """
+        if tarea.cancelled():
+            if tarea in self._lentas:
+                self._lentas.discard(tarea)
+                return False
+            return None
+        ex = tarea.exception()
+        if ex is None:
+            return tarea.result().status_code not in _ESTADOS_FALLA_REPLICA
+        if isinstance(ex, httpx.PoolTimeout):
+            # El pool de conexiones es de este proceso: no es culpa de la réplica
+            return None
+        return False if isinstance(ex, httpx.TransportError) else None
+
+    def _descartar(self, tarea: asyncio.Task, lenta: bool = False) -> None:
+        """ Cancela un request que perdió la carrera; si ya tenía respuesta, la cierra. """
+        def cerrar(t: asyncio.Task) -> None:
+            if not t.cancelled() and t.exception() is None:
+                asyncio.ensure_future(t.result().aclose())
+        if lenta and not tarea.done():
+            self._lentas.add(tarea)
+        tarea.add_done_callback(cerrar)
+        tarea.cancel()
+
+    def _calcular_backoff(self, intento: int) -> float:
+        demora = min(self.backoff_max_segundos, self.backoff_base_segundos * (2 ** (intento - 1)))
+        # Full jitter para no sincronizar reintentos de muchos requests
+        return random.uniform(0, demora)
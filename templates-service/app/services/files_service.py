@@ -1,4 +1,4 @@
-import base64, hashlib
+import base64, hashlib, json
 
 from exceptions.tributarios_exception import TributarioException
 
@@ -15,6 +15,15 @@ class FileService:
         except Exception as e:
             raise TributarioException(mensaje=f"Base64 inválido: {e}")
 
+    def json_a_dict(self, texto: str) -> dict:
+        try:
+            data = json.loads(texto or "{}")
+        except ValueError as e:
+            raise TributarioException(mensaje=f"JSON inválido: {e}")
+        if not isinstance(data, dict):
+            raise TributarioException(mensaje="Se esperaba un objeto JSON.")
+        return data
+
     def sha256_hex(self,data: bytes) -> str:
         return hashlib.sha256(data).hexdigest()
 
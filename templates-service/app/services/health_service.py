@@ -1,16 +1,18 @@
-from pymongo.database import Database
 from pymongo.errors import PyMongoError
 
+from exceptions.tributarios_exception import TributarioException
+from repositories.mongo_conexion import MongoConexion
+
 class HealthService:
-    def __init__(self, db: Database, min_available_mb: int = 100):
-        self.db = db
+    def __init__(self, conexion: MongoConexion, min_available_mb: int = 100):
+        self.conexion = conexion
         self.min_available_mb = min_available_mb
 
-    def is_mongo_healthy(self) -> bool:
+    async def is_mongo_healthy(self) -> bool:
         try:
-            self.db.command("ping")
+            await self.conexion.db.command("ping")
             return True
-        except PyMongoError:
+        except (PyMongoError, TributarioException):
             return False
 
     def get_available_memory(self) -> int:
@@ -25,8 +27,8 @@ class HealthService:
         available_mb = self.get_available_memory()
         return True
 
-    def is_ready(self) -> bool:
-        return self.is_mongo_healthy() and self.is_memory_ok()
+    async def is_ready(self) -> bool:
+        return await self.is_mongo_healthy() and self.is_memory_ok()
 
     def is_alive(self) -> bool:
         return True
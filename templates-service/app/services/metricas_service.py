@@ -0,0 +1,264 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Igual en templates-service y file-converter-service: cada imagen se construye solo con la carpeta de su
+# servicio, así que no hay paquete compartido. Las métricas propias de cada servicio se declaran donde se usan.
+
+# Buckets por defecto (segundos): de 1 ms a 2 minutos
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Buckets para tamaños de archivo (bytes): de 1 KB a 64 MB
+BUCKETS_BYTES = tuple(1024 * 4 ** i for i in range(9))
+
+# Fases medidas durante el request en curso (para el header Server-Timing)
+_fases_request: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("fases_request", default=None)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _formatear_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+
+    def exportar(self) -> List[str]:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        lineas.extend(self._muestras())
+        return lineas
+
+    def _muestras(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def incrementar(self, valor: float = 1, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, c)} {_formatear_numero(v)}" for c, v in valores]
+
+
+class Gauge(Contador):
+    """ Valor que sube y baja; con `funcion` se lee al momento de exportar (p.ej. tamaño de una cola). """
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 funcion: Optional[Callable[[], float]] = None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def fijar(self, valor: float, **etiquetas) -> None:
+        with self._lock:
+            self._valores[self._clave(etiquetas)] = valor
+
+    def decrementar(self, valor: float = 1, **etiquetas) -> None:
+        self.incrementar(-valor, **etiquetas)
+
+    def _muestras(self) -> List[str]:
+        if self.funcion is not None:
+            try:
+                return [f"{self.nombre} {_formatear_numero(self.funcion())}"]
+            except Exception:
+                return []
+        return super()._muestras()
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                 buckets: Sequence[float] = BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> (cuenta por bucket (no acumulada), suma, cantidad)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            series = [(c, list(s[0]), s[1], s[2]) for c, s in self._series.items()]
+        lineas = []
+        for clave, cuentas, suma, cantidad in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), cuentas):
+                acumulado += cuenta
+                le = f'le="{_formatear_numero(limite)}"'
+                lineas.append(f"{self.nombre}_bucket{_formatear_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {cantidad}")
+        return lineas
+
+
+class RegistroMetricas:
+    """ Registro en memoria del proceso; `exportar` devuelve el formato de texto de Prometheus. """
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: _Metrica) -> _Metrica:
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def gauge(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+              funcion: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._registrar(Gauge(nombre, ayuda, etiquetas, funcion))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   buckets: Sequence[float] = BUCKETS_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exportar())
+        return "\n".join(lineas) + "\n"
+
+
+registro = RegistroMetricas()
+
+HTTP_DURACION = registro.histograma(
+    "http_request_duracion_segundos", "Duración de los requests HTTP por ruta", ("metodo", "ruta", "estado")
+)
+HTTP_EN_CURSO = registro.gauge("http_requests_en_curso", "Requests HTTP en curso")
+MONGO_DURACION = registro.histograma(
+    "mongo_consulta_duracion_segundos", "Duración de las consultas a Mongo por método de repositorio",
+    ("repositorio", "metodo"), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+# ----------------- fases del request (Server-Timing) -----------------
+def iniciar_fases() -> Tuple[List[Tuple[str, float]], object]:
+    fases: List[Tuple[str, float]] = []
+    return fases, _fases_request.set(fases)
+
+
+def terminar_fases(token) -> None:
+    _fases_request.reset(token)
+
+
+def registrar_fase(fase: str, segundos: float, histograma: Optional[Histograma] = None, **etiquetas) -> None:
+    """ Observa la fase en el histograma y la suma al Server-Timing del request en curso (si hay uno). """
+    if histograma is not None:
+        histograma.observar(segundos, fase=fase, **etiquetas)
+    fases = _fases_request.get()
+    if fases is not None:
+        fases.append((fase, segundos))
+
+
+@contextmanager
+def medir_fase(fase: str, histograma: Optional[Histograma] = None, **etiquetas) -> Iterator[None]:
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_fase(fase, time.perf_counter() - inicio, histograma, **etiquetas)
+
+
+def formatear_server_timing(fases: List[Tuple[str, float]], total_segundos: float) -> str:
+    # Una fase puede repetirse (p.ej. varios documentos de un lote): se suman
+    acumuladas: Dict[str, float] = {}
+    for fase, segundos in fases:
+        acumuladas[fase] = acumuladas.get(fase, 0) + segundos
+    partes = [f"{fase};dur={segundos * 1000:.1f}" for fase, segundos in acumuladas.items()]
+    partes.append(f"total;dur={total_segundos * 1000:.1f}")
+    return ", ".join(partes)
+
+
+def instrumentar_repositorio(nombre: str):
+    """ Decorador de clase: mide cada método público en `mongo_consulta_duracion_segundos`. """
+
+    def decorar(cls):
+        for atributo, valor in list(vars(cls).items()):
+            # disparar_error_*: solo arman la excepción, no consultan
+            if atributo.startswith(("_", "disparar_")) or not callable(valor):
+                continue
+            setattr(cls, atributo, _medido(valor, nombre, atributo))
+        return cls
+
+    return decorar
+
+
+def _medido(metodo, repositorio: str, nombre_metodo: str):
+    def observar(inicio: float) -> None:
+        segundos = time.perf_counter() - inicio
+        MONGO_DURACION.observar(segundos, repositorio=repositorio, metodo=nombre_metodo)
+        registrar_fase("mongo", segundos)
+
+    if inspect.iscoroutinefunction(metodo):
+        @functools.wraps(metodo)
+        async def envoltura_async(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return await metodo(*args, **kwargs)
+            finally:
+                observar(inicio)
+
+        return envoltura_async
+
+    @functools.wraps(metodo)
+    def envoltura(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            observar(inicio)
+
+    return envoltura
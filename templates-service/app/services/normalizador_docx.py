@@ -0,0 +1,121 @@
+import re
+import zipfile
+from io import BytesIO
+from typing import List
+
+from lxml import etree
+
+from services.plantilla_compilada import PATRON_PARTES_CON_TEXTO, unir_placeholders_en_parrafos
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W_R = f"{{{_W}}}r"
+_W_T = f"{{{_W}}}t"
+_W_RPR = f"{{{_W}}}rPr"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# Marcas que Word agrega al editar y corregir: no cambian lo que se imprime y parten los runs
+_MARCAS = (f"{{{_W}}}proofErr", f"{{{_W}}}lastRenderedPageBreak")
+# w:rsidR, w:rsidRPr, w:rsidRDefault, w:rsidP, w:rsidDel, w:rsidTr, w:rsidSect...
+_ATRIBUTO_RSID = re.compile(r"^\{%s\}rsid" % re.escape(_W))
+
+_PARSER = etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+
+class NormalizadorDocx:
+    """
+    Limpia un DOCX al subirlo para que el render siempre encuentre cada {{KEY}} en un solo <w:t>:
+    - saca <w:proofErr>, <w:lastRenderedPageBreak> y los atributos rsid (historial de edición);
+    - une runs vecinos con el mismo formato (mismo <w:rPr>) que solo tienen texto;
+    - mueve los placeholders que siguen partidos (formatos distintos) al run donde empiezan.
+    Solo se reescriben document/headers/footers/notas; el resto del paquete se copia tal cual.
+    """
+
+    def normalizar(self, archivo_docx: bytes) -> bytes:
+        salida = BytesIO()
+        with zipfile.ZipFile(BytesIO(archivo_docx)) as entrada, \
+                zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as escritor:
+            for info in entrada.infolist():
+                contenido = entrada.read(info)
+                if PATRON_PARTES_CON_TEXTO.match("/" + info.filename):
+                    contenido = self._normalizar_parte(contenido)
+                nueva = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                nueva.compress_type = info.compress_type
+                nueva.external_attr = info.external_attr
+                escritor.writestr(nueva, contenido)
+        return salida.getvalue()
+
+    def _normalizar_parte(self, xml: bytes) -> bytes:
+        raiz = etree.fromstring(xml, _PARSER)
+
+        for marca in list(raiz.iter(*_MARCAS)):
+            self._quitar(marca)
+        for elemento in raiz.iter():
+            for atributo in [a for a in elemento.attrib if _ATRIBUTO_RSID.match(a)]:
+                del elemento.attrib[atributo]
+
+        # Los runs pueden estar en párrafos, hipervínculos, inserciones, smartTags...
+        for padre in {r.getparent() for r in raiz.iter(_W_R)}:
+            self._unir_runs(padre)
+
+        for nodos in unir_placeholders_en_parrafos(raiz):
+            for t in nodos:
+                r = t.getparent()
+                if not t.text and r.tag == _W_R and self._solo_texto(r) and len(r) <= 2:
+                    # Run que quedó vacío al mover un placeholder
+                    self._quitar(r)
+
+        return etree.tostring(raiz, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    def _unir_runs(self, padre) -> None:
+        anterior, formato_anterior = None, None
+        for hijo in list(padre):
+            if hijo.tag != _W_R or not self._solo_texto(hijo):
+                anterior = None
+                continue
+            formato = self._formato(hijo)
+            if anterior is not None and formato == formato_anterior:
+                destino = self._textos(anterior)[0]
+                destino.text = (destino.text or "") + "".join(t.text or "" for t in self._textos(hijo))
+                destino.set(_XML_SPACE, "preserve")
+                self._quitar(hijo)
+                continue
+            textos = self._textos(hijo)
+            if len(textos) > 1:
+                # Un mismo run con varios <w:t>: se dejan en uno
+                textos[0].text = "".join(t.text or "" for t in textos)
+                textos[0].set(_XML_SPACE, "preserve")
+                for t in textos[1:]:
+                    hijo.remove(t)
+            anterior, formato_anterior = hijo, formato
+
+    @staticmethod
+    def _solo_texto(r) -> bool:
+        """ Run con <w:rPr> opcional y al menos un <w:t> (sin tabs, saltos, campos ni dibujos). """
+        tiene_texto = False
+        for hijo in r:
+            if hijo.tag == _W_T:
+                tiene_texto = True
+            elif hijo.tag != _W_RPR:
+                return False
+        return tiene_texto
+
+    @staticmethod
+    def _formato(r) -> bytes:
+        rpr = r.find(_W_RPR)
+        return etree.tostring(rpr, method="c14n") if rpr is not None else b""
+
+    @staticmethod
+    def _textos(r) -> List:
+        return [hijo for hijo in r if hijo.tag == _W_T]
+
+    @staticmethod
+    def _quitar(elemento) -> None:
+        """ Saca el elemento conservando el texto que lo sigue (tail). """
+        padre = elemento.getparent()
+        if elemento.tail:
+            previo = elemento.getprevious()
+            if previo is not None:
+                previo.tail = (previo.tail or "") + elemento.tail
+            else:
+                padre.text = (padre.text or "") + elemento.tail
+        padre.remove(elemento)
@@ -0,0 +1,196 @@
+import bisect
+import re
+import threading
+import time
+from io import BytesIO
+from typing import Dict, List, Optional, Set, Tuple
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from services.metricas_service import registrar_fase, registro
+
+# Render de plantillas: parse (compilar la plantilla), reemplazo y guardado del DOCX
+RENDER_FASE = registro.histograma(
+    "render_fase_duracion_segundos", "Duración de cada fase del render de plantillas", ("fase", "motor")
+)
+
+# {{KEY}} dentro del texto de un párrafo
+PATRON_PLACEHOLDER = re.compile(r"\{\{([^{}]+?)\}\}")
+
+# Partes del paquete que pueden tener placeholders
+PATRON_PARTES_CON_TEXTO = re.compile(r"^/word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml$")
+
+_W_T = qn("w:t")
+_W_P = qn("w:p")
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+def unir_placeholders_partidos(textos: List[str]) -> List[str]:
+    """
+    Recibe los textos de los <w:t> de un párrafo, en orden. Word suele partir
+    '{{KEY}}' en varios runs ('{{' | 'KEY' | '}}'): movemos cada token completo al
+    texto donde empieza (conserva el formato de ese run) y lo sacamos de los siguientes.
+    Mover un token no cambia el texto concatenado: alcanza una sola pasada del regex,
+    lineal en el largo del párrafo.
+    """
+    textos = list(textos)
+    completo = "".join(textos)
+    if "{{" not in completo:
+        return textos
+
+    # Límites [inicio, fin) de cada texto dentro de `completo`; se actualizan al mover tokens
+    inicios, fines = [], []
+    acumulado = 0
+    for texto in textos:
+        inicios.append(acumulado)
+        acumulado += len(texto)
+        fines.append(acumulado)
+
+    for m in PATRON_PLACEHOLDER.finditer(completo):
+        # Primer texto que termina después de la posición (los vacíos quedan salteados)
+        a = bisect.bisect_right(fines, m.start())
+        b = bisect.bisect_right(fines, m.end() - 1)
+        if a == b:
+            continue
+        textos[a] = textos[a][:m.start() - inicios[a]] + m.group(0)
+        for i in range(a + 1, b):
+            textos[i] = ""
+        textos[b] = textos[b][m.end() - inicios[b]:]
+        for i in range(a, b):
+            fines[i] = m.end()
+        for i in range(a + 1, b + 1):
+            inicios[i] = m.end()
+    return textos
+
+
+def unir_placeholders_en_parrafos(raiz) -> List[List]:
+    """
+    Aplica `unir_placeholders_partidos` a cada párrafo de una parte ya parseada (lxml)
+    y devuelve sus <w:t> agrupados por párrafo, en orden.
+    """
+    # Agrupamos los <w:t> por su párrafo más cercano (puede haber párrafos anidados en cuadros de texto)
+    por_parrafo: Dict[object, List] = {}
+    for t in raiz.iter(_W_T):
+        p = t.getparent()
+        while p is not None and p.tag != _W_P:
+            p = p.getparent()
+        if p is not None:
+            por_parrafo.setdefault(p, []).append(t)
+
+    for nodos in por_parrafo.values():
+        textos = [t.text or "" for t in nodos]
+        for t, anterior, nuevo in zip(nodos, textos, unir_placeholders_partidos(textos)):
+            if nuevo != anterior:
+                t.text = nuevo
+                t.set(_XML_SPACE, "preserve")
+    return list(por_parrafo.values())
+
+
+class _Slot:
+    """
+    Un <w:t> que contiene uno o más placeholders. `partes` alterna texto literal
+    y placeholders: (literal, placeholder_normalizado, token_original).
+    """
+    __slots__ = ("elemento", "original", "partes", "_agregados")
+
+    def __init__(self, elemento, partes: List[Tuple[str, Optional[str], str]]):
+        self.elemento = elemento
+        self.original = elemento.text or ""
+        self.partes = partes
+        self._agregados = []
+
+    def escribir(self, mapping: Dict[str, str]) -> None:
+        texto = "".join(
+            literal + (mapping.get(ph, token) if ph else "")
+            for literal, ph, token in self.partes
+        )
+        if not any(c in texto for c in "\t\r\n"):
+            self.elemento.text = texto
+            return
+
+        # Igual que Run.text de python-docx: tab -> <w:tab/>, salto de línea -> <w:br/>
+        trozos = re.split(r"(\t|\r\n|\r|\n)", texto)
+        self.elemento.text = trozos[0]
+        anterior = self.elemento
+        for i in range(1, len(trozos), 2):
+            separador = OxmlElement("w:tab" if trozos[i] == "\t" else "w:br")
+            anterior.addnext(separador)
+            self._agregados.append(separador)
+            anterior = separador
+            if trozos[i + 1]:
+                t = OxmlElement("w:t")
+                t.set(_XML_SPACE, "preserve")
+                t.text = trozos[i + 1]
+                anterior.addnext(t)
+                self._agregados.append(t)
+                anterior = t
+
+    def restaurar(self) -> None:
+        for el in self._agregados:
+            el.getparent().remove(el)
+        self._agregados = []
+        self.elemento.text = self.original
+
+
+class PlantillaCompilada:
+    """
+    DOCX parseado una sola vez, con los placeholders partidos entre runs ya unidos
+    y la ubicación exacta (<w:t>) de cada placeholder.
+    Renderizar escribe los valores directo en esos slots, guarda y restaura el texto
+    original: el costo es proporcional a la cantidad de placeholders y no al tamaño
+    del documento por el tamaño de la metadata.
+    """
+
+    def __init__(self, archivo_docx: bytes):
+        self.doc = Document(BytesIO(archivo_docx))
+        self.slots: List[_Slot] = []
+        self.placeholders: Set[str] = set()
+        self._lock = threading.Lock()  # el documento compilado se comparte entre requests
+
+        for part in self.doc.part.package.iter_parts():
+            if PATRON_PARTES_CON_TEXTO.match(str(part.partname)) and hasattr(part, "element"):
+                self._compilar_parte(part.element)
+
+    def renderizar(self, mapping: Dict[str, str]) -> bytes:
+        buffer_salida = BytesIO()
+        with self._lock:
+            try:
+                inicio = time.perf_counter()
+                for slot in self.slots:
+                    slot.escribir(mapping)
+                reemplazado = time.perf_counter()
+                self.doc.save(buffer_salida)
+                registrar_fase("reemplazo", reemplazado - inicio, RENDER_FASE, motor="docx")
+                registrar_fase("guardado", time.perf_counter() - reemplazado, RENDER_FASE, motor="docx")
+            finally:
+                for slot in self.slots:
+                    slot.restaurar()
+        return buffer_salida.getvalue()
+
+    # ----------------- compilación -----------------
+    def _compilar_parte(self, raiz) -> None:
+        for nodos in unir_placeholders_en_parrafos(raiz):
+            for t in nodos:
+                texto = t.text or ""
+                if "{{" not in texto:
+                    continue
+                partes = self._partir(texto)
+                if partes is not None:
+                    t.set(_XML_SPACE, "preserve")
+                    self.slots.append(_Slot(t, partes))
+
+    def _partir(self, texto: str) -> Optional[List[Tuple[str, Optional[str], str]]]:
+        partes = []
+        desde = 0
+        for m in PATRON_PLACEHOLDER.finditer(texto):
+            # Tolerancia por mayúsc/minúsc internas: {{nombre}} == {{NOMBRE}}
+            ph = f"{{{{{m.group(1).upper()}}}}}"
+            self.placeholders.add(ph)
+            partes.append((texto[desde:m.start()], ph, m.group(0)))
+            desde = m.end()
+        if not partes:
+            return None
+        partes.append((texto[desde:], None, ""))
+        return partes
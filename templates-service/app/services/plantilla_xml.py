@@ -0,0 +1,218 @@
+import html
+import re
+import struct
+import time
+import zipfile
+import zlib
+from io import BytesIO
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from services.metricas_service import registrar_fase
+from services.plantilla_compilada import RENDER_FASE, PATRON_PLACEHOLDER, PATRON_PARTES_CON_TEXTO, unir_placeholders_partidos
+
+# <w:t ...>texto</w:t> | inicio de párrafo | fin de párrafo (los tokens no cruzan párrafos)
+_PATRON_XML = re.compile(r"<w:t(?:\s[^>]*)?>([^<]*)</w:t>|<w:p[\s>]|</w:p>")
+
+_SALTOS = re.compile(r"(\t|\r\n|\r|\n)")
+
+# Cada parte reescribible queda como una lista de literales (str) y slots
+_Segmento = Union[str, "_SlotXml"]
+
+
+class _SlotXml:
+    """ Un <w:t> con placeholders: tag de apertura + (literal, placeholder, token_original). """
+    __slots__ = ("tag", "partes")
+
+    def __init__(self, tag: str, partes: List[Tuple[str, Optional[str], str]]):
+        self.tag = tag
+        self.partes = partes
+
+    def renderizar(self, mapping: Dict[str, str]) -> str:
+        texto = "".join(
+            literal + (mapping.get(ph, token) if ph else "")
+            for literal, ph, token in self.partes
+        )
+        texto = _escapar(texto)
+        if "\t" in texto or "\r" in texto or "\n" in texto:
+            # Igual que Run.text de python-docx: tab -> <w:tab/>, salto de línea -> <w:br/>
+            texto = _SALTOS.sub(
+                lambda m: '</w:t><w:tab/><w:t xml:space="preserve">' if m.group(0) == "\t"
+                else '</w:t><w:br/><w:t xml:space="preserve">',
+                texto,
+            )
+        return f"{self.tag}{texto}</w:t>"
+
+
+class _EntradaZip:
+    __slots__ = ("info", "inicio_datos", "segmentos")
+
+    def __init__(self, info: zipfile.ZipInfo, inicio_datos: int, segmentos: Optional[List[_Segmento]]):
+        self.info = info
+        self.inicio_datos = inicio_datos
+        self.segmentos = segmentos  # None: se copia tal cual (comprimido) al DOCX de salida
+
+
+class PlantillaXml:
+    """
+    Motor de render sin python-docx: trabaja sobre el ZIP y el XML crudo.
+    - Las partes sin placeholders (imágenes, estilos, fuentes...) se copian byte a byte
+      ya comprimidas, sin descomprimir ni recomprimir.
+    - document.xml / headers / footers con placeholders se pre-parten una sola vez en
+      literales + slots; renderizar es concatenar strings y comprimir solo esas partes.
+    """
+
+    def __init__(self, archivo_docx: bytes):
+        self.archivo = archivo_docx
+        self.placeholders: Set[str] = set()
+        self.entradas: List[_EntradaZip] = []
+
+        with zipfile.ZipFile(BytesIO(archivo_docx)) as zf:
+            for info in zf.infolist():
+                inicio = self._inicio_datos(info)
+                segmentos = None
+                if PATRON_PARTES_CON_TEXTO.match("/" + info.filename):
+                    xml_bytes = zf.read(info)
+                    # Un '{' suelto alcanza: el token puede venir partido entre runs
+                    if b"{" in xml_bytes:
+                        segmentos = self._compilar_xml(xml_bytes.decode("utf-8"))
+                self.entradas.append(_EntradaZip(info, inicio, segmentos))
+
+    def renderizar(self, mapping: Dict[str, str]) -> bytes:
+        inicio = time.perf_counter()
+        reemplazo = 0.0
+        salida = _EscritorZip()
+        datos = memoryview(self.archivo)
+        for entrada in self.entradas:
+            info = entrada.info
+            if entrada.segmentos is None:
+                crudo = datos[entrada.inicio_datos:entrada.inicio_datos + info.compress_size]
+                salida.agregar_crudo(info, crudo)
+            else:
+                desde = time.perf_counter()
+                xml = "".join(
+                    s if isinstance(s, str) else s.renderizar(mapping) for s in entrada.segmentos
+                ).encode("utf-8")
+                reemplazo += time.perf_counter() - desde
+                salida.agregar(info, xml)
+        contenido = salida.cerrar()
+        # Reemplazar y escribir el ZIP se intercalan por parte: el guardado es el resto
+        registrar_fase("reemplazo", reemplazo, RENDER_FASE, motor="xml")
+        registrar_fase("guardado", time.perf_counter() - inicio - reemplazo, RENDER_FASE, motor="xml")
+        return contenido
+
+    # ----------------- compilación -----------------
+    def _inicio_datos(self, info: zipfile.ZipInfo) -> int:
+        # Header local: 30 bytes fijos + nombre + extra (el extra local puede diferir del central)
+        largo_nombre, largo_extra = struct.unpack_from("<HH", self.archivo, info.header_offset + 26)
+        return info.header_offset + 30 + largo_nombre + largo_extra
+
+    def _compilar_xml(self, xml: str) -> Optional[List[_Segmento]]:
+        segmentos: List[_Segmento] = []
+        cursor = 0
+        grupo: List[re.Match] = []
+        hubo_slots = False
+
+        def procesar_grupo():
+            nonlocal cursor, hubo_slots
+            if not grupo:
+                return
+            textos = [html.unescape(m.group(1)) for m in grupo]
+            unidos = unir_placeholders_partidos(textos) if "{{" in "".join(textos) else textos
+            for m, anterior, nuevo in zip(grupo, textos, unidos):
+                slot = self._slot(m, nuevo) if "{{" in nuevo else None
+                if slot is None and nuevo == anterior:
+                    continue  # queda dentro del literal, sin tocar
+                segmentos.append(xml[cursor:m.start()])
+                if slot is not None:
+                    segmentos.append(slot)
+                    hubo_slots = True
+                else:
+                    segmentos.append(f"{_tag_preserve(m)}{_escapar(nuevo)}</w:t>")
+                cursor = m.end()
+            grupo.clear()
+
+        for m in _PATRON_XML.finditer(xml):
+            if m.group(1) is not None:
+                grupo.append(m)
+            else:
+                procesar_grupo()
+        procesar_grupo()
+
+        if not hubo_slots:
+            return None
+        segmentos.append(xml[cursor:])
+        return segmentos
+
+    def _slot(self, m: re.Match, texto: str) -> Optional[_SlotXml]:
+        partes = []
+        desde = 0
+        for t in PATRON_PLACEHOLDER.finditer(texto):
+            ph = f"{{{{{t.group(1).upper()}}}}}"
+            self.placeholders.add(ph)
+            partes.append((texto[desde:t.start()], ph, t.group(0)))
+            desde = t.end()
+        if not partes:
+            return None
+        partes.append((texto[desde:], None, ""))
+        return _SlotXml(_tag_preserve(m), partes)
+
+
+def _tag_preserve(m: re.Match) -> str:
+    tag = m.group(0)[:m.group(0).index(">") + 1]
+    if "xml:space" in tag:
+        return tag
+    return tag[:-1] + ' xml:space="preserve">'
+
+
+def _escapar(texto: str) -> str:
+    return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class _EscritorZip:
+    """
+    Escritor ZIP mínimo (sin zip64: un DOCX no llega a 4 GB) que permite agregar
+    entradas ya comprimidas tal como vienen del ZIP de origen.
+    """
+
+    def __init__(self):
+        self._buffer = BytesIO()
+        self._centrales: List[bytes] = []
+
+    def agregar_crudo(self, info: zipfile.ZipInfo, crudo: memoryview) -> None:
+        self._escribir(info, info.compress_type, info.CRC, info.file_size, crudo)
+
+    def agregar(self, info: zipfile.ZipInfo, contenido: bytes) -> None:
+        compresor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        comprimido = compresor.compress(contenido) + compresor.flush()
+        self._escribir(info, zipfile.ZIP_DEFLATED, zlib.crc32(contenido), len(contenido), comprimido)
+
+    def cerrar(self) -> bytes:
+        inicio_central = self._buffer.tell()
+        for central in self._centrales:
+            self._buffer.write(central)
+        largo_central = self._buffer.tell() - inicio_central
+        n = len(self._centrales)
+        self._buffer.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, n, n, largo_central, inicio_central, 0))
+        return self._buffer.getvalue()
+
+    def _escribir(self, info: zipfile.ZipInfo, metodo: int, crc: int, tamano: int, datos) -> None:
+        nombre = info.filename.encode("utf-8")
+        flags = 0x800 if any(b > 0x7F for b in nombre) else 0  # bit 11: nombre en UTF-8
+        hora, fecha = _dos_fecha_hora(info.date_time)
+        offset = self._buffer.tell()
+
+        self._buffer.write(struct.pack(
+            "<IHHHHHIIIHH", 0x04034B50, 20, flags, metodo, hora, fecha, crc, len(datos), tamano, len(nombre), 0
+        ))
+        self._buffer.write(nombre)
+        self._buffer.write(datos)
+
+        self._centrales.append(struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014B50, 20, 20, flags, metodo, hora, fecha, crc, len(datos), tamano,
+            len(nombre), 0, 0, 0, 0, info.external_attr, offset
+        ) + nombre)
+
+
+def _dos_fecha_hora(date_time) -> Tuple[int, int]:
+    anio, mes, dia, hora, minuto, segundo = date_time
+    return (hora << 11) | (minuto << 5) | (segundo // 2), ((max(anio, 1980) - 1980) << 9) | (mes << 5) | dia
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from repositories.plantillas_binarios_refs_repository import PlantillasBinariosRefsRepository
+from repositories.plantillas_binarios_repository import PlantillasBinariosRepository
+from services.metricas_service import medir_fase
+from settings.config import logger
+
+# Tope para esperar a que otro pedido termine de borrar el binario (si se cayó a mitad, la marca queda colgada)
+_ESPERA_BORRADO_SEGUNDOS = 10
+
+class PlantillasBinariosService:
+    """
+    Acceso a los DOCX de las plantillas con un LRU en memoria de las más usadas,
+    acotado por bytes totales (`max_cache_mb`, 0 = sin cache).
+    Los binarios se direccionan por contenido: un mismo DOCX subido varias veces
+    se guarda una sola vez y se cuenta cuántas plantillas lo referencian.
+    """
+
+    def __init__(self, repository: PlantillasBinariosRepository, refs_repository: PlantillasBinariosRefsRepository,
+                 max_cache_mb: int = 128):
+        self.repository = repository
+        self.refs_repository = refs_repository
+        self.max_cache_bytes = max(0, max_cache_mb) * 1024 * 1024
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes_en_cache = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def ubicacion_por_hash(hash_sha256: str) -> str:
+        return f"sha256/{hash_sha256[:2]}/{hash_sha256}.docx"
+
+    async def guardar(self, hash_sha256: str, contenido: bytes) -> str:
+        """
+        Suma una referencia al contenido y devuelve su ubicación. Si el hash ya
+        existe no se escribe nada: alcanza con la consulta + $inc sobre el registro.
+        """
+        ubicacion = await self.refs_repository.obtener_ubicacion(hash_sha256)
+        existia = ubicacion is not None
+        ubicacion = ubicacion or self.ubicacion_por_hash(hash_sha256)
+
+        anteriores = await self.refs_repository.incrementar(hash_sha256, ubicacion, len(contenido))
+        try:
+            if anteriores == 0:
+                # Primera referencia: si se estaba borrando el binario anterior, se sube después de ese borrado
+                await self._esperar_borrado(hash_sha256)
+                await self.repository.guardar(ubicacion, contenido)
+            elif not existia:
+                # Subida idéntica en paralelo: se guarda igual para no depender de que la otra termine
+                await self.repository.guardar(ubicacion, contenido)
+            else:
+                logger.info(f"Contenido {hash_sha256[:12]} ya guardado, referencias: {anteriores + 1}")
+        except Exception:
+            await self.liberar(hash_sha256, ubicacion)
+            raise
+
+        self._cachear(ubicacion, contenido)
+        return ubicacion
+
+    async def liberar(self, hash_sha256: str, ubicacion: str) -> None:
+        """ Resta una referencia; el binario se elimina cuando ninguna plantilla lo usa. """
+        if ubicacion != self.ubicacion_por_hash(hash_sha256):
+            # Plantilla anterior a la deduplicación: su binario es propio
+            await self.eliminar(ubicacion)
+            return
+        a_eliminar = await self.refs_repository.decrementar(hash_sha256)
+        if a_eliminar:
+            # Primero el binario y después el registro: una subida del mismo contenido en el medio espera el borrado
+            try:
+                await self.eliminar(a_eliminar)
+            finally:
+                await self.refs_repository.terminar_borrado(hash_sha256)
+
+    async def obtener(self, ubicacion: str) -> bytes:
+        with self._lock:
+            contenido = self._cache.get(ubicacion)
+            if contenido is not None:
+                self._cache.move_to_end(ubicacion)
+                return contenido
+
+        with medir_fase("binario"):
+            contenido = await self.repository.obtener(ubicacion)
+        self._cachear(ubicacion, contenido)
+        return contenido
+
+    async def eliminar(self, ubicacion: str) -> None:
+        with self._lock:
+            contenido = self._cache.pop(ubicacion, None)
+            if contenido is not None:
+                self._bytes_en_cache -= len(contenido)
+        await self.repository.eliminar(ubicacion)
+
+    async def _esperar_borrado(self, hash_sha256: str) -> None:
+        limite = time.monotonic() + _ESPERA_BORRADO_SEGUNDOS
+        while await self.refs_repository.borrando(hash_sha256):
+            if time.monotonic() >= limite:
+                logger.warning(f"Contenido {hash_sha256[:12]}: el borrado anterior no terminó, se sube igual")
+                await self.refs_repository.terminar_borrado(hash_sha256)
+                return
+            await asyncio.sleep(0.05)
+
+    def _cachear(self, ubicacion: str, contenido: bytes) -> None:
+        if len(contenido) > self.max_cache_bytes:
+            return
+        with self._lock:
+            anterior = self._cache.pop(ubicacion, None)
+            if anterior is not None:
+                self._bytes_en_cache -= len(anterior)
+            self._cache[ubicacion] = contenido
+            self._bytes_en_cache += len(contenido)
+            while self._bytes_en_cache > self.max_cache_bytes:
+                _, expulsado = self._cache.popitem(last=False)
+                self._bytes_en_cache -= len(expulsado)
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
 from domain.dtos.plantilla_dto import SubirPlantillaDTO
 from domain.models.plantilla_model import PlantillaModel
@@ -7,11 +7,15 @@ from repositories.plantillas_repository import PlantillasRepository
 
 
 class PlantillasService:
-    def __init__(self, repository: PlantillasRepository):
+    def __init__(self, repository: PlantillasRepository, limite_busqueda: int = 50, limite_busqueda_max: int = 500):
         self.repository = repository
+        self.limite_busqueda = limite_busqueda
+        self.limite_busqueda_max = limite_busqueda_max
 
-    def agregar_plantilla(self, data : SubirPlantillaDTO, hashSha256: str, tamanoBytes: int,
-                                subido_id: str, subido_nombre: str) -> tuple[str,str]:
+    async def agregar_plantilla(self, data : SubirPlantillaDTO, hashSha256: str, tamanoBytes: int,
+                                subido_id: str, subido_nombre: str, ubicacion_obs: Optional[str] = None,
+                                placeholders: Optional[List[str]] = None, hash_normalizado: Optional[str] = None,
+                                ubicacion_normalizada: Optional[str] = None) -> tuple[str,str]:
         try:
             nueva_plantilla = PlantillaModel(
                 nombre_archivo=data.nombre_archivo,
@@ -22,24 +26,38 @@ class PlantillasService:
                 hashSha256=hashSha256,
                 tamanoBytes=tamanoBytes,
                 subidoPorId=subido_id,
-                subidoPorNombre=subido_nombre
+                subidoPorNombre=subido_nombre,
+                ubicacionObs=ubicacion_obs,
+                placeholders=placeholders,
+                hashNormalizado=hash_normalizado,
+                ubicacionNormalizada=ubicacion_normalizada
             )
         except ValueError as e:
             raise TributarioException(
                 mensaje=str(e)
             )
 
-        self.repository.crear_plantilla(nueva_plantilla)
+        await self.repository.crear_plantilla(nueva_plantilla)
         return nueva_plantilla.id, nueva_plantilla.ubicacionObs
 
-    def revertir_agregar_plantilla(self, id : str):
-        self.repository.eliminar_por_id(id)
+    async def obtener_duplicada(self, data: SubirPlantillaDTO, hashSha256: str) -> Optional[PlantillaModel]:
+        return await self.repository.obtener_por_hash(hashSha256, nombre=data.nombre.strip(), tipo=data.tipo.strip(),
+                                                      juzgado=data.juzgado.strip())
 
-    def obtener_por_id(self, id: str) -> PlantillaModel:
-        return self.repository.obtener_por_id(id)
+    async def revertir_agregar_plantilla(self, id : str):
+        await self.repository.eliminar_por_id(id)
 
-    def eliminar_plantilla(self, id: str):
-        self.repository.eliminar_por_id(id)
+    async def obtener_por_id(self, id: str) -> PlantillaModel:
+        return await self.repository.obtener_por_id(id)
 
-    def filtrar_plantillas(self, **filtros) -> List[PlantillaModel]:
-        return self.repository.filtrar(**filtros)
\ No newline at end of file
+    async def guardar_placeholders(self, id: str, placeholders: List[str]) -> None:
+        await self.repository.guardar_placeholders(id, placeholders)
+
+    async def eliminar_plantilla(self, id: str):
+        await self.repository.eliminar_por_id(id)
+
+    async def filtrar_plantillas(self, limite: Optional[int] = None, **filtros) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        limite = self.limite_busqueda if limite is None else limite
+        if limite < 1 or limite > self.limite_busqueda_max:
+            raise TributarioException(mensaje=f"El límite debe estar entre 1 y {self.limite_busqueda_max}.")
+        return await self.repository.filtrar(limite=limite, **filtros)
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from domain.dtos.plantilla_dto import ReportePlaceholdersDTO
+from exceptions.servicio_saturado_exception import ServicioSaturadoException
+from exceptions.tributarios_exception import TributarioException
+from services.metricas_service import iniciar_fases, registrar_fase, terminar_fases
+from services.plantilla_compilada import RENDER_FASE
+from services.word_replacer_service import WordReplacerService
+from settings.config import logger
+
+# Estado de cada proceso worker: su propio LRU de plantillas compiladas
+_replacer_worker: Optional[WordReplacerService] = None
+
+
+def _inicializar_worker(max_plantillas_compiladas: int, motor_default: str) -> None:
+    global _replacer_worker
+    # python-docx y lxml quedan importados antes del primer render
+    import docx  # noqa: F401
+    _replacer_worker = WordReplacerService(max_plantillas_compiladas=max_plantillas_compiladas,
+                                           motor_default=motor_default)
+
+
+def _renderizar_en_worker(archivo_docx: bytes, metadata: dict, formato: str, motor: Optional[str],
+                          hash_sha256: str) -> Tuple[Union[str, bytes], dict, str, List[Tuple[str, float]]]:
+    """ Corre en el worker: devuelve el documento, el reporte de placeholders, el motor y las fases medidas. """
+    fases, token = iniciar_fases()
+    try:
+        plantilla = _replacer_worker.compilar_plantilla(archivo_docx, motor, hash_sha256)
+        contenido = _replacer_worker.reemplazar_en_plantilla(plantilla, metadata, formato, informar=False)
+        reporte = _replacer_worker.reporte_placeholders(plantilla, metadata)
+        # compilar_plantilla ya validó el motor
+        return contenido, reporte.model_dump(), (motor or _replacer_worker.motor_default).lower(), fases
+    finally:
+        terminar_fases(token)
+
+
+class RenderPoolService:
+    """
+    Render de plantillas en un pool de procesos: python-docx/lxml son CPU puro y en el
+    threadpool un proceso usa ~1 core. Cada worker tiene su propio LRU de plantillas
+    compiladas por hash (la misma plantilla puede compilarse una vez por worker).
+    - A lo sumo `procesos + max_cola` renders en vuelo; el resto se rechaza con 503,
+      salvo con `esperar` (filas de un lote), que espera lugar en lugar de fallar.
+    - Las fases medidas en el worker se registran acá (Server-Timing y /metrics).
+    """
+
+    def __init__(self, replacer_service: WordReplacerService, procesos: int, max_cola: int,
+                 max_plantillas_compiladas: int):
+        self.replacer_service = replacer_service
+        self.procesos = procesos if procesos > 0 else (os.cpu_count() or 1)
+        self.max_cola = max(0, max_cola)
+        self.max_plantillas_compiladas = max_plantillas_compiladas
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._en_vuelo = 0
+        self._lugar_libre = asyncio.Condition()
+
+    def iniciar(self) -> None:
+        # spawn: el proceso padre tiene hilos (uvicorn, pymongo) y fork no es seguro con hilos
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.procesos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar_worker,
+            initargs=(self.max_plantillas_compiladas, self.replacer_service.motor_default),
+        )
+        logger.info(f"Pool de render iniciado con {self.procesos} procesos")
+
+    def detener(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {"procesos": self.procesos, "en_vuelo": self._en_vuelo, "max_en_vuelo": self.procesos + self.max_cola}
+
+    async def renderizar(self, archivo_docx: bytes, metadata: Dict[str, Any], formato: str,
+                         motor: Optional[str] = None, hash_sha256: Optional[str] = None,
+                         esperar: bool = False) -> Union[str, bytes]:
+        if self._pool is None:
+            raise TributarioException("El pool de render no está iniciado.")
+        if self._saturado():
+            if not esperar:
+                raise ServicioSaturadoException("Hay demasiados documentos en proceso. Reintente en unos segundos.")
+            async with self._lugar_libre:
+                await self._lugar_libre.wait_for(lambda: not self._saturado())
+                self._en_vuelo += 1
+        else:
+            self._en_vuelo += 1
+
+        pool = self._pool
+        try:
+            if pool is None:
+                # Se detuvo mientras esperaba lugar
+                raise TributarioException("El pool de render no está iniciado.")
+            if hash_sha256 is None:
+                # Clave del LRU de cada worker (los DOCX subidos no traen el hash)
+                hash_sha256 = await asyncio.get_running_loop().run_in_executor(None, _sha256_hex, archivo_docx)
+            contenido, reporte, motor_usado, fases = await asyncio.get_running_loop().run_in_executor(
+                pool, _renderizar_en_worker, archivo_docx, metadata, formato, motor, hash_sha256
+            )
+        except BrokenProcessPool:
+            # Solo el primero que lo detecta recrea el pool
+            if self._pool is pool:
+                logger.error("Un worker del pool de render terminó de forma inesperada; se recrea el pool")
+                self._recrear()
+            raise TributarioException("Error al procesar el Word: el proceso de render terminó inesperadamente.")
+        finally:
+            self._en_vuelo -= 1
+            async with self._lugar_libre:
+                self._lugar_libre.notify()
+
+        for fase, segundos in fases:
+            registrar_fase(fase, segundos, RENDER_FASE, motor=motor_usado)
+        self.replacer_service.informar_placeholders(ReportePlaceholdersDTO(**reporte))
+        return contenido
+
+    def _saturado(self) -> bool:
+        return self._en_vuelo >= self.procesos + self.max_cola
+
+    def _recrear(self) -> None:
+        pool = self._pool
+        self.iniciar()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _sha256_hex(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
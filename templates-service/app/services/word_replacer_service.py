@@ -1,11 +1,36 @@
-from docx import Document
-from io import BytesIO
 import base64
-from typing import Union, Dict, Any, List, Tuple
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Union, Dict, Any, Optional, List
+
+from domain.dtos.plantilla_dto import ReportePlaceholdersDTO
 from exceptions.tributarios_exception import TributarioException
+from services.metricas_service import medir_fase, registro
+from services.plantilla_compilada import RENDER_FASE, PlantillaCompilada
+from services.plantilla_xml import PlantillaXml
+
+# Mismo logger que configura settings.config, sin importarlo: el replacer se usa sin Settings (bench, workers)
+logger = logging.getLogger("templates_app")
+
+# tipo: sin_completar (placeholder sin valor) | desconocido (clave de la metadata que la plantilla no usa)
+RENDER_PLACEHOLDERS = registro.contador(
+    "render_placeholders_reportados_total", "Placeholders sin completar o desconocidos en los renders", ("tipo",)
+)
+
+# Motores de render: "docx" (python-docx) | "xml" (ZIP/XML crudo, copia las partes sin tocar)
+MOTORES_RENDER = {"docx": PlantillaCompilada, "xml": PlantillaXml}
 
 class WordReplacerService:
 
+    def __init__(self, max_plantillas_compiladas: int = 32, motor_default: str = "docx"):
+        # Plantillas compiladas por (SHA-256 del DOCX, motor) (LRU)
+        self.max_plantillas_compiladas = max_plantillas_compiladas
+        self.motor_default = self._validar_motor(motor_default)
+        self._compiladas: "OrderedDict[tuple, Union[PlantillaCompilada, PlantillaXml]]" = OrderedDict()
+        self._lock = threading.Lock()
+
     def _build_mapping(self, metadata: Dict[str, Any]) -> Dict[str, str]:
         """
         {"demandado_nombre": "Ramses"} -> {"{{DEMANDADO_NOMBRE}}": "Ramses"}
@@ -17,149 +42,100 @@ class WordReplacerService:
             mapping[f"{{{{{str(k).upper()}}}}}"] = str(v)
         return mapping
 
-    # --- Reemplazo por run, incluyendo placeholders cortados en varios runs ---
-    def _replace_placeholders_in_runs(self, runs, mapping: Dict[str, str]):
-        """
-        Reemplaza placeholders del tipo {{KEY}} tanto si están en un único run
-        como si aparecen repartidos en múltiples runs (p.ej. '{{' | 'KEY' | '}}').
-        Conserva el formato del resto del párrafo. El texto reemplazado quedará
-        con el formato del primer run que contenía '{{'.
-        """
-        i = 0
-        while i < len(runs):
-            text_i = runs[i].text or ""
-
-            # 1) Caso rápido: placeholder completo dentro del mismo run
-            changed = False
-            for ph, val in mapping.items():
-                if ph in text_i:
-                    text_i = text_i.replace(ph, val)
-                    changed = True
-            if changed:
-                runs[i].text = text_i
-                i += 1
-                continue
-
-            # 2) Caso partido: buscamos '{{' y acumulamos hasta '}}' cruzando runs
-            pos = text_i.find('{{')
-            if pos == -1:
-                i += 1
-                continue
-
-            # Podría haber varios '{{' en el mismo run; procesamos uno por iteración
-            collected = text_i[pos:]  # desde '{{' de este run
-            consumed: List[Tuple[int, int, int]] = [(i, pos, len(text_i))]  # (idx_run, from,to)
-            j = i + 1
-            while j < len(runs) and '}}' not in collected:
-                t = runs[j].text or ""
-                collected += t
-                consumed.append((j, 0, len(t)))
-                j += 1
-
-            if '}}' not in collected:
-                # No se cerró; no tocamos nada y avanzamos
-                i += 1
-                continue
-
-            # Extraemos primer token {{...}}
-            open_idx = collected.find('{{')
-            close_idx = collected.find('}}', open_idx + 2)
-            token = collected[open_idx:close_idx + 2]  # incluye '}}'
-
-            # Buscamos en mapping (tolerancia por mayúsc/minúsc internas)
-            replacement = mapping.get(token)
-            if replacement is None:
-                middle = token[2:-2].upper()
-                replacement = mapping.get(f"{{{{{middle}}}}}")
-
-            if replacement is None:
-                # No es un placeholder conocido -> avanzamos un carácter para reintentar
-                # (evita quedar pegados en el mismo '{{')
-                # Partimos el run i en dos para “consumir” el '{{' hallado y seguir buscando.
-                # Como python-docx no permite split directo, hacemos una sustitución temporal:
-                pre = runs[i].text[:pos + 2]  # incluye '{{'
-                post = runs[i].text[pos + 2:]
-                runs[i].text = pre
-                # Insertamos el post en el mismo run (concatenándolo) para no alterar estilos;
-                # en la siguiente vuelta, no encontrará '{{' en este run y avanzará.
-                runs[i].text = runs[i].text + post
-                i += 1
-                continue
-
-            # Tenemos reemplazo. Reconstruimos: prefijo del primer run + replacement + sufijo global
-            first_run_idx, from_pos, _ = consumed[0]
-            # Prefijo: todo lo que hay antes de '{{' en el primer run
-            prefix = runs[first_run_idx].text[:from_pos]
-
-            # Sufijo: todo lo que viene después de '}}' a lo largo de los runs consumidos
-            end_in_collected = close_idx + 2
-            suffix = collected[end_in_collected:]  # puede estar vacío
+    @staticmethod
+    def inventario(plantilla: Union[PlantillaCompilada, PlantillaXml]) -> List[str]:
+        """ Claves de los placeholders de la plantilla compilada, sin llaves y ordenadas: ["DNI", "NOMBRE"]. """
+        return sorted(ph[2:-2] for ph in plantilla.placeholders)
 
-            # Limpiamos todos los runs consumidos
-            for run_idx, _, _ in consumed:
-                runs[run_idx].text = ""
+    def reporte_placeholders(self, plantilla: Union[PlantillaCompilada, PlantillaXml],
+                             metadata: Dict[str, Any]) -> ReportePlaceholdersDTO:
+        """ Compara los placeholders de la plantilla compilada con la metadata (sin renderizar). """
+        return self.reporte_inventario(self.inventario(plantilla), metadata)
 
-            # Escribimos en el primer run: prefix + replacement
-            runs[first_run_idx].text = prefix + replacement
-
-            # Si hay sufijo, lo colocamos en el último run consumido (mantiene el estilo de ese run)
-            if suffix:
-                last_run_idx = consumed[-1][0]
-                runs[last_run_idx].text = suffix
+    @staticmethod
+    def reporte_inventario(placeholders: List[str], metadata: Dict[str, Any]) -> ReportePlaceholdersDTO:
+        """
+        Compara un inventario de placeholders (ver `inventario`) con la metadata: no hace falta el DOCX.
+        Un valor None cuenta como no completado: el placeholder queda tal cual en el documento.
+        """
+        claves = {str(k).upper(): str(k) for k, v in (metadata or {}).items() if v is not None}
+        requeridos = set(placeholders)
+        return ReportePlaceholdersDTO(
+            sin_completar=sorted(ph for ph in requeridos if ph not in claves),
+            desconocidos=sorted(k for clave, k in claves.items() if clave not in requeridos),
+        )
+
+    def _validar_motor(self, motor: Optional[str]) -> str:
+        motor = (motor or "").lower()
+        if motor not in MOTORES_RENDER:
+            raise TributarioException(
+                f"Se ingresó el motor '{motor}' que no es aceptado. Debe ser uno de: {', '.join(MOTORES_RENDER)}."
+            )
+        return motor
+
+    def compilar_plantilla(self, archivo_docx: bytes, motor: Optional[str] = None,
+                           hash_sha256: Optional[str] = None) -> Union[PlantillaCompilada, PlantillaXml]:
+        """
+        Parsea el DOCX, une placeholders partidos y ubica cada {{KEY}} una sola vez.
+        El resultado se cachea por hash: la misma plantilla no se vuelve a recorrer.
+        `motor` elige el render para esta llamada; si no viene se usa el default.
+        `hash_sha256` evita recalcular el hash cuando ya se conoce (plantillas guardadas).
+        """
+        motor = self._validar_motor(motor) if motor else self.motor_default
+        clave = (hash_sha256 or hashlib.sha256(archivo_docx).hexdigest(), motor)
+        with self._lock:
+            compilada = self._compiladas.get(clave)
+            if compilada is not None:
+                self._compiladas.move_to_end(clave)
+                return compilada
 
-            # No incrementamos demasiado 'i' para permitir detectar más placeholders seguidos
-            i = max(i, first_run_idx)  # nos aseguramos de no retroceder
-            i += 1
+        try:
+            with medir_fase("parse", RENDER_FASE, motor=motor):
+                compilada = MOTORES_RENDER[motor](archivo_docx)
+        except Exception as e:
+            raise TributarioException(f"Error al procesar el Word: {str(e)}")
 
-    def reemplazar_placeholder_word(self, archivo_docx: bytes, metadata: dict, formato: str) -> Union[str, bytes]:
+        with self._lock:
+            self._compiladas[clave] = compilada
+            self._compiladas.move_to_end(clave)
+            while len(self._compiladas) > self.max_plantillas_compiladas:
+                self._compiladas.popitem(last=False)
+        return compilada
+
+    def reemplazar_placeholder_word(self, archivo_docx: bytes, metadata: dict, formato: str,
+                                    motor: Optional[str] = None, hash_sha256: Optional[str] = None) -> Union[str, bytes]:
+        plantilla = self.compilar_plantilla(archivo_docx, motor, hash_sha256)
+        return self.reemplazar_en_plantilla(plantilla, metadata, formato)
+
+    def reemplazar_en_plantilla(self, plantilla: Union[PlantillaCompilada, PlantillaXml], metadata: dict, formato: str,
+                                informar: bool = True) -> Union[str, bytes]:
+        """ `informar=False`: no registra el reporte de placeholders (lo hace quien llama, p.ej. el pool de render). """
         try:
             mapping = self._build_mapping(metadata)
             if not mapping:
                 raise TributarioException("La metadata está vacía: no hay placeholders que reemplazar.")
 
-            buffer_entrada = BytesIO(archivo_docx)
-            doc = Document(buffer_entrada)
-
-            # Párrafos
-            for p in doc.paragraphs:
-                self._replace_placeholders_in_runs(p.runs, mapping)
-
-            # Tablas (ídem)
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        for p in cell.paragraphs:
-                            self._replace_placeholders_in_runs(p.runs, mapping)
-
-            # Headers/Footers:
-            for section in doc.sections:
-                self._replace_placeholders_in_runs(section.header.paragraphs, mapping)
-                self._replace_placeholders_in_runs(section.footer.paragraphs, mapping)
-                for t in section.header.tables:
-                    for r in t.rows:
-                        for c in r.cells:
-                            for p in c.paragraphs:
-                                self._replace_placeholders_in_runs(p.runs, mapping)
-                for t in section.footer.tables:
-                    for r in t.rows:
-                        for c in r.cells:
-                            for p in c.paragraphs:
-                                self._replace_placeholders_in_runs(p.runs, mapping)
-
-            buffer_salida = BytesIO()
-            doc.save(buffer_salida)
-            buffer_salida.seek(0)
-            contenido = buffer_salida.read()
-
-            if formato == "base64":
-                return base64.b64encode(contenido).decode("utf-8")
-            elif formato == "file":
-                return contenido
-            else:
+            if formato not in ("base64", "file"):
                 raise TributarioException(
                     f"Se ingresó el formato '{formato}' que no es aceptado. Debe ser 'base64' o 'file'."
                 )
+
+            contenido = plantilla.renderizar(mapping)
+            if informar:
+                self.informar_placeholders(self.reporte_placeholders(plantilla, metadata))
+
+            if formato == "base64":
+                return base64.b64encode(contenido).decode("utf-8")
+            return contenido
         except TributarioException:
             raise
         except Exception as e:
             raise TributarioException(f"Error al procesar el Word: {str(e)}")
+
+    def informar_placeholders(self, reporte: ReportePlaceholdersDTO) -> None:
+        if reporte.sin_completar:
+            RENDER_PLACEHOLDERS.incrementar(len(reporte.sin_completar), tipo="sin_completar")
+            logger.info(f"Placeholders sin completar ({len(reporte.sin_completar)}): "
+                        f"{', '.join(reporte.sin_completar[:20])}")
+        if reporte.desconocidos:
+            RENDER_PLACEHOLDERS.incrementar(len(reporte.desconocidos), tipo="desconocido")
@@ -0,0 +1,47 @@
+import zipfile
+from typing import List
+
+
+class _SinkNoSeekable:
+    """ Destino de escritura sin seek: zipfile usa data descriptors y no retrocede. """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def vaciar(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStreaming:
+    """
+    Arma un ZIP entrada por entrada y permite ir entregando los bytes ya escritos,
+    sin mantener el archivo completo en memoria.
+
+        zs = ZipStreaming()
+        zs.agregar("a.pdf", pdf_bytes); yield zs.pendiente()
+        ...
+        yield zs.cerrar()
+    """
+
+    def __init__(self, compresion: int = zipfile.ZIP_DEFLATED):
+        self._sink = _SinkNoSeekable()
+        self._zip = zipfile.ZipFile(self._sink, mode="w", compression=compresion)
+
+    def agregar(self, nombre: str, contenido: bytes) -> None:
+        self._zip.writestr(nombre, contenido)
+
+    def pendiente(self) -> bytes:
+        return self._sink.vaciar()
+
+    def cerrar(self) -> bytes:
+        self._zip.close()
+        return self._sink.vaciar()
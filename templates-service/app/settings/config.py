@@ -7,13 +7,96 @@ env_file_path = "/local-envs/.env" if Path("/local-envs/.env").exists() else Non
 class Settings(BaseSettings):
     entorno: str
     mongo_url: str
+    # Una o varias réplicas separadas por coma: el cliente balancea entre ellas
     file_converter_base_url: str
 
+    # Cliente async de Mongo (pool compartido por todos los repositorios)
+    mongo_pool_max: int = 100
+    mongo_pool_min: int = 0
+    mongo_max_idle_ms: int = 60000
+    mongo_timeout_seleccion_ms: int = 5000
+    mongo_timeout_conexion_ms: int = 5000
+    mongo_timeout_socket_ms: int = 20000
+    mongo_read_preference: str = "primary"
+    # "majority" o cantidad de nodos
+    mongo_write_concern: str = "majority"
+
+    # Cliente HTTP hacia file-converter-service (pool compartido, keep-alive)
+    file_converter_max_conexiones: int = 100
+    file_converter_max_keepalive: int = 20
+    file_converter_keepalive_segundos: float = 30
+    file_converter_timeout_conexion_segundos: float = 5
+    file_converter_timeout_lectura_segundos: float = 120
+    file_converter_timeout_escritura_segundos: float = 30
+    file_converter_timeout_pool_segundos: float = 10
+    file_converter_reintentos: int = 3
+    file_converter_backoff_base_segundos: float = 0.2
+    file_converter_backoff_max_segundos: float = 2.0
+    # Con varias réplicas: el mismo DOCX va a la misma réplica (su cache de PDFs) mientras no tenga
+    # más de `holgura` pedidos en vuelo que la menos ocupada
+    file_converter_afinidad: bool = True
+    file_converter_afinidad_holgura: int = 2
+    # Fallas seguidas (conexión, timeout, 502/504) que sacan a una réplica de rotación, y por cuánto tiempo
+    file_converter_fallas_para_abrir: int = 5
+    file_converter_circuito_abierto_segundos: float = 10
+    # Sin respuesta en este tiempo se manda la conversión también a otra réplica (0 = sin hedge).
+    # Conviene un valor cercano al p95 de la conversión: por encima se duplica trabajo de LibreOffice
+    file_converter_hedge_segundos: float = 0
+    # Para balancear, un pedido en vuelo pesa 1 + su edad / este valor (duración típica de una conversión)
+    file_converter_segundos_por_pedido: float = 5
+
+    # Plantillas compiladas en memoria (LRU por hash del DOCX)
+    plantillas_compiladas_max: int = 32
+    # Motor de render por defecto: "docx" (python-docx) | "xml" (ZIP/XML crudo)
+    motor_render: str = "docx"
+    # Plantillas guardadas: se rechaza el render si a la metadata le faltan placeholders (antes de leer el DOCX)
+    render_validar_placeholders: bool = True
+    # Render en un pool de procesos (usa varios cores): 0 = deshabilitado (threadpool), -1 = un proceso por CPU
+    render_procesos: int = 0
+    # Renders esperando un proceso libre; por encima se responde 503
+    render_cola_max: int = 64
+
+    # Almacenamiento de los DOCX de las plantillas: "gridfs" (Mongo) | "local"
+    storage_plantillas: str = "gridfs"
+    storage_directorio: str = "/data/plantillas"
+    # Al subir se guarda además el DOCX normalizado (runs unidos, sin marcas de corrección ni rsid) y se renderiza ese
+    plantillas_normalizar: bool = True
+    # LRU en memoria de los DOCX más usados
+    plantillas_cache_mb: int = 128
+
+    # Cache de metadata de plantillas por id (0 entradas = sin cache)
+    plantillas_metadata_cache_entradas: int = 1000
+    plantillas_metadata_cache_ttl_segundos: float = 300
+    # Sin change streams (Mongo sin replica set): cada cuánto se verifica que sigan existiendo
+    plantillas_metadata_cache_polling_segundos: float = 10
+
+    # Búsqueda de plantillas: tamaño de página por defecto y máximo
+    busqueda_limite: int = 50
+    busqueda_limite_max: int = 500
+
+    # Cache de documentos generados (DOCX reemplazado o PDF) por plantilla + metadata + formato + motor.
+    # Guarda documentos con datos de las personas: el directorio no debe ser compartido ni persistente.
+    documentos_cache_habilitado: bool = True
+    documentos_cache_memoria_mb: int = 64
+    documentos_cache_directorio: str = "/tmp/documentos_cache"
+    # 0 = solo memoria
+    documentos_cache_disco_mb: int = 512
+    documentos_cache_max_edad_horas: int = 24
+    documentos_cache_max_documento_mb: int = 16
+
+    # Generación por lotes
+    lote_max_concurrencia: int = 4
+    lote_max_filas: int = 5000
+
     model_config = SettingsConfigDict(
         env_file=env_file_path,
         env_file_encoding="utf-8"
     )
 
+    @property
+    def file_converter_urls_list(self) -> list[str]:
+        return [u.strip() for u in self.file_converter_base_url.split(",") if u.strip()]
+
     @property
     def jwt_issuers_list(self) -> list[str]:
         return [i.strip() for i in self.jwt_issuers.split(",")]